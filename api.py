@@ -1,14 +1,37 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import logging
+import os
+import json
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from processor.df_processor import get_deployment
-from processor.df_processor import get_deployment_frequency
-from processor.lt_processor import get_lead_time 
-from processor.mttr_processor import calculate_mttr_from_db
-from processor.cfr_processor import calculate_cfr
-from db import get_mongo_collections
+from fastapi.responses import StreamingResponse
+from processor.df_processor import (
+    get_deployment_frequency_async,
+    get_deployment_frequency_page_async,
+    stream_deployments_async,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+)
+from processor.lt_processor import get_lead_time_async
+from processor.mttr_processor import calculate_mttr_from_db_async
+from processor.cfr_processor import calculate_cfr_from_db_async
+from processor.rollup_processor import get_rollup_metrics
+from processor.dora_engine import compute_dora_metrics_async, compute_batch_async
+from processor.metric_cache import cached_async, metric_cache
+from processor.event_store import event_store
+from processor.periods import parse_period_params
+from db import get_pool_stats, close_client, close_async_client
 from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 from processor.ai_insights_processor import get_dora_ai_insights
-from processor.forecast import forecast_metric
+from processor import forecast_jobs
+from config import FORECAST_PREWARM, EVENT_STORE_ENABLED, DORA_BATCH_MAX_WINDOWS
+import asyncio
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -24,43 +47,189 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cold-start / worker-restart timings of this API process (see /startup/timing)
+_startup_timing = {
+    "pid": os.getpid(),
+    "started_at": time.time(),
+    "import_seconds": round(time.perf_counter() - _IMPORT_STARTED, 3),
+}
+
+@app.on_event("startup")
+def startup():
+    # Prophet and pandas stay out of this process; optionally load them in
+    # the forecast workers now rather than on the first /forecast call
+    if FORECAST_PREWARM:
+        forecast_jobs.prewarm()
+    # loads in the background; the endpoints read Mongo until it is ready
+    if EVENT_STORE_ENABLED:
+        event_store.start()
+    _startup_timing["ready_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    logger.info(f"API ready in {_startup_timing['ready_seconds']}s (imports {_startup_timing['import_seconds']}s)")
+
+@app.on_event("shutdown")
+async def shutdown():
+    forecast_jobs.shutdown()
+    event_store.stop()
+    await close_async_client()
+    close_client()
+
+@app.get("/db/pool-stats")
+def pool_stats_endpoint():
+    """Connection pool counters for sizing MONGO_MAX_POOL_SIZE."""
+    return get_pool_stats()
+
+@app.get("/startup/timing")
+def startup_timing_endpoint():
+    """Import/ready time of this API process and forecast worker warm-up times."""
+    return {**_startup_timing, "forecast_workers": forecast_jobs.stats()}
+
+@app.get("/cache/stats")
+def cache_stats_endpoint():
+    """Hit/miss/invalidation counters of the metric result cache."""
+    return metric_cache.stats()
+
+@app.get("/event-store/stats")
+def event_store_stats_endpoint():
+    """Rows, memory and refresh timings of the in-memory event store."""
+    return {"enabled": EVENT_STORE_ENABLED, **event_store.stats()}
+
+def _store_or(from_store, from_db):
+    """
+    Compute from the in-memory event store once it has loaded, else from
+    Mongo; from_store is a plain function, from_db a coroutine function.
+    from_store runs in a worker thread: it waits for the store's lock,
+    which a refresh holds while it applies a large batch of changes.
+    """
+    async def compute():
+        if EVENT_STORE_ENABLED and event_store.ready:
+            return await asyncio.to_thread(from_store)
+        return await from_db()
+    return compute
+
+GRANULARITY_QUERY = Query(None, pattern="^(day|week|month)$", description="Group by day, ISO week or month: day | week | month")
+TZ_QUERY = Query(None, description="IANA time zone of the periods, e.g. Europe/Berlin (default UTC); the window stays UTC")
+GROUP_BY_QUERY = Query(None, pattern="^(job_name|service|target_branch|repo)$",
+                       description="One result per job_name | service | target_branch | repo, as {group_by, groups}")
+
+def _period_params(granularity: Optional[str], tz: Optional[str]):
+    """(granularity, ZoneInfo) for the granularity/tz parameters, (None, None) without granularity."""
+    if granularity is None:
+        return None, None
+    granularity, zone, error = parse_period_params(granularity, tz)
+    if error:
+        raise HTTPException(status_code=400, detail=error["error"])
+    return granularity, zone
+
+# The metric endpoints are async def on the async Mongo client: a slow
+# query parks a coroutine instead of holding a threadpool thread.
+def _ndjson_line(doc: dict) -> bytes:
+    return (json.dumps(doc, default=lambda v: v.isoformat(), separators=(",", ":")) + "\n").encode()
+
+async def _ndjson(documents):
+    async for doc in documents:
+        yield _ndjson_line(doc)
+
 @app.get("/deployment-frequency")
-def deployment_frequency_endpoint(
+async def deployment_frequency_endpoint(
     start_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS"),
-    end_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS")
+    end_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$", description="ndjson streams every deployment, one per line"),
+    granularity: Optional[str] = GRANULARITY_QUERY,
+    tz: Optional[str] = TZ_QUERY,
+    group_by: Optional[str] = GROUP_BY_QUERY,
 ):
-    result = get_deployment_frequency(start_time, end_time)
+    """
+    Without limit/cursor the whole window comes back in one body (cached).
+    With limit or cursor: pages in (timestamp, build_id) order with their
+    page_count and a next_cursor (null on the last page). format=ndjson
+    streams the listing straight from the Mongo cursor, resuming after
+    cursor if one is given.
+    With granularity: the count plus deployments per period instead of the
+    listing. With group_by: counts per group (group_by=job_name counts the
+    successful builds of every job, not only prod-deploy). Neither can be
+    combined with limit, cursor or format=ndjson.
+    """
+    granularity, zone = _period_params(granularity, tz)
+    paged = limit is not None or cursor is not None or response_format == "ndjson"
+    if (granularity or group_by) and paged:
+        raise HTTPException(status_code=400, detail="granularity and group_by cannot be combined with limit, cursor or format=ndjson")
+    if response_format == "ndjson" and limit is not None:
+        raise HTTPException(status_code=400, detail="format=ndjson streams the whole listing; limit does not apply")
+    if granularity or group_by:
+        result = await cached_async("deployment_frequency", start_time, end_time, _store_or(
+            lambda: event_store.get_deployment_frequency(start_time, end_time, granularity, zone, group_by),
+            lambda: get_deployment_frequency_async(start_time, end_time, granularity, zone, group_by)),
+            granularity=granularity, tz=zone and zone.key, group_by=group_by)
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return result
+
+    if response_format == "ndjson":
+        documents = stream_deployments_async(start_time, end_time, cursor)
+        if isinstance(documents, dict):
+            raise HTTPException(status_code=400, detail=documents["error"])
+        return StreamingResponse(_ndjson(documents), media_type="application/x-ndjson")
+
+    if limit is not None or cursor is not None:
+        result = await get_deployment_frequency_page_async(start_time, end_time, limit or DEFAULT_PAGE_SIZE, cursor)
+    else:
+        result = await cached_async("deployment_frequency", start_time, end_time, _store_or(
+            lambda: event_store.get_deployment_frequency(start_time, end_time),
+            lambda: get_deployment_frequency_async(start_time, end_time)))
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 @app.get("/lead-time")
-def lead_time_endpoint(
+async def lead_time_endpoint(
     start_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS"),
-    end_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS")
+    end_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS"),
+    granularity: Optional[str] = GRANULARITY_QUERY,
+    tz: Optional[str] = TZ_QUERY,
+    group_by: Optional[str] = GROUP_BY_QUERY,
 ):
-    result = get_lead_time(start_time, end_time)
+    granularity, zone = _period_params(granularity, tz)
+    result = await cached_async("lead_time", start_time, end_time, _store_or(
+        lambda: event_store.get_lead_time(start_time, end_time, granularity, zone, group_by),
+        lambda: get_lead_time_async(start_time, end_time, granularity, zone, group_by)),
+        granularity=granularity, tz=zone and zone.key, group_by=group_by)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
 @app.get("/mttr")
-def mttr_endpoint(
+async def mttr_endpoint(
     start_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS"),
-    end_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS")
+    end_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS"),
+    scope: Optional[str] = Query(None, description="Only match alerts with the same 'commit' or 'service' label"),
+    granularity: Optional[str] = GRANULARITY_QUERY,
+    tz: Optional[str] = TZ_QUERY,
+    group_by: Optional[str] = GROUP_BY_QUERY,
 ):
     """
     Returns MTTR metrics (daily/weekly/monthly) for failed deployments
-    in the given datetime range.
+    in the given datetime range; only the requested one with granularity.
+    group_by groups by the failed deployment; combine with scope=service
+    to also match only alerts of the same service.
     """
-    result = calculate_mttr_from_db(start_time, end_time)
+    granularity, zone = _period_params(granularity, tz)
+    result = await cached_async("mttr", start_time, end_time, _store_or(
+        lambda: event_store.calculate_mttr(start_time, end_time, scope, granularity, zone, group_by),
+        lambda: calculate_mttr_from_db_async(start_time, end_time, scope, granularity, zone, group_by)),
+        scope=scope, granularity=granularity, tz=zone and zone.key, group_by=group_by)
     return result
 
 @app.get("/api/cfr")
-def get_cfr(
+async def get_cfr(
     start: str = Query(..., description="Start time in UTC format (YYYY-MM-DD HH:MM:SS)"),
-    end: str = Query(..., description="End time in UTC format (YYYY-MM-DD HH:MM:SS)")
+    end: str = Query(..., description="End time in UTC format (YYYY-MM-DD HH:MM:SS)"),
+    granularity: Optional[str] = GRANULARITY_QUERY,
+    tz: Optional[str] = TZ_QUERY,
+    group_by: Optional[str] = GROUP_BY_QUERY,
 ):
+    granularity, zone = _period_params(granularity, tz)
     try:
         # Convert user input (UTC format) to ISO 8601
         try:
@@ -69,15 +238,32 @@ def get_cfr(
         except ValueError:
             return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
 
-        # Get data from MongoDB
-        github_events, jenkins_logs, prometheus_alerts = get_mongo_collections()
-
-        # Calculate CFR
-        result = calculate_cfr(start_iso, end_iso, github_events, jenkins_logs, prometheus_alerts)
+        # Calculate CFR (aggregated in MongoDB, only the counts come back)
+        result = await cached_async("cfr", start, end, _store_or(
+            lambda: event_store.calculate_cfr(start_iso, end_iso, granularity, zone, group_by),
+            lambda: calculate_cfr_from_db_async(start_iso, end_iso, granularity, zone, group_by)),
+            granularity=granularity, tz=zone and zone.key, group_by=group_by)
         return result
     except Exception as e:
         return {"error": str(e)}
     
+@app.get("/rollups")
+def rollups_endpoint(
+    start_date: str = Query(..., description="Format: YYYY-MM-DD"),
+    end_date: str = Query(..., description="Format: YYYY-MM-DD"),
+    job_name: Optional[str] = Query(None, description="Only this Jenkins job, e.g. prod-deploy"),
+    service: Optional[str] = Query(None, description="Only this service"),
+):
+    """
+    Daily deployments, failures, lead time and MTTR for whole days, read
+    from the precomputed rollups. deployment_failure_rate is failed /
+    finished deployments, not the change failure rate of /api/cfr.
+    """
+    result = get_rollup_metrics(start_date, end_date, job_name, service)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 def stringify_data(obj):
     """Recursively convert all non-string values to strings."""
     if isinstance(obj, dict):
@@ -89,33 +275,17 @@ def stringify_data(obj):
     else:
         return str(obj)
 
-def get_all_dora_metrics_internal(start_time: str, end_time: str):
+async def get_all_dora_metrics_internal(start_time: str, end_time: str, group_by: Optional[str] = None):
     """
     Internal function to get all DORA metrics for AI insights processing.
     """
     try:
-        # --- Step 0: Prepare ISO format for CFR ---
-        try:
-            start_iso = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_iso = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
-
-        # --- Step 1: Load data from MongoDB ---
-        github_events, jenkins_logs, prometheus_alerts = get_mongo_collections()
-
-        # --- Step 2: Collect all DORA metrics ---
-        deployment_freq = get_deployment(start_time, end_time)
-        lead_time = get_lead_time(start_time, end_time)
-        mttr = calculate_mttr_from_db(start_time, end_time)
-        cfr = calculate_cfr(start_iso, end_iso, github_events, jenkins_logs, prometheus_alerts)
-
-        dora_metrics = {
-            "deployment_frequency": deployment_freq,
-            "lead_time": lead_time,
-            "mttr": mttr,
-            "cfr": cfr
-        }
+        # One shared snapshot of the window feeds all four metrics (of every group)
+        dora_metrics = await cached_async("dora_metrics", start_time, end_time, _store_or(
+            lambda: event_store.compute_dora_metrics(start_time, end_time, group_by),
+            lambda: compute_dora_metrics_async(start_time, end_time, group_by)), group_by=group_by)
+        if "error" in dora_metrics:
+            return dora_metrics
 
         return {
             "dora_metrics": dora_metrics
@@ -125,37 +295,26 @@ def get_all_dora_metrics_internal(start_time: str, end_time: str):
         return {"error": str(e)}
 
 @app.get("/dora-metrics")
-def get_all_dora_metrics(
+async def get_all_dora_metrics(
     start_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS UTC"),
-    end_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS UTC")
+    end_time: str = Query(..., description="YYYY-MM-DD HH:MM:SS UTC"),
+    group_by: Optional[str] = GROUP_BY_QUERY,
 ):
     try:
-        # --- Step 0: Prepare ISO format for CFR ---
-        try:
-            start_iso = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_iso = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%SZ")
-        except ValueError:
-            return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
+        # --- Step 1: Collect all DORA metrics ---
+        result = await get_all_dora_metrics_internal(start_time, end_time, group_by)
+        if "error" in result:
+            return result
+        dora_metrics = result["dora_metrics"]
 
-        # --- Step 1: Load data from MongoDB ---
-        github_events, jenkins_logs, prometheus_alerts = get_mongo_collections()
+        # insights are written for one set of metrics, not a map of groups
+        if group_by:
+            return {"dora_metrics": dora_metrics}
 
-        # --- Step 2: Collect all DORA metrics ---
-        deployment_freq = get_deployment(start_time, end_time)
-        lead_time = get_lead_time(start_time, end_time)
-        mttr = calculate_mttr_from_db(start_time, end_time)
-        cfr = calculate_cfr(start_iso, end_iso, github_events, jenkins_logs, prometheus_alerts)
-
-        dora_metrics = {
-            "deployment_frequency": deployment_freq,
-            "lead_time": lead_time,
-            "mttr": mttr,
-            "cfr": cfr
-        }
-
-        # --- Step 3: Get AI Insights (pass original data types) ---
+        # --- Step 2: Get AI Insights (pass original data types) ---
+        # (blocking HTTP call, so it runs in a worker thread)
         try:
-            ai_insights = get_dora_ai_insights(dora_metrics)
+            ai_insights = await asyncio.to_thread(get_dora_ai_insights, dora_metrics)
         except Exception as e:
             ai_insights = {"error": f"Failed to get AI insights: {str(e)}"}
 
@@ -168,8 +327,34 @@ def get_all_dora_metrics(
         return {"error": str(e)}
 
 
+class MetricWindow(BaseModel):
+    start_time: str = Field(..., description="YYYY-MM-DD HH:MM:SS UTC")
+    end_time: str = Field(..., description="YYYY-MM-DD HH:MM:SS UTC")
+
+class DoraBatchRequest(BaseModel):
+    windows: List[MetricWindow] = Field(..., min_length=1, max_length=DORA_BATCH_MAX_WINDOWS)
+    metrics: List[Literal["deployment_frequency", "lead_time", "mttr", "cfr"]] = Field(
+        ["deployment_frequency", "lead_time", "mttr", "cfr"], min_length=1
+    )
+
+@app.post("/dora-metrics/batch")
+async def dora_metrics_batch(request: DoraBatchRequest):
+    """
+    Several windows (e.g. current vs previous period, last 7/30/90 days)
+    and metrics in one request. Each metric has the shape of its own
+    endpoint's response; results are in the order of the windows.
+    """
+    windows = [(w.start_time, w.end_time) for w in request.windows]
+    metrics = tuple(dict.fromkeys(request.metrics))
+    result = await _store_or(
+        lambda: event_store.compute_batch(windows, metrics),
+        lambda: compute_batch_async(windows, metrics))()
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 @app.get("/ai-insights")
-def ai_insights_endpoint(
+async def ai_insights_endpoint(
     start_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS"),
     end_time: str = Query(..., description="Format: YYYY-MM-DD HH:MM:SS")
 ):
@@ -178,7 +363,7 @@ def ai_insights_endpoint(
     """
     try:
         # Get all DORA metrics first
-        dora_metrics = get_all_dora_metrics_internal(start_time, end_time)
+        dora_metrics = await get_all_dora_metrics_internal(start_time, end_time)
         
         if "error" in dora_metrics:
             raise HTTPException(status_code=400, detail=dora_metrics["error"])
@@ -187,7 +372,7 @@ def ai_insights_endpoint(
         metrics_data = dora_metrics.get("dora_metrics", {})
         
         # Get AI insights
-        ai_insights = get_dora_ai_insights(metrics_data)
+        ai_insights = await asyncio.to_thread(get_dora_ai_insights, metrics_data)
         
         return {
             "ai_insights": ai_insights,
@@ -201,62 +386,90 @@ def ai_insights_endpoint(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI insights failed: {str(e)}")
 
-@app.get("/forecast")
-def forecast_endpoint(
-    metric: str = Query(..., description="Metric to forecast: deployment_frequency, lead_time, mttr, cfr"),
-    start_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
-    end_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
-    days: int = Query(30, ge=1, le=365, description="Days to forecast"),
-):
-    """
-    Forecast a DORA metric using Prophet.
-    metric: deployment_frequency | lead_time | mttr | cfr
-    """
+def _validate_window(start_time: str, end_time: str):
     try:
-        # validate inputs early
         datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
         datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format. Use YYYY-MM-DD HH:MM:SS")
 
+async def _await_forecast(metric: str, start_time: str, end_time: str, periods: int, engine: str):
+    """Run a forecast on the worker pool without holding a request thread."""
     try:
-        result = forecast_metric(metric, start_time, end_time, days)
-        return {
-            "metric": metric,
-            "days": days,
-            "result": result
-        }
+        job, _ = forecast_jobs.submit_forecast(metric, start_time, end_time, periods, engine)
+        return await asyncio.wrap_future(job.future)
+    except forecast_jobs.ForecastTimeout:
+        raise HTTPException(status_code=504, detail="Forecast timed out")
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Forecast failed: {str(e)}")
 
-@app.get("/forecast/{metric}")
-def forecast_endpoint_path(
-    metric: str,
+@app.post("/forecast/jobs", status_code=202)
+def forecast_job_submit(
+    metric: str = Query(..., description="Metric to forecast: deployment_frequency, lead_time, mttr, cfr"),
     start_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
     end_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
     periods: int = Query(30, ge=1, le=365, description="Days to forecast"),
+    engine: str = Query("prophet", description="Forecast engine: prophet | ets (fast NumPy Holt-Winters)"),
 ):
     """
-    Forecast a DORA metric using Prophet (path parameter version).
-    metric: deployment_frequency | lead_time | mttr | cfr
+    Queue a forecast on the worker pool and return its job id at once.
+    An identical job that is still in flight is reused.
     """
+    _validate_window(start_time, end_time)
     try:
-        # validate inputs early
-        datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-        datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid datetime format. Use YYYY-MM-DD HH:MM:SS")
-
-    try:
-        result = forecast_metric(metric, start_time, end_time, periods)
-        return {
-            "metric": metric,
-            "periods": periods,
-            "result": result
-        }
+        job, deduplicated = forecast_jobs.submit_forecast(metric, start_time, end_time, periods, engine)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Forecast failed: {str(e)}")
\ No newline at end of file
+    return {"job_id": job.job_id, "status": job.status, "deduplicated": deduplicated}
+
+@app.get("/forecast/jobs/{job_id}")
+def forecast_job_status(job_id: str):
+    """Status of a forecast job; includes the result once it is done."""
+    job = forecast_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired forecast job")
+    return job.to_dict()
+
+@app.get("/forecast")
+async def forecast_endpoint(
+    metric: str = Query(..., description="Metric to forecast: deployment_frequency, lead_time, mttr, cfr"),
+    start_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
+    end_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
+    days: int = Query(30, ge=1, le=365, description="Days to forecast"),
+    engine: str = Query("prophet", description="Forecast engine: prophet | ets (fast NumPy Holt-Winters)"),
+):
+    """
+    Forecast a DORA metric using Prophet (or engine=ets).
+    metric: deployment_frequency | lead_time | mttr | cfr
+    """
+    _validate_window(start_time, end_time)
+    result = await _await_forecast(metric, start_time, end_time, days, engine)
+    return {
+        "metric": metric,
+        "days": days,
+        "engine": engine,
+        "result": result
+    }
+
+@app.get("/forecast/{metric}")
+async def forecast_endpoint_path(
+    metric: str,
+    start_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
+    end_time: str = Query(..., description="UTC: YYYY-MM-DD HH:MM:SS"),
+    periods: int = Query(30, ge=1, le=365, description="Days to forecast"),
+    engine: str = Query("prophet", description="Forecast engine: prophet | ets (fast NumPy Holt-Winters)"),
+):
+    """
+    Forecast a DORA metric using Prophet or ETS (path parameter version).
+    metric: deployment_frequency | lead_time | mttr | cfr
+    """
+    _validate_window(start_time, end_time)
+    result = await _await_forecast(metric, start_time, end_time, periods, engine)
+    return {
+        "metric": metric,
+        "periods": periods,
+        "engine": engine,
+        "result": result
+    }
@@ -1,26 +1,78 @@
 # app.py
-from fastapi import FastAPI, Request, Header, HTTPException
-from collector.github_webhook import handle_github_webhook
-from collector.jenkins_webhook import handle_jenkins_webhook
-from collector.prometheus_webhook import handle_prometheus_webhook
-from collector.base_collector import ensure_indexes
+import logging
+from fastapi import FastAPI, Request, Header, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from collector.github_webhook import handle_github_webhook, check_github_signature
+from collector.github_webhook import delivery_key as github_delivery_key
+from collector.jenkins_webhook import handle_jenkins_webhook, check_jenkins_token
+from collector.jenkins_webhook import delivery_key as jenkins_delivery_key
+from collector.prometheus_webhook import handle_prometheus_webhook, check_alertmanager_token
+from collector.prometheus_webhook import delivery_key as alert_delivery_key
+from collector.dedup import seen_deliveries
+from collector.base_collector import ensure_indexes, close_client
+from collector.github_api import close_session
+from collector.ingest_buffer import ingest_buffer
+from collector.spool import spool, spool_drainer
+from config import SPOOL_ENABLED
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Anametric Collector API")
 
 @app.on_event("startup")
 def startup():
-    ensure_indexes()
+    try:
+        ensure_indexes()
+    except Exception as e:
+        # with the spool, webhooks are still accepted while Mongo is down
+        if not SPOOL_ENABLED:
+            raise
+        logger.warning(f"ensure_indexes failed, webhooks are spooled until Mongo is back: {e}")
+    if SPOOL_ENABLED:
+        spool_drainer.start()
+
+@app.on_event("shutdown")
+def shutdown():
+    spool_drainer.stop()
+    close_session()
+    ingest_buffer.close()
+    close_client()
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    """Write-behind buffer counters (pending, flushes, coalesced upserts) and spool backlog."""
+    stats = {"buffer": ingest_buffer.stats(), "dedup": seen_deliveries.stats()}
+    if SPOOL_ENABLED:
+        stats["spool"] = spool.stats()
+    return stats
 
 @app.post("/webhook/github")
-async def github_webhook(request: Request, x_hub_signature_256: str = Header(None)):
+async def github_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    x_hub_signature_256: str = Header(None),
+    x_github_delivery: str = Header(None),
+):
     body = await request.body()
     try:
         payload = await request.json()
     except Exception:
         raise HTTPException(400, "invalid json payload")
-    headers = {"x-hub-signature-256": x_hub_signature_256}
+    headers = {"x-hub-signature-256": x_hub_signature_256, "x-github-delivery": x_github_delivery}
     try:
-        res = handle_github_webhook(headers, body, payload)
+        check_github_signature(headers, body)
+        key = github_delivery_key(headers, payload)
+        if seen_deliveries.seen(key):
+            return {"status": "duplicate"}
+        if SPOOL_ENABLED:
+            res = {"status": "accepted", "seq": spool.append("github", payload)}
+        else:
+            # acknowledged once the PR is stored; the commit fetch from the
+            # GitHub API runs as a background task after the response
+            res = await run_in_threadpool(
+                handle_github_webhook, headers, body, payload, background_tasks.add_task
+            )
+        seen_deliveries.add(key)
         return res
     except PermissionError as e:
         raise HTTPException(403, str(e))
@@ -32,7 +84,15 @@ async def jenkins_webhook(request: Request):
     headers = dict(request.headers)
     payload = await request.json()
     try:
-        res = handle_jenkins_webhook(headers, payload)
+        check_jenkins_token(headers)
+        key = jenkins_delivery_key(payload)
+        if seen_deliveries.seen(key):
+            return {"status": "duplicate"}
+        if SPOOL_ENABLED:
+            res = {"status": "accepted", "seq": spool.append("jenkins", payload)}
+        else:
+            res = handle_jenkins_webhook(headers, payload)
+        seen_deliveries.add(key)
         return res
     except PermissionError as e:
         raise HTTPException(403, str(e))
@@ -44,7 +104,19 @@ async def prometheus_webhook(request: Request):
     headers = dict(request.headers)
     payload = await request.json()
     try:
-        res = handle_prometheus_webhook(headers, payload)
+        check_alertmanager_token(headers)
+        # drop alerts whose state was already delivered (repeat notifications)
+        alerts = payload.get("alerts", [])
+        keys = [alert_delivery_key(a) for a in alerts]
+        fresh = [(k, a) for k, a in zip(keys, alerts) if not seen_deliveries.seen(k)]
+        if alerts and not fresh:
+            return {"status": "duplicate"}
+        payload = {**payload, "alerts": [a for _, a in fresh]}
+        if SPOOL_ENABLED:
+            res = {"status": "accepted", "seq": spool.append("prometheus", payload)}
+        else:
+            res = handle_prometheus_webhook(headers, payload)
+        seen_deliveries.add(*(k for k, _ in fresh))
         return res
     except PermissionError as e:
         raise HTTPException(403, str(e))
@@ -0,0 +1,304 @@
+# collector/backfill.py
+"""
+Bulk-load historical exports without replaying webhooks:
+
+    python -m collector.backfill tests/sample_raw_data/*.json
+    python -m collector.backfill builds.ndjson --source jenkins --workers 8 --batch-size 2000
+
+Files are JSON arrays or NDJSON (one record per line) and are streamed, so
+memory stays flat however large the export is. Records may be stored
+documents (the shape of tests/sample_raw_data/*.json) or raw webhook
+payloads; both go through the collector handlers' mappings. Batches are
+written concurrently with upsert_many, so re-running is harmless.
+
+A webhook-shaped PR record only carries the number of its commits, so it
+is stored without them and never overwrites commits already stored for
+the PR. With --enrich-prs those PRs are fetched from GitHub like the
+webhook does (enrich_merged_pr); otherwise they are counted in the report.
+
+Progress is checkpointed per file in --state (byte offset and record
+count of the last contiguous written batch); an interrupted run resumes
+where it stopped. The commit index and daily rollups are rebuilt at the
+end unless --skip-derived is given.
+"""
+import argparse
+import codecs
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collector import commit_index, rollups
+from collector.base_collector import upsert_many, ensure_indexes
+from collector.github_webhook import enrich_merged_pr, normalize_pr
+from collector.jenkins_webhook import normalize_build
+from collector.prometheus_webhook import normalize_alert
+from collector.utils import to_datetime
+
+CHUNK_SIZE = 1 << 20
+_SEPARATORS = " \t\r\n,"
+
+
+# --- record mapping (same documents the webhook handlers store) ---
+def _jenkins_doc(r):
+    if "build_id" not in r:
+        return normalize_build(r)
+    return {
+        "build_id": r["build_id"],
+        "job_name": r.get("job_name"),
+        "service": r.get("service"),
+        "status": r.get("status"),
+        "timestamp": to_datetime(r.get("timestamp")),
+        "commit_sha": r.get("commit_sha"),
+    }
+
+def _alert_doc(r):
+    if "alert_id" not in r:
+        return normalize_alert(r)
+    doc = dict(r)
+    doc["startsAt"] = to_datetime(r.get("startsAt"))
+    doc["endsAt"] = to_datetime(r.get("endsAt"))
+    return doc
+
+def _github_doc(r):
+    if "pr_id" in r:
+        doc = dict(r)
+        doc["created_at"] = to_datetime(r.get("created_at"))
+        doc["merged_at"] = to_datetime(r.get("merged_at"))
+    else:
+        pr = r.get("pull_request") or r
+        if not pr.get("merged"):
+            return None
+        doc = normalize_pr(pr)
+        r = pr
+    commits = r.get("commits")
+    if isinstance(commits, list):
+        doc["commits"] = [
+            {"sha": c.get("sha"), "timestamp": to_datetime(c.get("timestamp"))}
+            for c in commits if isinstance(c, dict)
+        ]
+    else:
+        # a webhook payload's commits is a count: leave the stored list alone
+        doc.pop("commits", None)
+    return doc
+
+def _commit_fetch(record, doc):
+    """enrich_merged_pr arguments for a PR stored without its commits, else None."""
+    if "commits" in doc:
+        return None
+    pr = record.get("pull_request") or record
+    return doc["pr_id"], doc.get("merged_at"), pr.get("commits_url"), None
+
+# source -> (collection, id field, mapper)
+SOURCES = {
+    "github": ("github_events", "pr_id", _github_doc),
+    "jenkins": ("jenkins_deployments", "build_id", _jenkins_doc),
+    "prometheus": ("prometheus_alerts", "alert_id", _alert_doc),
+}
+
+def detect_source(path):
+    name = os.path.basename(path).lower()
+    for source, (collection, _, _) in SOURCES.items():
+        if source in name or collection in name:
+            return source
+    return None
+
+# --- streaming readers: yield (record, byte offset just after it) ---
+def _iter_ndjson(f, offset):
+    f.seek(offset)
+    for line in iter(f.readline, b""):
+        offset += len(line)
+        line = line.strip()
+        if line:
+            yield json.loads(line), offset
+
+def _iter_json_array(f, offset):
+    """Incremental parse of a top-level JSON array, one element at a time."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    f.seek(offset)
+    # base: file offset of buf[mark]; only the text between two records is
+    # re-encoded to move it, never the whole buffer
+    buf, pos, mark, base = "", 0, 0, offset
+    started = offset > 0
+    eof = False
+
+    def refill():
+        nonlocal buf, pos, mark, base, eof
+        chunk = f.read(CHUNK_SIZE)
+        eof = not chunk
+        base += len(buf[mark:pos].encode())
+        buf, pos, mark = buf[pos:] + utf8.decode(chunk, final=eof), 0, 0
+
+    while True:
+        while True:  # skip whitespace and separators
+            while pos < len(buf) and buf[pos] in _SEPARATORS:
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            refill()
+        if pos >= len(buf) or (started and buf[pos] == "]"):
+            return
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("expected a JSON array or NDJSON")
+            started = True
+            pos += 1
+            continue
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            refill()  # element spans the chunk boundary
+            continue
+        base += len(buf[mark:end].encode())
+        pos = mark = end
+        yield record, base
+
+def iter_records(f, offset=0):
+    """Sniff the format from the first non-blank byte and stream records."""
+    f.seek(0)
+    head = f.read(64).lstrip()
+    is_array = head.startswith(b"[")
+    return _iter_json_array(f, offset) if is_array else _iter_ndjson(f, offset)
+
+# --- resume state ---
+def _load_state(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def _save_state(path, state):
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+# --- loading ---
+def _enrich(fetches, counts):
+    """Fetch the commits of PRs stored without them; failures are counted, not raised."""
+    for args in fetches:
+        if not args[2]:
+            counts["failed"] += 1
+            print(f"PR {args[0]}: no commits_url to fetch its commits from", file=sys.stderr)
+            continue
+        try:
+            enrich_merged_pr(*args)
+            counts["enriched"] += 1
+        except Exception as e:
+            counts["failed"] += 1
+            print(f"PR {args[0]}: fetching commits failed: {e}", file=sys.stderr)
+
+def backfill_file(path, source, pool, workers, batch_size, state, state_path, report_every=5.0, enrich_prs=False):
+    collection, id_field, to_doc = SOURCES[source]
+    key = os.path.abspath(path)
+    progress = state.setdefault(key, {"offset": 0, "records": 0, "done": False})
+    if progress["done"]:
+        print(f"{path}: already loaded ({progress['records']} records), skipping")
+        return 0
+
+    # [(future, end offset, records read so far, commit fetches)] in file order;
+    # the checkpoint only moves past a batch once every batch before it has
+    # been written (and, with enrich_prs, its PRs enriched)
+    in_flight = []
+    written = skipped = 0
+    without_commits = {"stored": 0, "enriched": 0, "failed": 0}
+    records = resumed_at = progress["records"]
+    started = last_report = time.perf_counter()
+
+    def drain(block):
+        nonlocal written
+        while in_flight and (block or in_flight[0][0].done()):
+            future, end_offset, count, fetches = in_flight.pop(0)
+            written += future.result()
+            if enrich_prs:
+                _enrich(fetches, without_commits)
+            progress["offset"], progress["records"] = end_offset, count
+            _save_state(state_path, state)
+
+    with open(path, "rb") as f:
+        batch, fetches, end_offset = [], [], progress["offset"]
+        for record, end_offset in iter_records(f, progress["offset"]):
+            records += 1
+            doc = to_doc(record) if isinstance(record, dict) else None
+            if not doc or doc.get(id_field) is None:
+                skipped += 1
+                continue
+            batch.append(doc)
+            fetch = _commit_fetch(record, doc) if source == "github" else None
+            if fetch:
+                without_commits["stored"] += 1
+                fetches.append(fetch)
+            if len(batch) >= batch_size:
+                in_flight.append((pool.submit(upsert_many, collection, batch, id_field), end_offset, records, fetches))
+                batch, fetches = [], []
+                # bound memory: at most two batches per worker in flight
+                drain(block=len(in_flight) >= workers * 2)
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    rate = (records - resumed_at) / (now - started)
+                    print(f"{path}: {records} records read, {rate:,.0f} records/s", file=sys.stderr)
+                    last_report = now
+        if batch:
+            in_flight.append((pool.submit(upsert_many, collection, batch, id_field), end_offset, records, fetches))
+        drain(block=True)
+
+    progress["done"] = True
+    progress["records"] = records
+    _save_state(state_path, state)
+    elapsed = time.perf_counter() - started
+    loaded = records - resumed_at
+    print(
+        f"{path}: {loaded} records -> {collection} ({written} upserted/modified, {skipped} skipped) "
+        f"in {elapsed:.1f}s, {loaded / elapsed if elapsed else 0:,.0f} records/s"
+    )
+    if without_commits["stored"]:
+        if enrich_prs:
+            print(f"{path}: {without_commits['stored']} PRs without a commit list: "
+                  f"{without_commits['enriched']} enriched from GitHub, {without_commits['failed']} failed")
+        else:
+            print(f"{path}: {without_commits['stored']} PRs without a commit list kept their stored commits "
+                  f"(--enrich-prs fetches them from GitHub)")
+    return loaded
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load historical GitHub/Jenkins/Prometheus exports")
+    parser.add_argument("files", nargs="+", help="JSON array or NDJSON files")
+    parser.add_argument("--source", choices=list(SOURCES), help="default: guessed from each file name")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4, help="concurrent upsert_many batches")
+    parser.add_argument("--state", default=".backfill_state.json", help="resume file ('' to disable)")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--skip-derived", action="store_true", help="do not rebuild the commit index and rollups")
+    parser.add_argument("--enrich-prs", action="store_true",
+                        help="fetch the commits of webhook-shaped PR records from GitHub")
+    args = parser.parse_args()
+
+    jobs = []
+    for path in args.files:
+        source = args.source or detect_source(path)
+        if not source:
+            parser.error(f"cannot tell the source of {path}; pass --source")
+        jobs.append((path, source))
+
+    state = {} if args.restart else _load_state(args.state)
+    ensure_indexes()
+    started = time.perf_counter()
+    total = 0
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="backfill") as pool:
+        for path, source in jobs:
+            total += backfill_file(path, source, pool, args.workers, args.batch_size, state, args.state,
+                                   enrich_prs=args.enrich_prs)
+    elapsed = time.perf_counter() - started
+    print(f"loaded {total} records in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} records/s)")
+
+    if not args.skip_derived:
+        print(f"commit index: {commit_index.rebuild()} upserts")
+        print(f"rollups: {rollups.rebuild()} buckets")
+
+if __name__ == "__main__":
+    main()
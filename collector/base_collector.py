@@ -1,15 +1,181 @@
 # collector/base_collector.py
-from pymongo import MongoClient, ReplaceOne
-from config import MONGO_URI, MONGO_DB
+import threading
+from datetime import datetime, timezone
+from pymongo import AsyncMongoClient, MongoClient, UpdateOne
+from pymongo.monitoring import ConnectionPoolListener
+from config import (
+    MONGO_URI,
+    MONGO_DB,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE,
+)
 from pymongo.errors import DuplicateKeyError
 
 _client = None
+_client_lock = threading.Lock()
+_async_client = None
 
-def get_db():
+
+class _PoolStatsListener(ConnectionPoolListener):
+    """
+    Counts connection pool events so the pool can be sized from real load.
+    pymongo calls these from its own threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.created = 0
+            self.closed = 0
+            self.checked_out = 0
+            self.checked_in = 0
+            self.checkout_failed = 0
+            self.in_use = 0
+            self.max_in_use = 0
+            self.pools_cleared = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connections_open": self.created - self.closed,
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "checked_out": self.checked_out,
+                "checked_in": self.checked_in,
+                "checkout_failed": self.checkout_failed,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "pools_cleared": self.pools_cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failed += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_in += 1
+            self.in_use -= 1
+
+
+_pool_stats = _PoolStatsListener()
+
+
+def _client_options():
+    return dict(
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        readPreference=MONGO_READ_PREFERENCE,
+        event_listeners=[_pool_stats],
+    )
+
+def get_client():
+    """
+    Return the process-wide MongoClient, creating it on first use.
+    MongoClient is thread-safe and owns the connection pool, so every
+    collector and processor must share this one instead of building its own.
+    """
     global _client
     if _client is None:
-        _client = MongoClient(MONGO_URI)
-    return _client[MONGO_DB]
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI, **_client_options())
+    return _client
+
+def get_db():
+    return get_client()[MONGO_DB]
+
+def close_client():
+    """Close the shared client (call on app shutdown)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def get_async_client():
+    """
+    Return the process-wide AsyncMongoClient for async def endpoints.
+    It is bound to the event loop it is first used on, so create it from
+    inside that loop (the API's); it has its own pool with the same limits.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncMongoClient(MONGO_URI, **_client_options())
+    return _async_client
+
+def get_async_db():
+    return get_async_client()[MONGO_DB]
+
+async def close_async_client():
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+def get_pool_stats():
+    """
+    Pool configuration plus live counters from the connection pool listener.
+    max_in_use close to max_pool_size or a non-zero checkout_failed means
+    the pool is too small for the current load.
+    """
+    stats = _pool_stats.snapshot()
+    stats.update({
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "read_preference": MONGO_READ_PREFERENCE,
+        "client_initialized": _client is not None,
+        "async_client_initialized": _async_client is not None,
+    })
+    return stats
 
 def ensure_indexes():
     """
@@ -21,24 +187,64 @@ def ensure_indexes():
     db.jenkins_deployments.create_index("build_id", unique=True, sparse=True)
     db.prometheus_alerts.create_index("alert_id", unique=True, sparse=True)
 
+    # Query indexes; timestamps are BSON dates (see collector/migrate_timestamps.py)
+    # DF / forecast series: job_name + status equality, timestamp range;
+    # build_id lets keyset pages sort on (timestamp, build_id) from the index
+    db.jenkins_deployments.create_index([("job_name", 1), ("status", 1), ("timestamp", 1), ("build_id", 1)])
+    # CFR series: job_name equality, timestamp range
+    db.jenkins_deployments.create_index([("job_name", 1), ("timestamp", 1)])
+    # LT / MTTR: status equality, timestamp range
+    db.jenkins_deployments.create_index([("status", 1), ("timestamp", 1)])
+    # CFR aggregation: timestamp range over all jobs
+    db.jenkins_deployments.create_index([("timestamp", 1)])
+    db.jenkins_deployments.create_index("commit_sha")
+    # MTTR: severity equality, startsAt range
+    db.prometheus_alerts.create_index([("severity", 1), ("startsAt", 1)])
+    db.prometheus_alerts.create_index("labels.commit")
+    # multikey index used by the CFR $lookup on commits.sha
+    db.github_events.create_index("commits.sha")
+    db.github_events.create_index("merged_at")
+    # per-commit lead-time index (collector/commit_index.py)
+    db.commit_deployments.create_index("sha", unique=True)
+    db.commit_deployments.create_index([("commit_time", 1), ("first_deploy_time", 1)])
+    db.commit_deployments.create_index("first_deploy_time")
+    # daily DORA rollups (collector/rollups.py)
+    db.metric_rollups.create_index([("day", 1), ("job_name", 1), ("service", 1)], unique=True)
+    # incremental refresh of the API's event store (processor/event_store.py)
+    for name in ("jenkins_deployments", "prometheus_alerts", "commit_deployments"):
+        db[name].create_index(INGESTED_AT)
+    # capped log of ingested time ranges tailed by the API's metric cache
+    if "cache_invalidations" not in db.list_collection_names():
+        db.create_collection("cache_invalidations", capped=True, size=1024 * 1024, max=10000)
+
+# Every write stamps the document with the time it was written, so readers
+# such as the API's in-memory event store can fetch only what changed
+INGESTED_AT = "ingested_at"
+
+def ingest_time():
+    """Write time for INGESTED_AT (naive UTC, like every stored date)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 def upsert_one(collection_name, filter_doc, doc):
     db = get_db()
-    return db[collection_name].update_one(filter_doc, {"$set": doc}, upsert=True)
+    return db[collection_name].update_one(filter_doc, {"$set": {**doc, INGESTED_AT: ingest_time()}}, upsert=True)
 
 def upsert_many(collection_name, docs, id_field):
     """
     Bulk upsert by id_field to avoid duplicates.
     id_field: unique key in docs like 'pr_id' or 'build_id' or 'alert_id'
+    Fields a doc leaves out keep their stored value, like upsert_one.
     """
     if not docs:
         return 0
     db = get_db()
+    now = ingest_time()
     ops = []
     for d in docs:
         key = d.get(id_field)
         if not key:
             continue
-        ops.append(ReplaceOne({id_field: key}, d, upsert=True))
+        ops.append(UpdateOne({id_field: key}, {"$set": {**d, INGESTED_AT: now}}, upsert=True))
     if not ops:
         return 0
     res = db[collection_name].bulk_write(ops, ordered=False)
@@ -0,0 +1,180 @@
+# collector/commit_index.py
+"""
+Per-commit lead-time index, keyed by SHA:
+
+    {sha, commit_time, pr_id, merged_at, target_branch, repo,
+     first_deploy_time, first_deploy_service}
+
+The GitHub webhook fills in commit/merge times, the Jenkins webhook the
+first successful prod deployment. Lead time for a window is then one
+indexed range query (see processor/lt_processor.py) instead of scanning
+every PR and joining deployments in Python.
+
+Backfill from the raw collections with:
+
+    python -m collector.commit_index rebuild
+"""
+import argparse
+from pymongo import UpdateOne
+from collector.base_collector import get_db, ingest_time, INGESTED_AT
+from collector.utils import parse_iso
+from db import COMMIT_INDEX
+
+PROD_JOB = "prod-deploy"
+
+
+def _pr_commit_fields(pr_doc):
+    rows = []
+    commits = pr_doc.get("commits")
+    if not isinstance(commits, list):
+        return rows
+    merged_at = parse_iso(pr_doc.get("merged_at"))
+    for c in commits:
+        sha = c.get("sha") if isinstance(c, dict) else None
+        if not sha:
+            continue
+        fields = {
+            "pr_id": pr_doc.get("pr_id"),
+            "commit_time": parse_iso(c.get("timestamp")),
+            "target_branch": pr_doc.get("target_branch"),
+            "repo": pr_doc.get("repo"),
+        }
+        if merged_at:
+            fields["merged_at"] = merged_at
+        rows.append((sha, fields))
+    return rows
+
+def _pr_commit_ops(pr_doc):
+    now = ingest_time()
+    return [
+        UpdateOne({"sha": sha}, {"$set": {**fields, INGESTED_AT: now}}, upsert=True)
+        for sha, fields in _pr_commit_fields(pr_doc)
+    ]
+
+def _deploy_update(deploy_time):
+    # $min keeps the earliest deployment even if webhooks arrive out of order
+    return {"$min": {"first_deploy_time": deploy_time}, "$set": {INGESTED_AT: ingest_time()}}
+
+def is_prod_success(deploy_doc):
+    return deploy_doc.get("job_name") == PROD_JOB and deploy_doc.get("status") == "SUCCESS"
+
+def record_pr(pr_doc):
+    """
+    Upsert commit and merge times for every commit of a merged PR.
+    Returns [(row_before, row_after)] so derived data can apply the delta.
+    """
+    rows = _pr_commit_fields(pr_doc)
+    if not rows:
+        return []
+    col = get_db()[COMMIT_INDEX]
+    before = {r["sha"]: r for r in col.find({"sha": {"$in": [sha for sha, _ in rows]}}, {"_id": 0})}
+    now = ingest_time()
+    col.bulk_write(
+        [UpdateOne({"sha": sha}, {"$set": {**fields, INGESTED_AT: now}}, upsert=True) for sha, fields in rows],
+        ordered=False,
+    )
+
+    changes = []
+    for sha, fields in rows:
+        old = before.get(sha)
+        changes.append((old, dict(old or {"sha": sha}, **fields)))
+    return changes
+
+def deployment_changes(deploy_docs):
+    """
+    First successful prod deployment of each commit in a batch of builds:
+    [(row_before, row_after)] for the commits whose row moves, from one read.
+    Nothing is written; pass the result to write_deployments.
+    """
+    firsts = {}  # sha -> (deploy_time, service) of the batch's earliest deployment
+    for doc in deploy_docs:
+        sha = doc.get("commit_sha")
+        deploy_time = parse_iso(doc.get("timestamp"))
+        if not sha or not deploy_time or not is_prod_success(doc):
+            continue
+        if sha not in firsts or deploy_time < firsts[sha][0]:
+            firsts[sha] = (deploy_time, doc.get("service"))
+    if not firsts:
+        return []
+    col = get_db()[COMMIT_INDEX]
+    before = {r["sha"]: r for r in col.find({"sha": {"$in": list(firsts)}}, {"_id": 0})}
+
+    changes = []
+    for sha, (deploy_time, service) in firsts.items():
+        old = before.get(sha)
+        previous = (old or {}).get("first_deploy_time")
+        if previous is not None and previous <= deploy_time:
+            continue
+        changes.append((old, dict(old or {"sha": sha}, first_deploy_time=deploy_time, first_deploy_service=service)))
+    return changes
+
+def write_deployments(changes):
+    """Write deployment_changes' rows; writing the same changes again is a no-op."""
+    ops = []
+    for _, row in changes:
+        sha, deploy_time = row["sha"], row["first_deploy_time"]
+        ops.append(UpdateOne({"sha": sha}, _deploy_update(deploy_time), upsert=True))
+        ops.append(UpdateOne(
+            {"sha": sha, "first_deploy_time": deploy_time},
+            {"$set": {"first_deploy_service": row.get("first_deploy_service"), INGESTED_AT: ingest_time()}},
+        ))
+    if ops:
+        # ordered: the service is only set where this deployment won the $min
+        get_db()[COMMIT_INDEX].bulk_write(ops, ordered=True)
+
+def rebuild(batch_size=1000):
+    """Rebuild the index from github_events and jenkins_deployments."""
+    db = get_db()
+    col = db[COMMIT_INDEX]
+    written = 0
+
+    def flush(ops):
+        if ops:
+            col.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    ops = []
+    for pr in db.github_events.find({"merged_at": {"$ne": None}}, {"pr_id": 1, "merged_at": 1, "commits": 1, "target_branch": 1, "repo": 1}):
+        ops.extend(_pr_commit_ops(pr))
+        if len(ops) >= batch_size:
+            written += flush(ops)
+            ops = []
+    written += flush(ops)
+
+    ops = []
+    first_deploys = db.jenkins_deployments.aggregate([
+        {"$match": {"job_name": PROD_JOB, "status": "SUCCESS", "commit_sha": {"$ne": None}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": "$commit_sha",
+            "first_deploy_time": {"$first": "$timestamp"},
+            "first_deploy_service": {"$first": "$service"},
+        }},
+    ])
+    for row in first_deploys:
+        deploy_time = parse_iso(row["first_deploy_time"])
+        if deploy_time:
+            ops.append(UpdateOne(
+                {"sha": row["_id"]},
+                {"$set": {
+                    "first_deploy_time": deploy_time,
+                    "first_deploy_service": row.get("first_deploy_service"),
+                    INGESTED_AT: ingest_time(),
+                }},
+                upsert=True,
+            ))
+        if len(ops) >= batch_size:
+            written += flush(ops)
+            ops = []
+    written += flush(ops)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the commit -> deployment lead-time index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"{COMMIT_INDEX}: {rebuild(args.batch_size)} upserts")
+
+if __name__ == "__main__":
+    main()
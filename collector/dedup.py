@@ -0,0 +1,59 @@
+# collector/dedup.py
+"""
+Bounded memory of recently accepted webhook deliveries, so retries and
+repeat notifications are answered without touching the spool or Mongo.
+
+Keys come from the handlers' delivery_key() functions: the GitHub
+delivery id, Jenkins build id + status, Alertmanager alert id + status.
+A key is remembered only after its delivery was accepted, so a delivery
+that failed is processed again when the sender retries. This is a
+per-process filter; the idempotent upserts remain the real guarantee.
+"""
+import threading
+import time
+from collections import OrderedDict
+from config import DEDUP_MAX_ENTRIES, DEDUP_TTL_SECONDS
+
+
+class SeenSet:
+    """LRU set with a TTL per key."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._keys = OrderedDict()  # key -> expires_at
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def seen(self, key) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._keys.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                del self._keys[key]
+                return False
+            self.duplicates += 1
+            return True
+
+    def add(self, *keys):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key in keys:
+                self._keys[key] = expires_at
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._keys),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "duplicates_dropped": self.duplicates,
+            }
+
+
+seen_deliveries = SeenSet(DEDUP_MAX_ENTRIES, DEDUP_TTL_SECONDS)
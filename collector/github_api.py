@@ -0,0 +1,96 @@
+# collector/github_api.py
+"""
+Small GitHub REST client for PR commit enrichment.
+
+One pooled requests.Session is shared by all enrichment tasks. Responses
+are remembered with their ETag so a repeated fetch (webhook redelivery,
+reopened/re-merged PR) is a conditional request: GitHub answers 304
+without a body, and 304s do not count against the rate limit.
+"""
+import logging
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from config import GITHUB_TOKEN, GITHUB_API_TIMEOUT_SECONDS, GITHUB_ETAG_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+PER_PAGE = 100  # GitHub's maximum; the default page holds only 30 commits
+MAX_PAGES = 50  # safety net against a pagination loop
+
+_session = None
+_session_lock = threading.Lock()
+_etags = OrderedDict()  # url -> (etag, decoded body, next page url)
+_etag_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+                session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+                session.headers["Accept"] = "application/vnd.github+json"
+                if GITHUB_TOKEN:
+                    session.headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+                _session = session
+    return _session
+
+def _remember(url, etag, body, next_url):
+    with _etag_lock:
+        _etags[url] = (etag, body, next_url)
+        _etags.move_to_end(url)
+        while len(_etags) > GITHUB_ETAG_CACHE_MAX_ENTRIES:
+            _etags.popitem(last=False)
+
+def get_json(url, params=None):
+    """
+    GET url and return (decoded body, next page url or None). Uses
+    If-None-Match when this URL was fetched before and returns the
+    remembered page on 304.
+    """
+    session = get_session()
+    request = requests.Request("GET", url, params=params)
+    full_url = session.prepare_request(request).url
+    with _etag_lock:
+        cached = _etags.get(full_url)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+
+    r = session.get(url, params=params, headers=headers, timeout=GITHUB_API_TIMEOUT_SECONDS)
+    if r.status_code == 304 and cached:
+        with _etag_lock:
+            if full_url in _etags:
+                _etags.move_to_end(full_url)
+        return cached[1], cached[2]
+    r.raise_for_status()
+    body = r.json()
+    next_url = r.links.get("next", {}).get("url")
+    if r.headers.get("ETag"):
+        _remember(full_url, r.headers["ETag"], body, next_url)
+    return body, next_url
+
+def get_paginated(url):
+    """All items of a paginated list endpoint, following the Link: rel="next" headers."""
+    items = []
+    params = {"per_page": PER_PAGE}
+    for _ in range(MAX_PAGES):
+        page, next_url = get_json(url, params)
+        items.extend(page)
+        if not next_url:
+            break
+        # the next link already carries per_page and page
+        url, params = next_url, None
+    else:
+        logger.warning(f"Stopped following pagination of {url} after {MAX_PAGES} pages")
+    return items
+
+def close_session():
+    """Close the pooled session (call on app shutdown)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
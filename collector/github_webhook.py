@@ -1,47 +1,111 @@
 # collector/github_webhook.py
+import logging
+import requests
 from collector.base_collector import upsert_one, upsert_many
-from collector.utils import verify_github_signature
+from collector.commit_index import record_pr
+from collector.github_api import get_paginated
+from collector.ingest_buffer import ingest_buffer
+from collector.rollups import apply_lead_time
+from collector.utils import verify_github_signature, parse_iso
 from config import GITHUB_WEBHOOK_SECRET
-import requests
+from processor.metric_cache import notify_ingest
+
+logger = logging.getLogger(__name__)
+
+ingest_buffer.register("github_events", "pr_id")
+
+# GitHub answers 403 or 429 when the rate limit is exhausted
+_RETRYABLE_STATUSES = {403, 429}
+
+
+def enrich_merged_pr(pr_id, merged_at, commits_url, fallback_commits=None):
+    """
+    Fetch every commit of a merged PR (all pages) and update the PR document,
+    the commit index, the lead-time rollups and the metric caches.
+    Scheduled after the webhook has been acknowledged; safe to re-run.
+
+    If the commits cannot be fetched the stored document is left alone, so
+    a redelivery during a GitHub outage never blanks them out. Transient
+    failures (network, 5xx, rate limit) are raised for the caller to retry
+    (the spool does); a PR GitHub refuses to serve is only logged.
+    """
+    if commits_url:
+        try:
+            commits = [
+                {"sha": c["sha"], "timestamp": parse_iso(c["commit"]["committer"]["date"])}
+                for c in get_paginated(commits_url)
+            ]
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status is None or status >= 500 or status in _RETRYABLE_STATUSES:
+                raise
+            logger.warning(f"Fetching commits of PR {pr_id} failed, keeping the stored ones: {e}")
+            return
+    elif isinstance(fallback_commits, list):
+        # some senders inline the commit list; GitHub only sends their number
+        commits = fallback_commits
+    else:
+        logger.warning(f"PR {pr_id} has no commits_url, keeping the stored commits")
+        return
 
-def handle_github_webhook(request_headers: dict, request_body: bytes, payload: dict):
-    # Validate signature
+    doc = {"pr_id": pr_id, "merged_at": merged_at, "commits": commits}
+    upsert_one("github_events", {"pr_id": pr_id}, {"commits": commits})
+    apply_lead_time(record_pr(doc))
+    # Merging changes CFR/LT for every window holding one of the PR's
+    # commits or their later deployments
+    times = [c.get("timestamp") for c in commits if isinstance(c, dict)] + [merged_at]
+    notify_ingest(min((t for t in times if t), default=None))
+
+def check_github_signature(request_headers: dict, request_body: bytes):
     sig = request_headers.get("x-hub-signature-256")
     if not verify_github_signature(GITHUB_WEBHOOK_SECRET, sig, request_body):
         raise PermissionError("Invalid GitHub signature")
 
+def handle_github_webhook(request_headers: dict, request_body: bytes, payload: dict, background=None):
+    """
+    background: optional scheduler such as FastAPI's BackgroundTasks.add_task.
+    When given, the commit fetch runs after the response has been sent;
+    otherwise it runs inline (backfills, scripts).
+    """
+    check_github_signature(request_headers, request_body)
+    return ingest_github_event(payload, background)
+
+def delivery_key(request_headers: dict, payload: dict) -> str:
+    """GitHub keeps X-GitHub-Delivery on redeliveries; fall back to the PR state."""
+    delivery = request_headers.get("x-github-delivery")
+    if delivery:
+        return f"github:{delivery}"
+    pr = payload.get("pull_request") or {}
+    return f"github:{pr.get('number')}:{payload.get('action')}:{pr.get('merged_at')}"
+
+def normalize_pr(pr: dict) -> dict:
+    """Map a pull_request object to a github_events document (without commits)."""
+    return {
+        "pr_id": pr.get("number"),
+        "title": pr.get("title"),
+        "author": pr.get("user", {}).get("login"),
+        "created_at": parse_iso(pr.get("created_at")),
+        "merged_at": parse_iso(pr.get("merged_at")),
+        "target_branch": pr.get("base", {}).get("ref"),
+        "repo": pr.get("base", {}).get("repo", {}).get("full_name"),
+    }
+
+def ingest_github_event(payload: dict, background=None):
+    """Store an already authenticated GitHub webhook payload."""
     # Only act on merged PRs
     action = payload.get("action")
     pr = payload.get("pull_request") or {}
     if action == "closed" and pr.get("merged"):
-        commits_url = pr.get("commits_url")
-        # Optional: If repo is private, use PAT; else unauth is fine for public
-        headers = {}
-        # If you want to fetch commits via GitHub API, you can use a token from env (not shown here)
-        commits = []
-        try:
-            r = requests.get(commits_url, headers=headers, timeout=10)
-            r.raise_for_status()
-            commits_data = r.json()
-            commits = [
-                {"sha": c["sha"], "timestamp": c["commit"]["committer"]["date"]}
-                for c in commits_data
-            ]
-        except Exception:
-            # fall back to using 'commits' in payload if available (some events include commits)
-            commits = pr.get("commits", [])
-
-        doc = {
-            "pr_id": pr.get("number"),
-            "title": pr.get("title"),
-            "author": pr.get("user", {}).get("login"),
-            "created_at": pr.get("created_at"),
-            "merged_at": pr.get("merged_at"),
-            "commits": commits,
-            "target_branch": pr.get("base", {}).get("ref"),
-        }
-
-        # upsert by pr_id to prevent duplicates
-        upsert_one("github_events", {"pr_id": doc["pr_id"]}, doc)
+        doc = normalize_pr(pr)
+
+        # upsert by pr_id (buffered) to prevent duplicates; commits are filled
+        # in by enrich_merged_pr so a redelivery never blanks them out
+        ingest_buffer.add("github_events", doc)
+
+        args = (doc["pr_id"], doc["merged_at"], pr.get("commits_url"), pr.get("commits"))
+        if background is not None:
+            background(enrich_merged_pr, *args)
+            return {"status": "ok", "pr_id": doc["pr_id"], "commits": "queued"}
+        enrich_merged_pr(*args)
         return {"status": "ok", "pr_id": doc["pr_id"]}
     return {"status": "ignored"}
@@ -0,0 +1,197 @@
+# collector/ingest_buffer.py
+"""
+Write-behind buffer for webhook ingest.
+
+Handlers add documents instead of writing them one round trip at a time.
+Upserts of the same id are coalesced (later fields win, like repeated
+$set), and each collection is flushed with one unordered bulk_write when
+INGEST_BUFFER_MAX_DOCS documents are pending, every
+INGEST_BUFFER_FLUSH_SECONDS, and on shutdown.
+
+Derived data (rollups, commit index, metric caches) needs the previous
+version of each document, so a flush reads the current versions of the
+batch with one $in query first and then hands [(before, after)] to the
+hooks registered for that collection. A hook that fails keeps its pairs
+and is retried first on the next flush (pending_hooks in stats), since
+the pairs cannot be rebuilt once the documents are written. A retry runs
+the hook over every pair again, so hooks must be safe to repeat; one
+whose first step reads state that its later steps change raises
+HookRetry with the rest of its work instead. Flushes are serialised
+within a process; run one collector process per database if rollups must
+stay exact under concurrent redeliveries.
+
+INGEST_BUFFER_FLUSH_SECONDS <= 0 turns the buffer into write-through:
+every add() flushes before returning.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from pymongo import UpdateOne
+from collector.base_collector import get_db, ingest_time, INGESTED_AT
+from config import INGEST_BUFFER_MAX_DOCS, INGEST_BUFFER_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class HookRetry(Exception):
+    """Raised by a post-flush hook that got part way: resume() is retried instead of the hook."""
+
+    def __init__(self, resume, cause):
+        super().__init__(str(cause))
+        self.resume = resume
+
+
+class IngestBuffer:
+    def __init__(self, max_docs: int, flush_seconds: float):
+        self.max_docs = max_docs
+        self.flush_seconds = flush_seconds
+        self._pending = {}  # collection -> OrderedDict(id -> doc)
+        self._id_fields = {}  # collection -> id field
+        self._hooks = {}  # collection -> [hook(pairs)]
+        self._hook_retries = []  # [(collection, callable)] of hooks that failed
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.flushed_docs = 0
+        self.coalesced = 0
+        self.failed_flushes = 0
+        self.failed_hooks = 0
+        self.last_flush_ms = None
+
+    def register(self, collection: str, id_field: str, hook=None):
+        """Declare a buffered collection and, optionally, a post-flush hook(pairs)."""
+        self._id_fields[collection] = id_field
+        if hook is not None:
+            self._hooks.setdefault(collection, []).append(hook)
+
+    def add(self, collection: str, doc: dict):
+        id_field = self._id_fields[collection]
+        key = doc.get(id_field)
+        if key is None:
+            raise ValueError(f"{collection} document without {id_field}")
+        with self._lock:
+            docs = self._pending.setdefault(collection, OrderedDict())
+            if key in docs:
+                docs[key].update(doc)
+                self.coalesced += 1
+            else:
+                docs[key] = dict(doc)
+                self._size += 1
+            full = self._size >= self.max_docs
+        if self.flush_seconds <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Ingest buffer flush failed: {e}")
+
+    def _requeue(self, collection, docs):
+        """Put a batch that failed to write back, under anything newer."""
+        with self._lock:
+            current = self._pending.setdefault(collection, OrderedDict())
+            for key, doc in docs.items():
+                if key in current:
+                    merged = dict(doc)
+                    merged.update(current[key])
+                    current[key] = merged
+                else:
+                    current[key] = doc
+                    self._size += 1
+
+    def _run_hook(self, collection, run):
+        try:
+            run()
+        except Exception as e:
+            self.failed_hooks += 1
+            logger.warning(f"Post-flush hook for {collection} failed, will retry: {e}")
+            self._hook_retries.append((collection, e.resume if isinstance(e, HookRetry) else run))
+
+    def flush(self):
+        """Write everything pending; returns the number of documents written."""
+        with self._flush_lock:
+            retries, self._hook_retries = self._hook_retries, []
+            for collection, run in retries:
+                self._run_hook(collection, run)
+            with self._lock:
+                batches, self._pending, self._size = self._pending, {}, 0
+            started = time.perf_counter()
+            written = 0
+            for collection, docs in batches.items():
+                if not docs:
+                    continue
+                try:
+                    pairs = self._write(collection, docs)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.warning(f"Flushing {len(docs)} {collection} documents failed, will retry: {e}")
+                    self._requeue(collection, docs)
+                    continue
+                written += len(docs)
+                for hook in self._hooks.get(collection, []):
+                    self._run_hook(collection, partial(hook, pairs))
+            if written:
+                self.flushes += 1
+                self.flushed_docs += written
+                self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return written
+
+    def _write(self, collection, docs):
+        id_field = self._id_fields[collection]
+        col = get_db()[collection]
+        ids = list(docs)
+        before = {d[id_field]: d for d in col.find({id_field: {"$in": ids}}, {"_id": 0})}
+        now = ingest_time()
+        col.bulk_write(
+            [UpdateOne({id_field: key}, {"$set": {**doc, INGESTED_AT: now}}, upsert=True) for key, doc in docs.items()],
+            ordered=False,
+        )
+        return [(before.get(key), doc) for key, doc in docs.items()]
+
+    def close(self):
+        """Stop the flusher thread and write whatever is still pending."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(1.0, self.flush_seconds * 2))
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = self._size
+        return {
+            "pending": pending,
+            "max_docs": self.max_docs,
+            "flush_seconds": self.flush_seconds,
+            "flushes": self.flushes,
+            "flushed_docs": self.flushed_docs,
+            "coalesced": self.coalesced,
+            "failed_flushes": self.failed_flushes,
+            "pending_hooks": len(self._hook_retries),
+            "failed_hooks": self.failed_hooks,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+ingest_buffer = IngestBuffer(INGEST_BUFFER_MAX_DOCS, INGEST_BUFFER_FLUSH_SECONDS)
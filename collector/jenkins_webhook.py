@@ -1,26 +1,52 @@
 # collector/jenkins_webhook.py
-from collector.base_collector import upsert_one
-from collector.utils import require_shared_secret
+from functools import partial
+from collector.commit_index import deployment_changes, write_deployments
+from collector.ingest_buffer import ingest_buffer, HookRetry
+from collector.rollups import apply_deployments
+from collector.utils import require_shared_secret, parse_iso, to_datetime
 from config import JENKINS_SHARED_SECRET
+from processor.metric_cache import notify_ingest_times
 
-def handle_jenkins_webhook(headers: dict, payload: dict):
+def _apply_builds(pairs, index_changes):
+    # every step is idempotent, so a retry may repeat any of them
+    write_deployments(index_changes)
+    apply_deployments(pairs, index_changes)
+    times = []
+    for previous, doc in pairs:
+        times += [parse_iso((previous or {}).get("timestamp")), doc.get("timestamp")]
+    notify_ingest_times(*times)
+
+def _after_flush(pairs):
+    """Commit index, rollups and cache invalidation for a flushed batch of builds."""
+    # the commit index rows are read before they are written: keep the
+    # changes for a retry, which would otherwise see them already applied
+    finish = partial(_apply_builds, pairs, deployment_changes([doc for _, doc in pairs]))
+    try:
+        finish()
+    except Exception as e:
+        raise HookRetry(finish, e) from e
+
+ingest_buffer.register("jenkins_deployments", "build_id", _after_flush)
+
+def check_jenkins_token(headers: dict):
     # Expect a shared secret header e.g., X-Anametric-Token
     token = headers.get("x-anametric-token") or headers.get("x-jenkins-token")
     if not require_shared_secret(token, JENKINS_SHARED_SECRET):
         raise PermissionError("Invalid Jenkins webhook token")
 
+def handle_jenkins_webhook(headers: dict, payload: dict):
+    check_jenkins_token(headers)
+    return ingest_jenkins_build(payload)
+
+def normalize_build(payload: dict) -> dict:
+    """Map a Jenkins build payload to a jenkins_deployments document."""
     # Jenkins must be configured to send a payload with these fields
     # This format will vary by Jenkins and your plugin; adapt as necessary.
     build = payload.get("build") or payload
     build_id = build.get("number") or build.get("id")
     status = build.get("status") or build.get("result")
-    timestamp_ms = build.get("timestamp")  # Jenkins classic returns ms
-    # convert to ISO: if ms -> divide by 1000
-    if isinstance(timestamp_ms, (int, float)):
-        from datetime import datetime
-        timestamp = datetime.utcfromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%dT%H:%M:%SZ")
-    else:
-        timestamp = build.get("timestamp") or build.get("date")
+    # store as a BSON date: Jenkins classic sends epoch ms, others an ISO string
+    timestamp = to_datetime(build.get("timestamp") or build.get("date"))
 
     # commit info may be nested in actions/revisions depending on job plugins
     commit_sha = None
@@ -30,9 +56,23 @@ def handle_jenkins_webhook(headers: dict, payload: dict):
     doc = {
         "build_id": build_id,
         "job_name": build.get("job_name") or payload.get("job_name"),
+        "service": build.get("service") or payload.get("service"),
         "status": status,
         "timestamp": timestamp,
         "commit_sha": commit_sha
     }
-    upsert_one("jenkins_deployments", {"build_id": doc["build_id"]}, doc)
-    return {"status": "ok", "build_id": build_id}
+    return doc
+
+def delivery_key(payload: dict) -> str:
+    """Identity of a build notification: a retry repeats it, a later build phase does not."""
+    build = payload.get("build") or payload
+    build_id = build.get("number") or build.get("id")
+    status = build.get("status") or build.get("result")
+    return f"jenkins:{build_id}:{status}:{build.get('timestamp') or build.get('date')}"
+
+def ingest_jenkins_build(payload: dict):
+    """Store an already authenticated Jenkins build payload."""
+    doc = normalize_build(payload)
+    # upserted by build_id on the next buffer flush
+    ingest_buffer.add("jenkins_deployments", doc)
+    return {"status": "ok", "build_id": doc["build_id"]}
@@ -0,0 +1,111 @@
+# collector/migrate_timestamps.py
+"""
+One-shot migration: convert timestamps stored as ISO strings (or Jenkins
+epoch-ms numbers) into BSON dates, then create the query indexes.
+
+    python -m collector.migrate_timestamps [--batch-size 1000] [--dry-run]
+
+Safe to re-run: only documents that still hold string/number timestamps
+are touched. Values that cannot be parsed are left as they are, counted
+and logged, so no raw data is lost; fix them and run the migration again.
+"""
+import argparse
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+from collector.base_collector import get_db, ensure_indexes
+from collector.utils import to_datetime
+
+# collection -> top-level timestamp fields
+DATE_FIELDS = {
+    "jenkins_deployments": ["timestamp"],
+    "prometheus_alerts": ["startsAt", "endsAt"],
+    "github_events": ["created_at", "merged_at"],
+}
+
+_LEGACY_TYPES = ["string", "int", "long", "double"]
+
+logger = logging.getLogger(__name__)
+
+
+def _flush(col, ops, dry_run):
+    if not ops or dry_run:
+        return 0
+    res = col.bulk_write(ops, ordered=False)
+    return res.modified_count
+
+def _parsed(value):
+    """BSON date for a legacy timestamp, or None if it cannot be parsed."""
+    try:
+        return to_datetime(value)
+    except (ValueError, OverflowError, OSError):
+        # out-of-range epoch numbers
+        return None
+
+def migrate_collection(db, name, fields, batch_size=1000, dry_run=False):
+    col = db[name]
+    query = {"$or": [{f: {"$type": t}} for f in fields for t in _LEGACY_TYPES]}
+    if name == "github_events":
+        query["$or"].append({"commits.timestamp": {"$type": "string"}})
+    projection = {f: 1 for f in fields}
+    if name == "github_events":
+        projection["commits"] = 1
+
+    scanned = modified = unparseable = 0
+    ops = []
+    for doc in col.find(query, projection):
+        scanned += 1
+        update = {}
+        bad = []
+        for f in fields:
+            v = doc.get(f)
+            if v is not None and not isinstance(v, datetime):
+                dt = _parsed(v)
+                if dt is None:
+                    bad.append((f, v))
+                else:
+                    update[f] = dt
+        commits = doc.get("commits")
+        if isinstance(commits, list) and any(isinstance(c.get("timestamp"), str) for c in commits if isinstance(c, dict)):
+            converted = []
+            for c in commits:
+                if isinstance(c, dict) and isinstance(c.get("timestamp"), str):
+                    dt = _parsed(c["timestamp"])
+                    if dt is None:
+                        bad.append(("commits.timestamp", c["timestamp"]))
+                    else:
+                        c = dict(c, timestamp=dt)
+                converted.append(c)
+            if converted != commits:
+                update["commits"] = converted
+        if bad:
+            unparseable += len(bad)
+            logger.warning(f"{name} {doc['_id']}: leaving unparseable timestamps as they are: {bad}")
+        if update:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(ops) >= batch_size:
+            modified += _flush(col, ops, dry_run)
+            ops = []
+    modified += _flush(col, ops, dry_run)
+    return {"scanned": scanned, "modified": modified, "unparseable": unparseable}
+
+def migrate(batch_size=1000, dry_run=False):
+    db = get_db()
+    report = {}
+    for name, fields in DATE_FIELDS.items():
+        report[name] = migrate_collection(db, name, fields, batch_size, dry_run)
+    if not dry_run:
+        ensure_indexes()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored ISO timestamps to BSON dates")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count documents without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    for name, stats in migrate(args.batch_size, args.dry_run).items():
+        print(f"{name}: scanned={stats['scanned']} modified={stats['modified']} unparseable={stats['unparseable']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,79 @@
 # collector/prometheus_webhook.py
-from collector.base_collector import upsert_one
-from collector.utils import require_shared_secret
+import hashlib
+import json
+from collector.ingest_buffer import ingest_buffer
+from collector.rollups import apply_alerts
+from collector.utils import require_shared_secret, parse_iso
 from config import ALERTMANAGER_SHARED_SECRET
-from bson import ObjectId  # Only for demonstration (Mongo will auto-generate if omitted)
+from processor.metric_cache import notify_ingest_times
+
+def _after_flush(pairs):
+    """MTTR rollups and cache invalidation for a flushed batch of alerts."""
+    apply_alerts(pairs)
+    times = []
+    for previous, doc in pairs:
+        times += [parse_iso((previous or {}).get("startsAt")), doc.get("startsAt")]
+    notify_ingest_times(*times)
+
+ingest_buffer.register("prometheus_alerts", "alert_id", _after_flush)
+
+def check_alertmanager_token(headers: dict):
+    token = headers.get("x-anametric-token")
+    if not require_shared_secret(token, ALERTMANAGER_SHARED_SECRET):
+        raise PermissionError("Invalid Alertmanager webhook token")
 
 def handle_prometheus_webhook(headers: dict, payload: dict):
     """
     Handles Alertmanager webhook payload and stores alerts in MongoDB.
     Matches the required Anametric Prometheus JSON schema.
     """
-    token = headers.get("x-anametric-token")
-    if not require_shared_secret(token, ALERTMANAGER_SHARED_SECRET):
-        raise PermissionError("Invalid Alertmanager webhook token")
+    check_alertmanager_token(headers)
+    return ingest_alertmanager_payload(payload)
 
-    alerts = payload.get("alerts", [])
-    results = []
+def alert_id_for(a: dict) -> str:
+    """
+    Stable id of one alert occurrence: an explicit alert_id label, else a
+    digest of Alertmanager's fingerprint (or the sorted label set) and
+    startsAt. Identical in every process and across restarts. Alerts stored
+    under the earlier hash()-based ids: see collector/rekey_alerts.py.
+    """
+    labels = a.get("labels", {})
+    if labels.get("alert_id"):
+        return labels["alert_id"]
+    identity = a.get("fingerprint") or json.dumps(labels, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{identity}|{a.get('startsAt')}".encode()).hexdigest()
+    return f"alert_{digest[:20]}"
+
+def delivery_key(a: dict) -> str:
+    """Alertmanager repeats firing alerts every repeat_interval; only a status change is news."""
+    return f"alert:{alert_id_for(a)}:{a.get('status') or a.get('endsAt')}"
 
-    for a in alerts:
-        labels = a.get("labels", {})
-        startsAt = a.get("startsAt")
-        endsAt = a.get("endsAt")
-
-        # If Alertmanager doesn't give an explicit alert_id, create one
-        # Format: alert_<increment> (or you can use fingerprint from AM)
-        alert_id = labels.get("alert_id") or f"alert_{hash((labels.get('alertname', ''), labels.get('service', ''), startsAt)) & 0xffffffff}"
-
-        # Construct doc in required format
-        doc = {
-            "alert_id": alert_id,
-            "name": labels.get("alertname"),
-            "startsAt": startsAt,
-            "endsAt": endsAt,
+def normalize_alert(a: dict) -> dict:
+    """Map one Alertmanager alert to a prometheus_alerts document."""
+    labels = a.get("labels", {})
+    return {
+        "alert_id": alert_id_for(a),
+        "name": labels.get("alertname"),
+        "startsAt": parse_iso(a.get("startsAt")),
+        "endsAt": parse_iso(a.get("endsAt")),
+        "severity": labels.get("severity"),
+        "description": a.get("annotations", {}).get("description", ""),
+        "labels": {
+            "alertname": labels.get("alertname"),
             "severity": labels.get("severity"),
-            "description": a.get("annotations", {}).get("description", ""),
-            "labels": {
-                "alertname": labels.get("alertname"),
-                "severity": labels.get("severity"),
-                "service": labels.get("service"),
-                "commit": labels.get("commit")
-            }
+            "service": labels.get("service"),
+            "commit": labels.get("commit")
         }
+    }
 
-        # Upsert by alert_id to avoid duplicates
-        upsert_one("prometheus_alerts", {"alert_id": doc["alert_id"]}, doc)
+def ingest_alertmanager_payload(payload: dict):
+    """Store the alerts of an already authenticated Alertmanager payload."""
+    results = []
+    for a in payload.get("alerts", []):
+        doc = normalize_alert(a)
+        # Upserted by alert_id on the next buffer flush; a storm of
+        # notifications becomes a few bulk writes
+        ingest_buffer.add("prometheus_alerts", doc)
         results.append(doc["alert_id"])
 
     return {"status": "ok", "processed_alerts": results}
@@ -0,0 +1,80 @@
+# collector/rekey_alerts.py
+"""
+One-shot cut-over for the alert_id scheme of collector/prometheus_webhook.py.
+
+Alerts without an alert_id label used to be stored as
+alert_<hash(alertname, service, startsAt)>, with Python's per-process
+salted hash(). They are now alert_<sha256(fingerprint | startsAt)[:20]>.
+The new id needs Alertmanager's fingerprint (or the full label set),
+which the stored documents do not keep, so old ids cannot be rewritten.
+Instead, when an alert stored under an old id re-fires or resolves, the
+new notification lands in a second document; this removes the old one
+once the same occurrence (name, service, startsAt) exists under a new
+id, and recomputes the MTTR rollups of the days it could affect.
+
+    python -m collector.rekey_alerts [--batch-size 1000] [--dry-run]
+
+Safe to re-run; run it again once the alerts that were firing at the
+cut-over have resolved. Restart the query API afterwards: its event store
+only picks up upserts, not deletions.
+"""
+import argparse
+import re
+from pymongo import DeleteOne
+from collector.base_collector import get_db
+from collector.rollups import _affected_failure_days, recompute_mttr_days
+from processor.metric_cache import notify_ingest_times
+
+# alert_<hash(...) & 0xffffffff>: at most 10 decimal digits; new ids are 20 hex digits
+LEGACY_ID = re.compile(r"^alert_\d{1,10}$")
+
+
+def _occurrence(doc):
+    return {
+        "name": doc.get("name"),
+        "labels.service": (doc.get("labels") or {}).get("service"),
+        "startsAt": doc.get("startsAt"),
+    }
+
+def _flush(col, ops, dry_run):
+    if not ops or dry_run:
+        return 0
+    return col.bulk_write(ops, ordered=False).deleted_count
+
+def rekey(batch_size=1000, dry_run=False):
+    col = get_db().prometheus_alerts
+    scanned = removed = 0
+    ops, removed_docs = [], []
+    for doc in col.find({"alert_id": {"$regex": LEGACY_ID.pattern}}):
+        scanned += 1
+        current = col.find_one(
+            {**_occurrence(doc), "alert_id": {"$ne": doc["alert_id"], "$not": LEGACY_ID}},
+            {"_id": 1},
+        )
+        if current is None:
+            # never notified again: no duplicate, keep the old id
+            continue
+        ops.append(DeleteOne({"_id": doc["_id"]}))
+        removed_docs.append(doc)
+        if len(ops) >= batch_size:
+            removed += _flush(col, ops, dry_run)
+            ops = []
+    removed += _flush(col, ops, dry_run)
+
+    if removed_docs and not dry_run:
+        days = _affected_failure_days(removed_docs)
+        if days:
+            recompute_mttr_days(days)
+        notify_ingest_times(*(doc.get("startsAt") for doc in removed_docs))
+    return {"scanned": scanned, "duplicates": len(removed_docs), "removed": removed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove alerts duplicated by the alert_id change")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count duplicates without deleting")
+    args = parser.parse_args()
+    stats = rekey(args.batch_size, args.dry_run)
+    print(f"prometheus_alerts: scanned={stats['scanned']} duplicates={stats['duplicates']} removed={stats['removed']}")
+
+if __name__ == "__main__":
+    main()
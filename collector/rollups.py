@@ -0,0 +1,299 @@
+# collector/rollups.py
+"""
+Daily DORA rollups, one document per (day, job_name, service):
+
+    {day, job_name, service, deploy_count, failure_count,
+     lt_sum, lt_count, mttr_sum, mttr_count}
+
+The webhook handlers keep them current. A flushed batch of builds
+recomputes every counter of the days it touches from the raw collections
+and the commit index ($set, so a retried flush hook cannot count twice).
+Lead times of merged PRs are applied as $inc deltas between the old and
+new commit index rows. MTTR depends on the next alert after a failure, so
+it is recomputed for the days an ingested failure or alert can affect.
+
+The buckets serve /rollups (processor/rollup_processor.py). The metric
+endpoints keep their exact window semantics and are served from the
+in-memory event store instead; see get_rollup_metrics for the
+differences.
+
+Backfill or repair with:
+
+    python -m collector.rollups rebuild [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import argparse
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, UpdateMany
+from collector.base_collector import get_db
+from collector.commit_index import PROD_JOB
+from collector.utils import parse_iso
+from db import METRIC_ROLLUPS, COMMIT_INDEX
+import events
+from processor.mttr_processor import match_recoveries
+
+# same alert filter as processor/mttr_processor.calculate_mttr_from_db
+MTTR_SEVERITIES = ["critical", "high"]
+_DEPLOY_FIELDS = {"SUCCESS": "deploy_count", "FAILURE": "failure_count"}
+# build fields the counters depend on; a redelivery that keeps them moves nothing
+_DEPLOY_KEYS = ("status", "timestamp", "job_name", "service")
+_COUNTERS = ["deploy_count", "failure_count", "lt_sum", "lt_count", "mttr_sum", "mttr_count"]
+
+
+def day_of(ts):
+    return datetime(ts.year, ts.month, ts.day)
+
+def _day_runs(days):
+    """[[start, end)] runs of consecutive days covering the given days."""
+    runs = []
+    for day in sorted(set(days)):
+        if runs and runs[-1][1] == day:
+            runs[-1][1] = day + timedelta(days=1)
+        else:
+            runs.append([day, day + timedelta(days=1)])
+    return runs
+
+def _bucket(day, job_name, service):
+    return {"day": day, "job_name": job_name, "service": service}
+
+def _write_increments(increments):
+    """increments: {(day, job_name, service): {field: delta}}"""
+    ops = [
+        UpdateOne(_bucket(*key), {"$inc": fields}, upsert=True)
+        for key, fields in increments.items()
+        if any(fields.values())
+    ]
+    if ops:
+        get_db()[METRIC_ROLLUPS].bulk_write(ops, ordered=False)
+
+# --- deployments ---
+def _deploy_counter(doc):
+    if not doc:
+        return None
+    field = _DEPLOY_FIELDS.get(doc.get("status"))
+    ts = parse_iso(doc.get("timestamp"))
+    if not field or not ts:
+        return None
+    return (day_of(ts), doc.get("job_name"), doc.get("service")), field
+
+def apply_deployments(pairs, index_changes):
+    """
+    Recompute the days a flushed batch of builds ([(before, after)]) and
+    their commit index changes ([(row_before, row_after)]) can move. The
+    days are recomputed, not incremented, so a retry changes nothing.
+    """
+    days = set()
+    for before, after in pairs:
+        if before and all(before.get(f) == after.get(f) for f in _DEPLOY_KEYS):
+            continue
+        days |= {day_of(ts) for doc in (before, after) if (ts := parse_iso((doc or {}).get("timestamp")))}
+    for before, after in index_changes:
+        days |= {c[0][0] for c in (_lead_time_contribution(before), _lead_time_contribution(after)) if c}
+    if days:
+        recompute_days(days)
+
+# --- lead time ---
+def _lead_time_contribution(row):
+    lead_time = events.LeadTimeRow.from_doc(row) if row else None
+    if not lead_time:
+        return None
+    return (day_of(lead_time.deploy_time), PROD_JOB, lead_time.service), lead_time.hours
+
+def apply_lead_time(changes):
+    """changes: [(row_before, row_after)] from collector.commit_index."""
+    increments = defaultdict(lambda: defaultdict(float))
+    for before, after in changes:
+        old, new = _lead_time_contribution(before), _lead_time_contribution(after)
+        if old == new:
+            continue
+        if old:
+            increments[old[0]]["lt_sum"] -= old[1]
+            increments[old[0]]["lt_count"] -= 1
+        if new:
+            increments[new[0]]["lt_sum"] += new[1]
+            increments[new[0]]["lt_count"] += 1
+    _write_increments(increments)
+
+# --- MTTR ---
+def _alerts_for_matching(start, end):
+    """Relevant alerts starting in [start, end) plus the first one at/after end."""
+    col = get_db().prometheus_alerts
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+    query = {"severity": {"$in": MTTR_SEVERITIES}}
+    if window:
+        query["startsAt"] = window
+    projection = {"_id": 0, "startsAt": 1, "endsAt": 1}
+    alerts = list(col.find(query, projection))
+    if end is not None:
+        alerts.extend(col.find(
+            {"severity": {"$in": MTTR_SEVERITIES}, "startsAt": {"$gte": end}}, projection
+        ).sort("startsAt", 1).limit(1))
+    return alerts
+
+def _mttr_sums(start, end):
+    """{(day, job_name, service): [sum, count]} for failed deploys in [start, end)."""
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+    query = {"status": "FAILURE"}
+    if window:
+        query["timestamp"] = window
+    failed = get_db().jenkins_deployments.find(
+        query, {"_id": 0, "timestamp": 1, "job_name": 1, "service": 1}
+    )
+    sums = defaultdict(lambda: [0.0, 0])
+    recoveries = match_recoveries(events.deployments(failed), events.alerts(_alerts_for_matching(start, end)))
+    for deploy, deploy_time, minutes in recoveries:
+        key = (day_of(deploy_time), deploy.job_name, deploy.service)
+        sums[key][0] += minutes
+        sums[key][1] += 1
+    return sums
+
+def recompute_mttr_days(days):
+    """Reset and recompute mttr_sum/mttr_count for the given days, in one bulk write."""
+    ops = []
+    for start, end in _day_runs(days):
+        ops.append(UpdateMany({"day": {"$gte": start, "$lt": end}}, {"$set": {"mttr_sum": 0.0, "mttr_count": 0}}))
+        for key, (total, count) in _mttr_sums(start, end).items():
+            ops.append(UpdateOne(_bucket(*key), {"$set": {"mttr_sum": total, "mttr_count": count}}, upsert=True))
+    if ops:
+        get_db()[METRIC_ROLLUPS].bulk_write(ops, ordered=True)
+
+def _affected_failure_days(alerts):
+    """
+    Days of failed deployments whose next alert can be one of these: those
+    after the previous stored relevant alert and up to the alert's start.
+    Three reads for any number of alerts.
+    """
+    starts = sorted({
+        ts for a in alerts
+        if a and a.get("severity") in MTTR_SEVERITIES and (ts := parse_iso(a.get("startsAt")))
+    })
+    if not starts:
+        return set()
+    db = get_db()
+    relevant = {"severity": {"$in": MTTR_SEVERITIES}}
+    projection = {"_id": 0, "startsAt": 1}
+    stored = list(db.prometheus_alerts.find(
+        {**relevant, "startsAt": {"$lt": starts[0]}}, projection
+    ).sort("startsAt", -1).limit(1))
+    stored += db.prometheus_alerts.find({**relevant, "startsAt": {"$gte": starts[0], "$lte": starts[-1]}}, projection)
+    stored = sorted({ts for a in stored if (ts := parse_iso(a.get("startsAt")))})
+    # previous stored relevant alert of each start (None: there is none)
+    previous = [stored[i - 1] if (i := bisect_left(stored, ts)) else None for ts in starts]
+
+    window = {"$lte": starts[-1]}
+    if previous[0] is not None:
+        window["$gt"] = previous[0]
+    failed = db.jenkins_deployments.find({"status": "FAILURE", "timestamp": window}, {"_id": 0, "timestamp": 1})
+    days = set()
+    for d in failed:
+        ts = parse_iso(d.get("timestamp"))
+        if not ts:
+            continue
+        # the first start at/after the failure has the earliest previous alert
+        i = bisect_left(starts, ts)
+        if i < len(starts) and (previous[i] is None or previous[i] < ts):
+            days.add(day_of(ts))
+    return days
+
+def apply_alerts(pairs):
+    """Apply a flushed batch of Prometheus alert upserts ([(previous version, new version)])."""
+    alerts = []
+    for before, after in pairs:
+        if before and all(before.get(f) == after.get(f) for f in ("severity", "startsAt", "endsAt")):
+            continue
+        alerts += [before, after]
+    days = _affected_failure_days(alerts)
+    if days:
+        recompute_mttr_days(days)
+
+# --- rebuild ---
+def _buckets(start, end):
+    """
+    {(day, job_name, service): counters} for days in [start, end), computed
+    from the raw collections and the commit index. start/end: datetimes at
+    midnight UTC or None.
+    """
+    db = get_db()
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+
+    buckets = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+
+    deploy_query = {"status": {"$in": list(_DEPLOY_FIELDS)}}
+    if window:
+        deploy_query["timestamp"] = window
+    for d in db.jenkins_deployments.find(deploy_query, {"_id": 0, "timestamp": 1, "status": 1, "job_name": 1, "service": 1}):
+        counter = _deploy_counter(d)
+        if counter:
+            buckets[counter[0]][counter[1]] += 1
+
+    lt_query = {"first_deploy_time": window} if window else {"first_deploy_time": {"$ne": None}}
+    for row in db[COMMIT_INDEX].find(lt_query, {"_id": 0}):
+        contribution = _lead_time_contribution(row)
+        if contribution:
+            buckets[contribution[0]]["lt_sum"] += contribution[1]
+            buckets[contribution[0]]["lt_count"] += 1
+
+    for key, (total, count) in _mttr_sums(start, end).items():
+        buckets[key]["mttr_sum"] = total
+        buckets[key]["mttr_count"] = count
+    return buckets
+
+def recompute_days(days):
+    """Reset and recompute every counter of the given days in one bulk write; safe to repeat."""
+    ops = []
+    for start, end in _day_runs(days):
+        ops.append(UpdateMany({"day": {"$gte": start, "$lt": end}}, {"$set": dict.fromkeys(_COUNTERS, 0)}))
+        for key, counters in _buckets(start, end).items():
+            ops.append(UpdateOne(_bucket(*key), {"$set": counters}, upsert=True))
+    if ops:
+        get_db()[METRIC_ROLLUPS].bulk_write(ops, ordered=True)
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recompute all buckets with day in [start, end) from the raw collections
+    and the commit index. start/end: datetimes at midnight UTC or None.
+    """
+    buckets = _buckets(start, end)
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+
+    col = get_db()[METRIC_ROLLUPS]
+    col.delete_many({"day": window} if window else {})
+    ops = []
+    for key, counters in buckets.items():
+        ops.append(UpdateOne(_bucket(*key), {"$set": counters}, upsert=True))
+        if len(ops) >= batch_size:
+            col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        col.bulk_write(ops, ordered=False)
+    return len(buckets)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily DORA metric rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", help="first day to rebuild (YYYY-MM-DD, default: all history)")
+    parser.add_argument("--end", help="last day to rebuild, inclusive (YYYY-MM-DD)")
+    args = parser.parse_args()
+    start = datetime.strptime(args.start, "%Y-%m-%d") if args.start else None
+    end = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1) if args.end else None
+    print(f"{METRIC_ROLLUPS}: rebuilt {rebuild(start, end)} buckets")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+# collector/spool.py
+"""
+Durable local spool between the webhook endpoints and MongoDB.
+
+The endpoints authenticate a delivery, append its payload to a SQLite
+database in WAL mode and answer right away; appending is a single small
+local transaction. A drain worker replays the spool into Mongo in
+batches through the normal ingest path and records the last applied
+sequence number as a checkpoint, so events survive a Mongo outage or a
+collector restart and are applied at least once (all writes are
+idempotent upserts).
+
+Merged PRs are stored by the drain; fetching their commits from GitHub is
+queued in the spool (enrichments table) and run by a separate thread with
+exponential backoff, so a rate limit or a PR GitHub refuses to serve never
+holds back the checkpoint or the Jenkins and Alertmanager events behind it.
+
+One process drains at a time (an flock on <spool>.drain.lock), so several
+uvicorn workers can share one spool file. Drained events are kept for
+SPOOL_RETENTION_HOURS for inspection and replay:
+
+    python -m collector.spool stats
+    python -m collector.spool list [--pending] [--source jenkins] [--limit 20]
+    python -m collector.spool drain
+    python -m collector.spool enrichments
+    python -m collector.spool replay --from-seq 1200 [--to-seq 1300] [--source prometheus]
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pymongo.errors import PyMongoError
+from collector.github_webhook import enrich_merged_pr, ingest_github_event
+from collector.ingest_buffer import ingest_buffer
+from collector.jenkins_webhook import ingest_jenkins_build
+from collector.prometheus_webhook import ingest_alertmanager_payload
+from collector.utils import parse_iso
+from config import (
+    SPOOL_PATH,
+    SPOOL_DRAIN_BATCH,
+    SPOOL_DRAIN_INTERVAL_SECONDS,
+    SPOOL_RETENTION_HOURS,
+    SPOOL_ENRICH_RETRY_SECONDS,
+    SPOOL_ENRICH_RETRY_MAX_SECONDS,
+    SPOOL_ENRICH_MAX_ATTEMPTS,
+)
+
+logger = logging.getLogger(__name__)
+
+def _queue_enrichment(task, *args):
+    # scheduler for ingest_github_event: the commit fetch (task is
+    # enrich_merged_pr) is queued, not run inline; see SpoolDrainer.enrich_due
+    spool.queue_enrichment(*args)
+
+def _ingest_github(payload):
+    return ingest_github_event(payload, _queue_enrichment)
+
+SOURCES = {
+    "github": _ingest_github,
+    "jenkins": ingest_jenkins_build,
+    "prometheus": ingest_alertmanager_payload,
+}
+_CHECKPOINT = "mongo"
+# a payload a handler rejects with one of these will not get better on retry
+_REJECTED = (ValueError, TypeError, KeyError, AttributeError, PermissionError)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS enrichments (
+    pr_id INTEGER PRIMARY KEY,
+    args TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    due_at REAL,
+    last_error TEXT
+);
+"""
+
+
+class Spool:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # NORMAL in WAL mode survives process crashes; only an OS crash
+            # can lose the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def append(self, source: str, payload: dict) -> int:
+        """Persist one authenticated delivery; returns its sequence number."""
+        if source not in SOURCES:
+            raise ValueError(f"Unknown spool source: {source}")
+        cur = self._conn().execute(
+            "INSERT INTO events (source, received_at, payload) VALUES (?, ?, ?)",
+            (source, time.time(), json.dumps(payload, separators=(",", ":"))),
+        )
+        return cur.lastrowid
+
+    def checkpoint(self) -> int:
+        row = self._conn().execute("SELECT seq FROM checkpoints WHERE name = ?", (_CHECKPOINT,)).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, seq: int):
+        self._conn().execute(
+            "INSERT INTO checkpoints (name, seq, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at",
+            (_CHECKPOINT, seq, time.time()),
+        )
+
+    def read(self, after_seq: int, limit: int, to_seq: int = None, source: str = None):
+        """[(seq, source, received_at, payload)] with seq > after_seq, oldest first."""
+        query = "SELECT seq, source, received_at, payload FROM events WHERE seq > ?"
+        params = [after_seq]
+        if to_seq is not None:
+            query += " AND seq <= ?"
+            params.append(to_seq)
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        return [
+            (seq, src, received_at, json.loads(payload))
+            for seq, src, received_at, payload in self._conn().execute(query, params)
+        ]
+
+    def queue_enrichment(self, pr_id, merged_at, commits_url, fallback_commits=None):
+        """
+        Queue enrich_merged_pr(pr_id, merged_at, commits_url, fallback_commits),
+        due now. A PR queued again (redelivery, replay) starts over with the
+        latest arguments.
+        """
+        merged_at = merged_at.isoformat() if merged_at is not None else None
+        self._conn().execute(
+            "INSERT INTO enrichments (pr_id, args, attempts, due_at) VALUES (?, ?, 0, ?) "
+            "ON CONFLICT(pr_id) DO UPDATE SET args = excluded.args, attempts = 0, "
+            "due_at = excluded.due_at, last_error = NULL",
+            (pr_id, json.dumps([merged_at, commits_url, fallback_commits]), time.time()),
+        )
+
+    def due_enrichments(self, now: float, limit: int):
+        """[(pr_id, enrich_merged_pr args, attempts, args json)] due by now, oldest first."""
+        rows = self._conn().execute(
+            "SELECT pr_id, args, attempts FROM enrichments WHERE due_at <= ? ORDER BY due_at LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        due = []
+        for pr_id, args, attempts in rows:
+            merged_at, commits_url, fallback_commits = json.loads(args)
+            due.append((pr_id, (pr_id, parse_iso(merged_at), commits_url, fallback_commits), attempts, args))
+        return due
+
+    def enrichment_done(self, pr_id, args: str):
+        # unless the PR was queued again meanwhile
+        self._conn().execute("DELETE FROM enrichments WHERE pr_id = ? AND args = ?", (pr_id, args))
+
+    def enrichment_failed(self, pr_id, attempts: int, due_at, error: str):
+        """Record a failed attempt; due_at None gives up (kept for inspection)."""
+        self._conn().execute(
+            "UPDATE enrichments SET attempts = ?, due_at = ?, last_error = ? WHERE pr_id = ?",
+            (attempts, due_at, error, pr_id),
+        )
+
+    def enrichments(self):
+        """[(pr_id, attempts, due_at, last_error)] of every queued or abandoned enrichment."""
+        return self._conn().execute(
+            "SELECT pr_id, attempts, due_at, last_error FROM enrichments ORDER BY pr_id"
+        ).fetchall()
+
+    def purge(self, before_time: float) -> int:
+        """Delete drained events received before before_time."""
+        cur = self._conn().execute(
+            "DELETE FROM events WHERE seq <= ? AND received_at < ?", (self.checkpoint(), before_time)
+        )
+        return cur.rowcount
+
+    def stats(self):
+        conn = self._conn()
+        checkpoint = self.checkpoint()
+        total, first, last = conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM events").fetchone()
+        pending, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(received_at) FROM events WHERE seq > ?", (checkpoint,)
+        ).fetchone()
+        by_source = dict(conn.execute(
+            "SELECT source, COUNT(*) FROM events WHERE seq > ? GROUP BY source", (checkpoint,)
+        ).fetchall())
+        queued, abandoned = conn.execute(
+            "SELECT COUNT(due_at), COUNT(*) - COUNT(due_at) FROM enrichments"
+        ).fetchone()
+        return {
+            "path": self.path,
+            "events": total,
+            "first_seq": first,
+            "last_seq": last,
+            "checkpoint": checkpoint,
+            "pending": pending,
+            "pending_by_source": by_source,
+            "oldest_pending_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "pending_enrichments": queued,
+            "abandoned_enrichments": abandoned,
+        }
+
+
+def apply_events(events):
+    """
+    Run events through the ingest path and flush the write buffer.
+    Returns False if anything has to be retried: a handler failed for
+    another reason than an invalid payload (a Mongo error), the flush
+    failed or a post-flush hook is still pending. The caller
+    must not checkpoint then; the whole batch is applied again.
+    """
+    failed_before = ingest_buffer.failed_flushes
+    applied = True
+    for seq, source, _, payload in events:
+        try:
+            SOURCES[source](payload)
+        except PyMongoError as e:
+            logger.warning(f"Spooled {source} event {seq} failed, will retry: {e}")
+            applied = False
+            break
+        except _REJECTED as e:
+            logger.warning(f"Skipping spooled {source} event {seq}: {e}")
+        except Exception as e:
+            logger.warning(f"Spooled {source} event {seq} failed, will retry: {e}")
+            applied = False
+            break
+    ingest_buffer.flush()
+    stats = ingest_buffer.stats()
+    return (
+        applied
+        and ingest_buffer.failed_flushes == failed_before
+        and stats["pending"] == 0
+        and stats["pending_hooks"] == 0
+    )
+
+
+def _retry_delay(attempts):
+    return min(SPOOL_ENRICH_RETRY_MAX_SECONDS, SPOOL_ENRICH_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+class SpoolDrainer:
+    """Background threads replaying the spool into Mongo and running the queued PR enrichments."""
+
+    def __init__(self, spool: Spool, batch_size: int, interval: float):
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+        self._enrich_thread = None
+        self._locked = False
+        self._lock_file = None
+        self._last_purge = 0.0
+
+    def _acquire_drain_lock(self):
+        if self._lock_file is None:
+            self._lock_file = open(f"{self.spool.path}.drain.lock", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def drain_once(self) -> int:
+        """Apply one batch after the checkpoint; returns the number of events applied."""
+        events = self.spool.read(self.spool.checkpoint(), self.batch_size)
+        if not events:
+            return 0
+        if not apply_events(events):
+            return 0
+        self.spool.set_checkpoint(events[-1][0])
+        return len(events)
+
+    def enrich_due(self, limit: int = 100) -> int:
+        """Run the enrichments that are due; returns the number that succeeded."""
+        done = 0
+        for pr_id, args, attempts, raw in self.spool.due_enrichments(time.time(), limit):
+            try:
+                enrich_merged_pr(*args)
+            except Exception as e:
+                attempts += 1
+                if attempts >= SPOOL_ENRICH_MAX_ATTEMPTS:
+                    logger.error(f"Giving up fetching the commits of PR {pr_id} after {attempts} attempts: {e}")
+                    self.spool.enrichment_failed(pr_id, attempts, None, str(e))
+                else:
+                    delay = _retry_delay(attempts)
+                    logger.warning(f"Fetching the commits of PR {pr_id} failed, retrying in {delay:.0f}s: {e}")
+                    self.spool.enrichment_failed(pr_id, attempts, time.time() + delay, str(e))
+                continue
+            self.spool.enrichment_done(pr_id, raw)
+            done += 1
+        return done
+
+    def _purge_if_due(self):
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            self.spool.purge(now - SPOOL_RETENTION_HOURS * 3600)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._locked = self._locked or self._acquire_drain_lock()
+                if self._locked:
+                    applied = self.drain_once()
+                    self._purge_if_due()
+                    if applied == self.batch_size:
+                        continue  # backlog: go again without sleeping
+            except Exception as e:
+                logger.warning(f"Spool drain failed, will retry: {e}")
+            self._stopped.wait(self.interval)
+
+    def _run_enrichments(self):
+        # only the process holding the drain lock enriches
+        while not self._stopped.wait(max(self.interval, 1.0)):
+            if not self._locked:
+                continue
+            try:
+                self.enrich_due()
+            except Exception as e:
+                logger.warning(f"PR enrichment failed, will retry: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spool-drain", daemon=True)
+            self._thread.start()
+            self._enrich_thread = threading.Thread(target=self._run_enrichments, name="spool-enrich", daemon=True)
+            self._enrich_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        for thread in (self._thread, self._enrich_thread):
+            if thread is not None:
+                thread.join(timeout=10)
+        self._thread = self._enrich_thread = None
+
+
+spool = Spool(SPOOL_PATH)
+spool_drainer = SpoolDrainer(spool, SPOOL_DRAIN_BATCH, SPOOL_DRAIN_INTERVAL_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay the webhook ingest spool")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="event counts, checkpoint and backlog")
+    list_cmd = sub.add_parser("list", help="show spooled events")
+    list_cmd.add_argument("--pending", action="store_true", help="only events after the checkpoint")
+    list_cmd.add_argument("--from-seq", type=int, default=0)
+    list_cmd.add_argument("--source", choices=list(SOURCES))
+    list_cmd.add_argument("--limit", type=int, default=20)
+    sub.add_parser("drain", help="apply every pending event now, advance the checkpoint and run due enrichments")
+    sub.add_parser("enrichments", help="show queued and abandoned PR commit fetches")
+    replay = sub.add_parser("replay", help="re-apply already spooled events (checkpoint unchanged)")
+    replay.add_argument("--from-seq", type=int, required=True, help="first sequence number to replay")
+    replay.add_argument("--to-seq", type=int, help="last sequence number to replay")
+    replay.add_argument("--source", choices=list(SOURCES))
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(spool.stats(), indent=2))
+    elif args.command == "list":
+        after = max(args.from_seq - 1, spool.checkpoint() if args.pending else 0)
+        for seq, source, received_at, payload in spool.read(after, args.limit, source=args.source):
+            received = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(received_at))
+            print(f"{seq:>10}  {source:<10}  {received}  {json.dumps(payload)[:120]}")
+    elif args.command == "drain":
+        if not spool_drainer._acquire_drain_lock():
+            parser.exit(1, "another process is draining this spool\n")
+        total = 0
+        while applied := spool_drainer.drain_once():
+            total += applied
+        enriched = spool_drainer.enrich_due(limit=SPOOL_DRAIN_BATCH)
+        print(f"applied {total} events; checkpoint {spool.checkpoint()}; enriched {enriched} PRs")
+    elif args.command == "enrichments":
+        for pr_id, attempts, due_at, last_error in spool.enrichments():
+            due = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(due_at)) if due_at else "abandoned"
+            print(f"{pr_id:>10}  attempts={attempts:<3} {due:<19}  {(last_error or '')[:100]}")
+    elif args.command == "replay":
+        total, after = 0, args.from_seq - 1
+        while events := spool.read(after, SPOOL_DRAIN_BATCH, args.to_seq, args.source):
+            if not apply_events(events):
+                parser.exit(1, f"flush failed after seq {after}\n")
+            total += len(events)
+            after = events[-1][0]
+        print(f"replayed {total} events")
+
+if __name__ == "__main__":
+    main()
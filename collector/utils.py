@@ -2,7 +2,15 @@
 import hmac
 import hashlib
 import json
-from datetime import datetime
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+_FRACTION_RE = re.compile(r"\.(\d+)")
+_EPOCH = datetime(1970, 1, 1)
+# distinct timestamp strings remembered by parse_iso; exports and
+# redeliveries repeat the same values many times
+_PARSE_CACHE_SIZE = 65536
 
 def verify_github_signature(secret: str, signature_header: str, body: bytes) -> bool:
     """
@@ -22,18 +30,56 @@ def require_shared_secret(received: str, expected: str) -> bool:
         return False
     return hmac.compare_digest(received, expected)
 
-def parse_iso(ts: str):
-    """Try to parse ISO 8601 naive UTC timestamps returned by tools."""
+def parse_iso(ts):
+    """
+    Parse the ISO 8601 timestamps returned by tools into naive UTC datetimes
+    (the form pymongo stores as a BSON date and returns on reads).
+    Accepts 'Z' or numeric offsets, fractional seconds (Alertmanager sends
+    nanoseconds), a space instead of 'T' and datetimes that are already
+    parsed. This is the one timestamp parser of the code base; strings are
+    cached, so repeated values cost a dict lookup.
+    """
     if not ts:
         return None
-    # Basic parse; you can extend to use dateutil.parser
+    if isinstance(ts, datetime):
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        return ts
+    if not isinstance(ts, str):
+        return None
+    return _parse_iso_string(ts)
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def _parse_iso_string(ts):
+    s = ts.strip()
+    if s.endswith("Z") or s.endswith("z"):
+        s = s[:-1] + "+00:00"
+    # fromisoformat only takes up to microseconds
+    m = _FRACTION_RE.search(s)
+    if m and len(m.group(1)) > 6:
+        s = s[:m.start(1)] + m.group(1)[:6] + s[m.end(1):]
     try:
-        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-    except Exception:
-        try:
-            return datetime.fromisoformat(ts)
-        except Exception:
-            return None
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def to_datetime(value):
+    """parse_iso that also takes Jenkins-style epoch milliseconds."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return epoch_ms_to_datetime(value)
+    return parse_iso(value)
+
+def to_epoch(dt):
+    """Seconds since the epoch of a naive UTC datetime (exact for whole seconds)."""
+    delta = dt - _EPOCH
+    return delta.days * 86400 + delta.seconds + delta.microseconds / 1e6
+
+def epoch_ms_to_datetime(ms):
+    """Jenkins reports build timestamps as epoch milliseconds."""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
 
 def normalize_commit_sha(sha: str) -> str:
     return sha.strip() if sha else None
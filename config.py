@@ -8,6 +8,72 @@ load_dotenv()  # loads .env in repo root or environment
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "metricsDB")
 
+# Mongo connection pool (shared by collectors and processors)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))
+# primary | primaryPreferred | secondary | secondaryPreferred | nearest
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+# Metric result cache (processor/metric_cache.py)
+METRIC_CACHE_MAX_ENTRIES = int(os.getenv("METRIC_CACHE_MAX_ENTRIES", 512))
+METRIC_CACHE_TTL_SECONDS = float(os.getenv("METRIC_CACHE_TTL_SECONDS", 300))
+METRIC_CACHE_INVALIDATION_POLL_SECONDS = float(os.getenv("METRIC_CACHE_INVALIDATION_POLL_SECONDS", 1.0))
+
+# Fitted Prophet model / forecast cache (processor/forecast_cache.py)
+FORECAST_CACHE_DIR = os.getenv("FORECAST_CACHE_DIR", ".forecast_cache")
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", 64))
+FORECAST_CACHE_MAX_BYTES = int(os.getenv("FORECAST_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Forecast worker processes (processor/forecast_jobs.py); 0 = one per CPU
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", 0))
+FORECAST_JOB_TIMEOUT_SECONDS = int(os.getenv("FORECAST_JOB_TIMEOUT_SECONDS", 120))
+FORECAST_JOB_RETENTION_SECONDS = int(os.getenv("FORECAST_JOB_RETENTION_SECONDS", 3600))
+# load Prophet/pandas in the forecast workers right after API startup
+FORECAST_PREWARM = os.getenv("FORECAST_PREWARM", "false").lower() in ("1", "true", "yes")
+
+# Resident columnar event store of the query API (processor/event_store.py):
+# loaded in the background at startup, then refreshed from documents whose
+# ingested_at is newer than the last refresh minus the overlap (writer clock skew)
+EVENT_STORE_ENABLED = os.getenv("EVENT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+EVENT_STORE_REFRESH_SECONDS = float(os.getenv("EVENT_STORE_REFRESH_SECONDS", 1.0))
+EVENT_STORE_REFRESH_OVERLAP_SECONDS = float(os.getenv("EVENT_STORE_REFRESH_OVERLAP_SECONDS", 30))
+
+# POST /dora-metrics/batch (api.py): most windows accepted per request
+DORA_BATCH_MAX_WINDOWS = int(os.getenv("DORA_BATCH_MAX_WINDOWS", 100))
+
+# Write-behind ingest buffer (collector/ingest_buffer.py); flush when this
+# many documents are pending or every N seconds (<= 0: write-through)
+INGEST_BUFFER_MAX_DOCS = int(os.getenv("INGEST_BUFFER_MAX_DOCS", 500))
+INGEST_BUFFER_FLUSH_SECONDS = float(os.getenv("INGEST_BUFFER_FLUSH_SECONDS", 0.5))
+
+# Durable local ingest spool (collector/spool.py): webhooks are acked once
+# written here and drained into Mongo in the background
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "true").lower() in ("1", "true", "yes")
+SPOOL_PATH = os.getenv("SPOOL_PATH", ".ingest_spool/spool.db")
+SPOOL_DRAIN_BATCH = int(os.getenv("SPOOL_DRAIN_BATCH", 500))
+SPOOL_DRAIN_INTERVAL_SECONDS = float(os.getenv("SPOOL_DRAIN_INTERVAL_SECONDS", 0.2))
+SPOOL_RETENTION_HOURS = float(os.getenv("SPOOL_RETENTION_HOURS", 24))
+# PR commit fetches queued by the drain, retried with exponential backoff
+# (first retry after SPOOL_ENRICH_RETRY_SECONDS) until the attempts run out
+SPOOL_ENRICH_RETRY_SECONDS = float(os.getenv("SPOOL_ENRICH_RETRY_SECONDS", 30))
+SPOOL_ENRICH_RETRY_MAX_SECONDS = float(os.getenv("SPOOL_ENRICH_RETRY_MAX_SECONDS", 3600))
+SPOOL_ENRICH_MAX_ATTEMPTS = int(os.getenv("SPOOL_ENRICH_MAX_ATTEMPTS", 30))
+
+# Edge de-duplication of webhook redeliveries (collector/dedup.py)
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", 100000))
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", 6 * 3600))
+
+# GitHub API (collector/github_api.py); a token raises the rate limit and
+# is required for private repositories
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API_TIMEOUT_SECONDS = float(os.getenv("GITHUB_API_TIMEOUT_SECONDS", 10))
+GITHUB_ETAG_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_ETAG_CACHE_MAX_ENTRIES", 1024))
+
 # Webhook secrets
 GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
 JENKINS_SHARED_SECRET = os.getenv("JENKINS_SHARED_SECRET")
@@ -1,11 +1,36 @@
-from pymongo import MongoClient
+from collector.base_collector import (
+    get_client,
+    get_db,
+    close_client,
+    get_pool_stats,
+    get_async_client,
+    get_async_db,
+    close_async_client,
+    INGESTED_AT,
+)
+
+# Collection names shared by collectors and processors
+GITHUB_EVENTS = "github_events"
+JENKINS_DEPLOYMENTS = "jenkins_deployments"
+PROMETHEUS_ALERTS = "prometheus_alerts"
+COMMIT_INDEX = "commit_deployments"
+METRIC_ROLLUPS = "metric_rollups"
+CACHE_INVALIDATIONS = "cache_invalidations"
+
+
+def get_collection(name: str):
+    """Return a collection handle backed by the shared, pooled client."""
+    return get_db()[name]
+
+def get_async_collection(name: str):
+    """Async counterpart of get_collection, for async def endpoints."""
+    return get_async_db()[name]
 
 def get_mongo_collections():
-    client = MongoClient("mongodb://localhost:27017")  # or Atlas URI
-    db = client["metricsDB"]  # Change this to your DB name
+    db = get_db()
 
-    github_events = db["github_events"].find()
-    jenkins_logs = db["jenkins_deployments"].find()
-    prometheus_alerts = db["prometheus_alerts"].find()
+    github_events = db[GITHUB_EVENTS].find()
+    jenkins_logs = db[JENKINS_DEPLOYMENTS].find()
+    prometheus_alerts = db[PROMETHEUS_ALERTS].find()
 
     return list(github_events), list(jenkins_logs), list(prometheus_alerts)
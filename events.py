@@ -0,0 +1,101 @@
+# events.py
+"""
+Compact, typed events shared by the collectors and the processors.
+
+Collectors store timestamps as BSON dates, parsed once at ingest (see
+collector/utils.parse_iso). The processors turn the documents they read
+into these __slots__ objects, and each timestamp is resolved exactly once
+into a naive UTC datetime (for period keys) plus epoch seconds (for
+comparisons and differences). Legacy string or epoch-ms values that are
+still stored go through the same cached parser.
+"""
+from collector.utils import to_datetime, to_epoch
+
+
+class Deployment:
+    """group: the group_by value a grouped query attached (processor/groups.py), else None."""
+    __slots__ = ("build_id", "job_name", "service", "status", "commit_sha", "time", "ts", "group")
+
+    def __init__(self, build_id, job_name, service, status, commit_sha, time, group=None):
+        self.build_id = build_id
+        self.job_name = job_name
+        self.service = service
+        self.status = status
+        self.commit_sha = commit_sha
+        self.time = time
+        self.ts = to_epoch(time)
+        self.group = group
+
+    @classmethod
+    def from_doc(cls, doc):
+        """None if the document has no usable timestamp."""
+        time = to_datetime(doc.get("timestamp"))
+        if time is None:
+            return None
+        return cls(doc.get("build_id"), doc.get("job_name"), doc.get("service"),
+                   doc.get("status"), doc.get("commit_sha"), time, doc.get("group"))
+
+
+class Alert:
+    __slots__ = ("alert_id", "severity", "labels", "starts", "ends", "start_ts", "end_ts")
+
+    def __init__(self, alert_id, severity, labels, starts, ends):
+        self.alert_id = alert_id
+        self.severity = severity
+        self.labels = labels
+        self.starts = starts
+        self.ends = ends
+        self.start_ts = to_epoch(starts)
+        self.end_ts = to_epoch(ends) if ends else None
+
+    @classmethod
+    def from_doc(cls, doc):
+        """None if the alert has no usable startsAt."""
+        starts = to_datetime(doc.get("startsAt"))
+        if starts is None:
+            return None
+        return cls(doc.get("alert_id"), doc.get("severity"), doc.get("labels") or {},
+                   starts, to_datetime(doc.get("endsAt")))
+
+
+class LeadTimeRow:
+    """A commit index row: when a commit was made and first deployed to prod."""
+    __slots__ = ("sha", "service", "commit_time", "deploy_time", "hours", "group")
+
+    def __init__(self, sha, service, commit_time, deploy_time, group=None):
+        self.sha = sha
+        self.service = service
+        self.commit_time = commit_time
+        self.deploy_time = deploy_time
+        self.hours = (to_epoch(deploy_time) - to_epoch(commit_time)) / 3600
+        self.group = group
+
+    @classmethod
+    def from_doc(cls, doc):
+        """None unless both times are known and the deploy is not before the commit."""
+        commit_time = to_datetime(doc.get("commit_time"))
+        deploy_time = to_datetime(doc.get("first_deploy_time"))
+        if not commit_time or not deploy_time or deploy_time < commit_time:
+            return None
+        return cls(doc.get("sha"), doc.get("first_deploy_service"), commit_time, deploy_time, doc.get("group"))
+
+
+def _events(cls, docs):
+    out = []
+    for doc in docs:
+        event = cls.from_doc(doc)
+        if event is not None:
+            out.append(event)
+    return out
+
+def deployments(docs):
+    """[Deployment] for the documents with a usable timestamp."""
+    return _events(Deployment, docs)
+
+def alerts(docs):
+    """[Alert] for the documents with a usable startsAt."""
+    return _events(Alert, docs)
+
+def lead_time_rows(docs):
+    """[LeadTimeRow] for the commit index rows that yield a lead time."""
+    return _events(LeadTimeRow, docs)
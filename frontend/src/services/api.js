@@ -75,21 +75,35 @@ export const apiService = {
     return handleApiError(response);
   },
 
+  // Get several windows and metrics in one request; windows: [{ startTime, endTime }]
+  // Each metric has the same shape as its own endpoint's response
+  async getMetricsBatch(windows, metrics = ['deployment_frequency', 'lead_time', 'mttr', 'cfr']) {
+    const response = await fetch(`${API_BASE_URL}/dora-metrics/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        windows: windows.map(({ startTime, endTime }) => ({
+          start_time: formatDateTimeForAPI(startTime),
+          end_time: formatDateTimeForAPI(endTime)
+        })),
+        metrics
+      })
+    });
+
+    return handleApiError(response);
+  },
+
   // Get all metrics at once
   async getAllMetrics(startTime, endTime) {
     try {
-      const [deploymentFreq, leadTime, mttr, cfr] = await Promise.all([
-        this.getDeploymentFrequency(startTime, endTime),
-        this.getLeadTime(startTime, endTime),
-        this.getMTTR(startTime, endTime),
-        this.getCFR(startTime, endTime)
-      ]);
+      const { results } = await this.getMetricsBatch([{ startTime, endTime }]);
+      const [window] = results;
 
       return {
-        deploymentFrequency: deploymentFreq,
-        leadTime: leadTime,
-        mttr: mttr,
-        cfr: cfr
+        deploymentFrequency: window.deployment_frequency,
+        leadTime: window.lead_time,
+        mttr: window.mttr,
+        cfr: window.cfr
       };
     } catch (error) {
       console.error('Error fetching all metrics:', error);
@@ -1,56 +1,46 @@
 
-from datetime import datetime
+import asyncio
+import numpy as np
+from collector.utils import parse_iso, to_epoch
+from db import get_collection, get_async_collection, JENKINS_DEPLOYMENTS, GITHUB_EVENTS, PROMETHEUS_ALERTS
+import events
+from processor.groups import deployment_group_stages, grouped, partition
+from processor.periods import GRANULARITIES, period_cfr, to_ms
 
-def safe_parse_iso(ts):
-    try:
-        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-    except Exception:
-        return None
+def is_critical_commit_alert(alert):
+    """alert: events.Alert"""
+    labels = alert.labels
+    return "commit" in labels and (
+        (alert.severity or "").lower() == "critical" or
+        (labels.get("severity") or "").lower() == "critical"
+    )
 
-def calculate_cfr(start_time_str, end_time_str, github_events, jenkins_logs, prometheus_alerts):
-    start_time = safe_parse_iso(start_time_str)
-    end_time = safe_parse_iso(end_time_str)
-
-    if not start_time or not end_time:
-        raise ValueError("Invalid ISO 8601 format.")
-
-    merged_commits = {
-        commit["sha"]: safe_parse_iso(pr["merged_at"])
-        for pr in github_events if "merged_at" in pr
-        for commit in pr.get("commits", [])
-    }
+def compute_cfr(start_time_str, end_time_str, deployments, merged_commits, alerts):
+    """
+    CFR over already-loaded events.Deployment / events.Alert lists.
+    merged_commits: any container of the commit SHAs that belong to a merged PR.
+    """
+    start_time, end_time = _parse_window(start_time_str, end_time_str)
+    start_ts, end_ts = to_epoch(start_time), to_epoch(end_time)
 
     relevant_deployments = [
-        {
-            "commit_sha": log["commit_sha"],
-            "timestamp": safe_parse_iso(log["timestamp"]),
-            "status": log["status"]
-        }
-        for log in jenkins_logs
-        if log["commit_sha"] in merged_commits
-        and (ts := safe_parse_iso(log["timestamp"]))
-        and start_time <= ts <= end_time
+        d for d in deployments
+        if d.commit_sha in merged_commits and start_ts <= d.ts <= end_ts
     ]
 
     failed_commits_from_alerts = {
-        alert["labels"]["commit"]
-        for alert in prometheus_alerts
-        if (
-            "commit" in alert.get("labels", {}) and
-            (alert.get("severity", "").lower() == "critical" or
-             alert["labels"].get("severity", "").lower() == "critical")
-            and (alert_time := safe_parse_iso(alert["startsAt"]))
-            and start_time <= alert_time <= end_time
-        )
+        alert.labels["commit"]
+        for alert in alerts
+        if is_critical_commit_alert(alert) and start_ts <= alert.start_ts <= end_ts
     }
 
     failed_commits = {
-        d["commit_sha"]
+        d.commit_sha
         for d in relevant_deployments
-        if d["status"] == "FAILURE" or d["commit_sha"] in failed_commits_from_alerts
+        if d.status == "FAILURE" or d.commit_sha in failed_commits_from_alerts
     }
 
-    total_changes = len({d["commit_sha"] for d in relevant_deployments})
+    total_changes = len({d.commit_sha for d in relevant_deployments})
     failed_changes = len(failed_commits)
     cfr = (failed_changes / total_changes * 100) if total_changes > 0 else 0.0
 
@@ -61,3 +51,176 @@ def calculate_cfr(start_time_str, end_time_str, github_events, jenkins_logs, pro
         "Failed Changes": failed_changes,
         "Change Failure Rate (%)": round(cfr, 2)
     }
+
+def calculate_cfr(start_time_str, end_time_str, github_events, jenkins_logs, prometheus_alerts):
+    merged_commits = {
+        commit["sha"]: parse_iso(pr["merged_at"])
+        for pr in github_events if "merged_at" in pr
+        for commit in pr.get("commits", [])
+    }
+    return compute_cfr(start_time_str, end_time_str, events.deployments(jenkins_logs),
+                       merged_commits, events.alerts(prometheus_alerts))
+
+def _is_critical(field):
+    return {"$eq": [{"$toLower": {"$ifNull": [field, ""]}}, "critical"]}
+
+def _merged_deployments_stages(start_time, end_time, fields):
+    return [
+        # Deployments in the window that carry a commit
+        {"$match": {"timestamp": {"$gte": start_time, "$lte": end_time}, "commit_sha": {"$ne": None}}},
+        {"$project": {"_id": 0, **dict.fromkeys(fields, 1)}},
+        # Keep only commits that belong to a merged PR
+        {"$lookup": {
+            "from": GITHUB_EVENTS,
+            "localField": "commit_sha",
+            "foreignField": "commits.sha",
+            "as": "prs",
+        }},
+        {"$match": {"prs.merged_at": {"$exists": True}}},
+    ]
+
+def cfr_pipeline(start_time, end_time):
+    """
+    Aggregation equivalent of calculate_cfr, run against jenkins_deployments.
+    Window filter, merged-commit join and critical-alert join all happen
+    server-side; only the two counts come back.
+    """
+    return _merged_deployments_stages(start_time, end_time, ["commit_sha", "status"]) + [
+        # One row per change; failed if any of its deployments failed
+        {"$group": {
+            "_id": "$commit_sha",
+            "failed_deploy": {"$max": {"$eq": ["$status", "FAILURE"]}},
+        }},
+        # ...or if a critical alert for the commit fired inside the window
+        {"$lookup": {
+            "from": PROMETHEUS_ALERTS,
+            "localField": "_id",
+            "foreignField": "labels.commit",
+            "as": "alerts",
+        }},
+        {"$project": {
+            "failed": {"$or": [
+                "$failed_deploy",
+                {"$gt": [{"$size": {"$filter": {
+                    "input": "$alerts",
+                    "as": "a",
+                    "cond": {"$and": [
+                        {"$gte": ["$$a.startsAt", start_time]},
+                        {"$lte": ["$$a.startsAt", end_time]},
+                        {"$or": [_is_critical("$$a.severity"), _is_critical("$$a.labels.severity")]},
+                    ]},
+                }}}, 0]},
+            ]},
+        }},
+        {"$group": {
+            "_id": None,
+            "total_changes": {"$sum": 1},
+            "failed_changes": {"$sum": {"$cond": ["$failed", 1, 0]}},
+        }},
+    ]
+
+def _parse_window(start_time_str, end_time_str):
+    start_time = parse_iso(start_time_str)
+    end_time = parse_iso(end_time_str)
+    if not start_time or not end_time:
+        raise ValueError("Invalid ISO 8601 format.")
+    return start_time, end_time
+
+def cfr_by_period(deployments, alerts, granularity, zone):
+    """
+    {period: {Total Changes, Failed Changes, Change Failure Rate (%)}} for
+    events.Deployment of merged commits and critical commit events.Alert,
+    both already limited to the window. A change is a commit deployed in
+    the period (see processor/periods.period_cfr).
+    """
+    ids = {}
+    deploy_commit = [ids.setdefault(d.commit_sha, len(ids)) for d in deployments]
+    alert_commit = [ids.setdefault(a.labels["commit"], len(ids)) for a in alerts]
+    return period_cfr(
+        to_ms([d.time for d in deployments]), deploy_commit,
+        np.array([d.status == "FAILURE" for d in deployments], dtype=bool),
+        to_ms([a.starts for a in alerts]), alert_commit,
+        granularity, zone,
+    )
+
+def _cfr_events_result(start_time_str, end_time_str, deployments, alerts, granularity=None, zone=None):
+    changes = {d.commit_sha for d in deployments}
+    failed = {d.commit_sha for d in deployments if d.status == "FAILURE"}
+    failed |= changes & {a.labels["commit"] for a in alerts}
+    result = _cfr_result(start_time_str, end_time_str, [{"total_changes": len(changes), "failed_changes": len(failed)}])
+    if granularity:
+        result[GRANULARITIES[granularity]] = cfr_by_period(deployments, alerts, granularity, zone)
+    return result
+
+def _cfr_events_results(start_time_str, end_time_str, deployments, alerts, granularity=None, zone=None,
+                        group_by=None):
+    """_cfr_events_result, or one per deployment group (a change counts in every group that shipped it)."""
+    if not group_by:
+        return _cfr_events_result(start_time_str, end_time_str, deployments, alerts, granularity, zone)
+    return grouped(group_by, {
+        name: _cfr_events_result(start_time_str, end_time_str, group, alerts, granularity, zone)
+        for name, group in partition(deployments, lambda d: d.group).items()
+    })
+
+def _change_queries(start_time, end_time, group_by=None):
+    """(pipeline, alert filter) for the merged deployments and commit alerts of the window."""
+    fields = ["commit_sha", "status", "timestamp", "job_name", "service"]
+    pipeline = _merged_deployments_stages(start_time, end_time, fields) + [{"$project": {"prs": 0}}]
+    if group_by:
+        pipeline += deployment_group_stages(group_by)
+    return (
+        pipeline,
+        {"startsAt": {"$gte": start_time, "$lte": end_time}, "labels.commit": {"$exists": True}},
+    )
+
+def _critical(alert_docs):
+    return [a for a in events.alerts(alert_docs) if is_critical_commit_alert(a)]
+
+def calculate_cfr_from_db(start_time_str, end_time_str, granularity=None, zone=None):
+    """
+    Same result as calculate_cfr, computed by a MongoDB aggregation
+    instead of loading github_events/jenkins_deployments/prometheus_alerts.
+    With granularity ("day", "week" for ISO weeks or "month") the result
+    also has the rate per period of the local time in zone; that needs the
+    window's merged deployments and commit alerts rather than two counts.
+    """
+    start_time, end_time = _parse_window(start_time_str, end_time_str)
+    if granularity:
+        pipeline, alert_query = _change_queries(start_time, end_time)
+        deployments = events.deployments(get_collection(JENKINS_DEPLOYMENTS).aggregate(pipeline))
+        alerts = _critical(get_collection(PROMETHEUS_ALERTS).find(alert_query, {"_id": 0}))
+        return _cfr_events_result(start_time_str, end_time_str, deployments, alerts, granularity, zone)
+    rows = list(get_collection(JENKINS_DEPLOYMENTS).aggregate(cfr_pipeline(start_time, end_time)))
+    return _cfr_result(start_time_str, end_time_str, rows)
+
+async def calculate_cfr_from_db_async(start_time_str, end_time_str, granularity=None, zone=None, group_by=None):
+    """
+    calculate_cfr_from_db on the async client (for async def endpoints).
+    group_by: one result per group of the deployments (see processor/groups.py).
+    """
+    start_time, end_time = _parse_window(start_time_str, end_time_str)
+    if granularity or group_by:
+        pipeline, alert_query = _change_queries(start_time, end_time, group_by)
+        cursor, alert_docs = await asyncio.gather(
+            get_async_collection(JENKINS_DEPLOYMENTS).aggregate(pipeline),
+            get_async_collection(PROMETHEUS_ALERTS).find(alert_query, {"_id": 0}).to_list(),
+        )
+        deployments = events.deployments(await cursor.to_list())
+        return _cfr_events_results(start_time_str, end_time_str, deployments, _critical(alert_docs),
+                                   granularity, zone, group_by)
+    cursor = await get_async_collection(JENKINS_DEPLOYMENTS).aggregate(cfr_pipeline(start_time, end_time))
+    return _cfr_result(start_time_str, end_time_str, await cursor.to_list())
+
+def _cfr_result(start_time_str, end_time_str, rows):
+    counts = rows[0] if rows else {}
+    total_changes = counts.get("total_changes", 0)
+    failed_changes = counts.get("failed_changes", 0)
+    cfr = (failed_changes / total_changes * 100) if total_changes > 0 else 0.0
+
+    return {
+        "Start Time": start_time_str,
+        "End Time": end_time_str,
+        "Total Changes": total_changes,
+        "Failed Changes": failed_changes,
+        "Change Failure Rate (%)": round(cfr, 2)
+    }
@@ -0,0 +1,112 @@
+# processor/count_index.py
+"""
+Hourly deployment counts per (job, status, service) in a Fenwick tree, so
+the number of deployments in any range of whole hours is O(log n)
+instead of a pass over the deployments in the range.
+
+Storage is sparse: one cell per (key, UTC hour) that has a deployment,
+kept in a sorted array of composite key * 2**32 + hour codes, so memory
+follows the hours with data (an outlier timestamp adds one cell, not
+decades of empty ones). The Fenwick tree runs over that cell order;
+each key's cells are contiguous, so a range query is two searchsorted
+calls and O(log n) tree steps, vectorized over all keys at once.
+
+Changes to existing cells are point updates; new cells are merged in
+with one vectorized rebuild per batch (empty cells are dropped then).
+The owner (processor/event_store.py) applies each deployment change as
+a -1 / +1 pair, counts the partial hours at the ends of a window from
+its rows, and keeps the index under its lock.
+"""
+from collections import Counter
+import numpy as np
+
+MS_PER_HOUR = 3_600_000
+_KEY_STRIDE = 1 << 32
+_HOUR_OFFSET = 1 << 31  # hours of Python datetimes (years 1-9999) fit in 32 bits
+# a Python-level point update costs about as much as rebuilding this many cells
+_CELLS_PER_UPDATE = 64
+
+
+def _tree(counts):
+    """Fenwick tree of counts: node i holds the sum of counts (i & (i + 1))..i."""
+    if not len(counts):
+        return counts.copy()
+    prefix = np.cumsum(counts)
+    i = np.arange(len(counts))
+    low = (i & (i + 1)) - 1
+    return prefix - np.where(low >= 0, prefix[low], 0)
+
+
+class HourlyCounts:
+    def __init__(self):
+        self._keys = {}  # (job, status, service) codes -> key number
+        self.job = np.empty(0, np.int32)
+        self.status = np.empty(0, np.int32)
+        self.service = np.empty(0, np.int32)
+        self._cells = np.empty(0, np.int64)  # sorted key * _KEY_STRIDE + hour + _HOUR_OFFSET
+        self._counts = np.empty(0, np.int64)
+        self._tree = np.empty(0, np.int64)
+
+    def _key(self, key):
+        number = self._keys.get(key)
+        if number is None:
+            number = self._keys[key] = len(self._keys)
+            job, status, service = key
+            self.job = np.append(self.job, np.int32(job))
+            self.status = np.append(self.status, np.int32(status))
+            self.service = np.append(self.service, np.int32(service))
+        return number
+
+    def apply(self, changes):
+        """changes: [(ts, job, status, service, delta)] with ts in epoch ms."""
+        updates = Counter()
+        for ts, job, status, service, delta in changes:
+            updates[self._key((job, status, service)) * _KEY_STRIDE + ts // MS_PER_HOUR + _HOUR_OFFSET] += delta
+        updates = {cell: delta for cell, delta in updates.items() if delta}
+        if not updates:
+            return
+        cells = np.fromiter(updates, np.int64, len(updates))
+        deltas = np.fromiter(updates.values(), np.int64, len(updates))
+
+        position = np.searchsorted(self._cells, cells)
+        found = position < len(self._cells)
+        found[found] = self._cells[position[found]] == cells[found]
+        if found.all() and len(cells) * len(self._cells).bit_length() * _CELLS_PER_UPDATE <= len(self._cells):
+            np.add.at(self._counts, position, deltas)
+            for i, delta in zip(position.tolist(), deltas.tolist()):
+                while i < len(self._tree):
+                    self._tree[i] += delta
+                    i |= i + 1
+            return
+
+        np.add.at(self._counts, position[found], deltas[found])
+        merged = np.concatenate([self._cells, cells[~found]])
+        counts = np.concatenate([self._counts, deltas[~found]])
+        order = np.argsort(merged, kind="stable")
+        merged, counts = merged[order], counts[order]
+        keep = counts != 0
+        self._cells, self._counts = merged[keep], counts[keep]
+        self._tree = _tree(self._counts)
+
+    def _prefix(self, ends):
+        """Sum of the counts of cells 0..end - 1 for every end."""
+        total = np.zeros(len(ends), np.int64)
+        i = ends - 1
+        while True:
+            live = i >= 0
+            if not live.any():
+                return total
+            total[live] += self._tree[i[live]]
+            i[live] = (i[live] & (i[live] + 1)) - 1
+
+    def sums(self, first_hour, last_hour):
+        """Per-key counts of the deployments in hours first_hour..last_hour (aligned with job/status/service)."""
+        first = min(max(first_hour + _HOUR_OFFSET, 0), _KEY_STRIDE)
+        stop = min(max(last_hour + 1 + _HOUR_OFFSET, 0), _KEY_STRIDE)
+        base = np.arange(len(self._keys), dtype=np.int64) * _KEY_STRIDE
+        lo = np.searchsorted(self._cells, base + first)
+        hi = np.searchsorted(self._cells, base + stop)
+        return self._prefix(hi) - self._prefix(lo)
+
+    def nbytes(self):
+        return self._cells.nbytes + self._counts.nbytes + self._tree.nbytes
@@ -1,65 +1,162 @@
 
-from pymongo import MongoClient
+import base64
+import json
 from datetime import datetime
+from db import get_async_collection, JENKINS_DEPLOYMENTS
+from processor.groups import deployment_pipeline, grouped, partition
+from processor.periods import GRANULARITIES, period_counts, to_ms
 
-def get_deployment_frequency(start_time: str, end_time: str):
+# Keyset order of deployment listings; build_id breaks timestamp ties so
+# every deployment has exactly one position
+DEPLOYMENT_SORT = [("timestamp", 1), ("build_id", 1)]
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_SIZE = 1000
+
+def deployment_order(doc):
+    """DEPLOYMENT_SORT as a sort key, for listings built in memory (null < numbers < strings, as in Mongo)."""
+    build_id = doc.get("build_id")
+    if build_id is None:
+        return doc["timestamp"], 0, 0
+    if isinstance(build_id, (int, float)):
+        return doc["timestamp"], 1, build_id
+    return doc["timestamp"], 2, str(build_id)
+
+def _counts(timestamps, granularity=None, zone=None):
+    result = {"count": len(timestamps)}
+    if granularity:
+        result[GRANULARITIES[granularity]] = period_counts(to_ms(timestamps), granularity, zone)
+    return result
+
+async def get_deployment_frequency_async(start_time: str, end_time: str, granularity=None, zone=None,
+                                         group_by=None):
+    """
+    Successful prod-deploy builds in the window, listed in DEPLOYMENT_SORT
+    order (for async def endpoints).
+    With granularity ("day", "week" for ISO weeks or "month") the listing
+    is replaced by deployment counts per period of the local time in zone.
+    With group_by (see processor/groups.py) every group's count comes from
+    one aggregation; group_by=job_name counts the successful builds of
+    every job instead of prod-deploy only.
+    """
     try:
-        # Convert input strings to datetime objects
         start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
         end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
     except ValueError:
         return {"error": "Invalid datetime format. Use 'YYYY-MM-DD HH:MM:SS'"}
 
-    # Connect to MongoDB
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["metricsDB"]
-    collection = db["jenkins_deployments"]
-
-    # MongoDB query (ISO format with 'Z' for UTC)
     query = {
         "job_name": "prod-deploy",
         "status": "SUCCESS",
-        "timestamp": {
-            "$gte": start_dt.isoformat() + "Z",
-            "$lte": end_dt.isoformat() + "Z"
-        }
+        "timestamp": {"$gte": start_dt, "$lte": end_dt}
     }
+    if group_by:
+        if group_by == "job_name":
+            del query["job_name"]
+        cursor = await get_async_collection(JENKINS_DEPLOYMENTS).aggregate(
+            deployment_pipeline(query, {"_id": 0, "timestamp": 1}, group_by)
+        )
+        groups = partition(await cursor.to_list(), lambda d: d.get("group"))
+        return grouped(group_by, {
+            name: _counts([d["timestamp"] for d in docs], granularity, zone) for name, docs in groups.items()
+        })
 
-    results = list(collection.find(query, {"_id": 0, "timestamp": 1, "build_id": 1}))
+    if granularity:
+        results = await get_async_collection(JENKINS_DEPLOYMENTS).find(
+            query, {"_id": 0, "timestamp": 1}
+        ).to_list()
+        return _counts([d["timestamp"] for d in results], granularity, zone)
+
+    results = await get_async_collection(JENKINS_DEPLOYMENTS).find(
+        query, {"_id": 0, "timestamp": 1, "build_id": 1}
+    ).sort(DEPLOYMENT_SORT).to_list()
 
     return {
         "count": len(results),
         "deployments": results
     }
 
-def get_deployment(start_time: str, end_time: str):
+def encode_cursor(doc: dict) -> str:
+    """Opaque cursor for the position right after doc."""
+    raw = json.dumps([doc["timestamp"].isoformat(), doc["build_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(timestamp, build_id) from encode_cursor, or None if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, build_id = json.loads(raw)
+        return datetime.fromisoformat(ts), build_id
+    except (ValueError, TypeError):
+        return None
+
+def _listing_query(start_time: str, end_time: str, cursor: str = None):
+    """Mongo filter for a deployment listing resumed after cursor, or an error dict."""
     try:
-        # Convert input strings to datetime objects
         start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
         end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
     except ValueError:
         return {"error": "Invalid datetime format. Use 'YYYY-MM-DD HH:MM:SS'"}
 
-    # Connect to MongoDB
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["metricsDB"]
-    collection = db["jenkins_deployments"]
-
-    # MongoDB query (ISO format with 'Z' for UTC)
     query = {
         "job_name": "prod-deploy",
         "status": "SUCCESS",
-        "timestamp": {
-            "$gte": start_dt.isoformat() + "Z",
-            "$lte": end_dt.isoformat() + "Z"
-        }
+        "timestamp": {"$gte": start_dt, "$lte": end_dt}
     }
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is None:
+            return {"error": "Invalid cursor"}
+        ts, build_id = after
+        query["$or"] = [
+            {"timestamp": {"$gt": ts}},
+            {"timestamp": ts, "build_id": {"$gt": build_id}},
+        ]
+    return {"query": query}
+
+async def get_deployment_frequency_page_async(start_time: str, end_time: str,
+                                              limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """
+    One page of the deployment listing in (timestamp, build_id) order.
+    page_count is the number of deployments on this page, not in the
+    window. next_cursor is None on the last page; pass it back to get the
+    next one.
+    """
+    listing = _listing_query(start_time, end_time, cursor)
+    if "error" in listing:
+        return listing
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
 
-    results = list(collection.find(query, {"_id": 0, "timestamp": 1, "build_id": 1}))
+    # one extra document tells whether another page exists
+    results = await get_async_collection(JENKINS_DEPLOYMENTS).find(
+        listing["query"], {"_id": 0, "timestamp": 1, "build_id": 1}
+    ).sort(DEPLOYMENT_SORT).limit(limit + 1).to_list()
+    page = results[:limit]
 
     return {
-        "count": len(results),
-        "start_date": start_time,
-        "end_date": end_time
+        "page_count": len(page),
+        "deployments": page,
+        "next_cursor": encode_cursor(page[-1]) if len(results) > limit else None
     }
 
+def stream_deployments_async(start_time: str, end_time: str, cursor: str = None):
+    """
+    Async iterator over the whole deployment listing in (timestamp, build_id)
+    order, read from the Mongo cursor batch by batch. Returns an error dict
+    instead if the arguments are invalid (checked before anything is sent).
+    """
+    listing = _listing_query(start_time, end_time, cursor)
+    if "error" in listing:
+        return listing
+
+    async def documents():
+        mongo_cursor = get_async_collection(JENKINS_DEPLOYMENTS).find(
+            listing["query"], {"_id": 0, "timestamp": 1, "build_id": 1}
+        ).sort(DEPLOYMENT_SORT).batch_size(STREAM_BATCH_SIZE)
+        try:
+            async for doc in mongo_cursor:
+                yield doc
+        finally:
+            await mongo_cursor.close()
+
+    return documents()
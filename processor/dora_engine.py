@@ -0,0 +1,293 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+from collector.utils import to_epoch
+from db import get_async_collection, JENKINS_DEPLOYMENTS, PROMETHEUS_ALERTS, GITHUB_EVENTS, COMMIT_INDEX
+from processor.cfr_processor import compute_cfr
+from processor.df_processor import deployment_order
+from processor.groups import deployment_pipeline, grouped, lead_time_group, merge_metrics, partition
+from processor.lt_processor import lead_time_from_rows, lead_time_query
+from processor.mttr_processor import compute_mttr, compute_mttr_by_group
+import events
+
+MTTR_SEVERITIES = ("critical", "high")
+# metrics of POST /dora-metrics/batch, shaped like their own endpoints' responses
+BATCH_METRICS = ("deployment_frequency", "lead_time", "mttr", "cfr")
+
+
+# (filter, projection) of each snapshot read
+def _deployments_query(start_dt, end_dt):
+    return (
+        {"timestamp": {"$gte": start_dt, "$lte": end_dt}},
+        {"_id": 0, "build_id": 1, "job_name": 1, "service": 1, "status": 1, "timestamp": 1, "commit_sha": 1},
+    )
+
+def _merged_query(deployments):
+    """Query for merged PRs containing the deployments' commits (None if there are none)."""
+    shas = list({d["commit_sha"] for d in deployments if d.get("commit_sha")})
+    if not shas:
+        return None
+    return (
+        {"commits.sha": {"$in": shas}, "merged_at": {"$exists": True}},
+        {"_id": 0, "commits.sha": 1},
+    )
+
+def _merged_shas(prs):
+    merged = set()
+    for pr in prs:
+        merged.update(c.get("sha") for c in pr.get("commits", []))
+    return merged
+
+def _alerts_query(start_dt, end_dt):
+    return (
+        {"startsAt": {"$gte": start_dt, "$lte": end_dt}},
+        {"_id": 0, "startsAt": 1, "endsAt": 1, "severity": 1, "labels": 1},
+    )
+
+def _lead_time_rows_query(start_dt, end_dt):
+    return (
+        lead_time_query(start_dt, end_dt),
+        {"_id": 0, "commit_time": 1, "first_deploy_time": 1},
+    )
+
+async def _find_async(collection, query, projection, pipeline=None):
+    """find(query, projection), or the aggregation pipeline instead when one is given."""
+    if pipeline is None:
+        return await get_async_collection(collection).find(query, projection).to_list()
+    cursor = await get_async_collection(collection).aggregate(pipeline)
+    return await cursor.to_list()
+
+async def _fetch_deployments_async(start_dt, end_dt, group_by=None):
+    query = _deployments_query(start_dt, end_dt)
+    pipeline = deployment_pipeline(*query, group_by) if group_by else None
+    deployments = await _find_async(JENKINS_DEPLOYMENTS, *query, pipeline)
+    merged_query = _merged_query(deployments)
+    prs = await get_async_collection(GITHUB_EVENTS).find(*merged_query).to_list() if merged_query else []
+    return deployments, _merged_shas(prs)
+
+async def fetch_snapshot_async(start_dt, end_dt, group_by=None):
+    """
+    Load the window's deployments, alerts and lead-time rows; the reads run
+    concurrently on the event loop. group_by: deployments and lead-time rows
+    carry a "group" field (see processor/groups.py).
+    """
+    lt_query, lt_projection = _lead_time_rows_query(start_dt, end_dt)
+    lt_pipeline = [
+        {"$match": lt_query},
+        {"$project": {**lt_projection, "group": lead_time_group(group_by)}},
+    ] if group_by else None
+    (deploy_list, merged), alerts, lt_rows = await asyncio.gather(
+        _fetch_deployments_async(start_dt, end_dt, group_by),
+        get_async_collection(PROMETHEUS_ALERTS).find(*_alerts_query(start_dt, end_dt)).to_list(),
+        _find_async(COMMIT_INDEX, lt_query, lt_projection, lt_pipeline),
+    )
+    return {
+        "deployments": deploy_list,
+        "merged_commits": merged,
+        "alerts": alerts,
+        "lead_time_rows": lt_rows,
+    }
+
+def metrics_from_snapshot(snapshot, start_time: str, end_time: str, start_dt, end_dt):
+    # Documents become events once; CFR and MTTR share the parsed timestamps
+    deployments = events.deployments(snapshot["deployments"])
+    alerts = events.alerts(snapshot["alerts"])
+
+    # Same filters as get_deployment_frequency_async / calculate_mttr_from_db / calculate_cfr
+    prod_successes = sum(
+        1 for d in deployments if d.job_name == "prod-deploy" and d.status == "SUCCESS"
+    )
+    failed = [d for d in deployments if d.status == "FAILURE"]
+    mttr_alerts = [a for a in alerts if a.severity in MTTR_SEVERITIES]
+
+    return {
+        "deployment_frequency": {
+            "count": prod_successes,
+            "start_date": start_time,
+            "end_date": end_time,
+        },
+        "lead_time": lead_time_from_rows(events.lead_time_rows(snapshot["lead_time_rows"])),
+        "mttr": compute_mttr(failed, mttr_alerts),
+        "cfr": compute_cfr(
+            start_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            end_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            deployments,
+            snapshot["merged_commits"],
+            alerts,
+        ),
+    }
+
+def metrics_by_group(snapshot, group_by, start_time: str, end_time: str, start_dt, end_dt):
+    """
+    metrics_from_snapshot for every group of a grouped snapshot. Groups
+    come from the deployments and lead-time rows; alerts are shared.
+    group_by=job_name counts the successful builds of every job.
+    """
+    deployments = events.deployments(snapshot["deployments"])
+    alerts = events.alerts(snapshot["alerts"])
+    merged = snapshot["merged_commits"]
+    start_iso = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    end_iso = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def by_group(items):
+        return partition(items, lambda item: item.group)
+
+    def frequency(count):
+        return {"count": count, "start_date": start_time, "end_date": end_time}
+
+    successes = [
+        d for d in deployments
+        if d.status == "SUCCESS" and (group_by == "job_name" or d.job_name == "prod-deploy")
+    ]
+    failed = [d for d in deployments if d.status == "FAILURE"]
+    mttr_alerts = [a for a in alerts if a.severity in MTTR_SEVERITIES]
+
+    per_metric = {
+        "deployment_frequency": {name: frequency(len(group)) for name, group in by_group(successes).items()},
+        "lead_time": {
+            name: lead_time_from_rows(rows)
+            for name, rows in by_group(events.lead_time_rows(snapshot["lead_time_rows"])).items()
+        },
+        "mttr": compute_mttr_by_group(failed, mttr_alerts),
+        "cfr": {
+            name: compute_cfr(start_iso, end_iso, group, merged, alerts)
+            for name, group in by_group([d for d in deployments if d.commit_sha in merged]).items()
+        },
+    }
+    empty = {
+        "deployment_frequency": frequency(0),
+        "lead_time": lead_time_from_rows([]),
+        "mttr": compute_mttr([], []),
+        "cfr": compute_cfr(start_iso, end_iso, [], merged, []),
+    }
+    return grouped(group_by, merge_metrics(per_metric, empty))
+
+async def compute_dora_metrics_async(start_time: str, end_time: str, group_by=None):
+    """
+    All four DORA metrics for one window from a single shared snapshot:
+    each collection is read once instead of once per metric.
+    group_by: see metrics_by_group.
+    """
+    try:
+        start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+        end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
+
+    snapshot = await fetch_snapshot_async(start_dt, end_dt, group_by)
+    if group_by:
+        return metrics_by_group(snapshot, group_by, start_time, end_time, start_dt, end_dt)
+    return metrics_from_snapshot(snapshot, start_time, end_time, start_dt, end_dt)
+
+# --- batches of windows ---
+def parse_windows(windows):
+    """[(start_time, end_time, start_dt, end_dt)] for [(start_time, end_time)], or an error dict."""
+    parsed = []
+    for start_time, end_time in windows:
+        try:
+            start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
+        parsed.append((start_time, end_time, start_dt, end_dt))
+    return parsed
+
+def window_spans(windows):
+    """
+    Merge overlapping windows into [(span start, span end, [(index, window)])]
+    in time order, so overlapping ranges (7/30/90 days, current vs previous
+    period) are read once and far-apart ones do not pull in the gap.
+    windows: parse_windows output; index is the position in it.
+    """
+    spans = []
+    for index, window in sorted(enumerate(windows), key=lambda item: item[1][2]):
+        start_dt, end_dt = window[2], window[3]
+        if spans and start_dt <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end_dt)
+            spans[-1][2].append((index, window))
+        else:
+            spans.append([start_dt, end_dt, [(index, window)]])
+    return spans
+
+class _TimeIndex:
+    """Positions of items whose time falls in a range, in their original order."""
+
+    def __init__(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        self.order = np.argsort(times, kind="stable")
+        self.sorted = times[self.order]
+
+    def between(self, lo, hi):
+        i = np.searchsorted(self.sorted, lo, "left")
+        j = np.searchsorted(self.sorted, hi, "right")
+        return np.sort(self.order[i:j]).tolist()
+
+def metrics_for_windows(snapshot, windows, metrics=BATCH_METRICS):
+    """
+    {window index: {metric: result}} for windows inside the snapshot's
+    span; the documents become events once and every window is a slice.
+    windows: [(index, (start_time, end_time, start_dt, end_dt))]
+    """
+    deployments = events.deployments(snapshot["deployments"])
+    alerts = events.alerts(snapshot["alerts"])
+    lt_rows = events.lead_time_rows(snapshot["lead_time_rows"])
+    deploys_at = _TimeIndex([d.ts for d in deployments])
+    alerts_at = _TimeIndex([a.start_ts for a in alerts])
+    lt_rows_at = _TimeIndex([to_epoch(row.deploy_time) for row in lt_rows])
+
+    results = {}
+    for index, (start_time, end_time, start_dt, end_dt) in windows:
+        lo, hi = to_epoch(start_dt), to_epoch(end_dt)
+        window_deploys = [deployments[i] for i in deploys_at.between(lo, hi)]
+        window_alerts = [alerts[i] for i in alerts_at.between(lo, hi)]
+        result = {}
+        if "deployment_frequency" in metrics:
+            # same filter, listing and order as get_deployment_frequency_async
+            listing = sorted((
+                {"timestamp": d.time, "build_id": d.build_id}
+                for d in window_deploys if d.job_name == "prod-deploy" and d.status == "SUCCESS"
+            ), key=deployment_order)
+            result["deployment_frequency"] = {"count": len(listing), "deployments": listing}
+        if "lead_time" in metrics:
+            rows = [lt_rows[i] for i in lt_rows_at.between(lo, hi)]
+            result["lead_time"] = lead_time_from_rows(
+                [row for row in rows if lo <= to_epoch(row.commit_time) <= hi]
+            )
+        if "mttr" in metrics:
+            result["mttr"] = compute_mttr(
+                [d for d in window_deploys if d.status == "FAILURE"],
+                [a for a in window_alerts if a.severity in MTTR_SEVERITIES],
+            )
+        if "cfr" in metrics:
+            result["cfr"] = compute_cfr(
+                start_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                end_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                window_deploys,
+                snapshot["merged_commits"],
+                window_alerts,
+            )
+        results[index] = result
+    return results
+
+def _batch_result(windows, results):
+    return {"results": [
+        {"start_time": start_time, "end_time": end_time, **results[i]}
+        for i, (start_time, end_time, _, _) in enumerate(windows)
+    ]}
+
+async def compute_batch_async(windows, metrics=BATCH_METRICS):
+    """
+    Metrics for many (start_time, end_time) windows in one call. Windows
+    are sorted and merged into spans; each span's collections are read
+    once (all spans concurrently) and its windows are sliced from the
+    in-memory events. Results come back in request order.
+    """
+    parsed = parse_windows(windows)
+    if isinstance(parsed, dict):
+        return parsed
+    spans = window_spans(parsed)
+    snapshots = await asyncio.gather(*(fetch_snapshot_async(start, end) for start, end, _ in spans))
+    results = {}
+    for (_, _, span_windows), snapshot in zip(spans, snapshots):
+        results.update(metrics_for_windows(snapshot, span_windows, metrics))
+    return _batch_result(parsed, results)
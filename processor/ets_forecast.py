@@ -0,0 +1,100 @@
+# processor/ets_forecast.py
+"""
+Additive Holt-Winters (ETS with damped trend and weekly seasonality) in
+plain NumPy, for the short daily series behind /forecast. Fits in a few
+milliseconds where Prophet needs a Stan run.
+
+Smoothing parameters are chosen by one-step-ahead SSE over a small grid;
+the whole grid is evaluated in one vectorised pass over the series.
+"""
+from itertools import product
+import numpy as np
+import pandas as pd
+
+SEASON = 7  # daily data, weekly cycle
+Z_95 = 1.959964  # same 95% band as Prophet's interval_width=0.95
+
+_ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.7)
+_BETAS = (0.0, 0.01, 0.05, 0.1)
+_GAMMAS = (0.0, 0.05, 0.1, 0.3)
+_PHIS = (0.9, 0.98)
+
+
+def _grid(seasonal: bool):
+    gammas = _GAMMAS if seasonal else (0.0,)
+    g = np.array(list(product(_ALPHAS, _BETAS, gammas, _PHIS)), dtype=float)
+    return g[:, 0], g[:, 1], g[:, 2], g[:, 3]
+
+def _initial_state(y: np.ndarray, m: int):
+    if m == 1:
+        level = y[0]
+        trend = (y[min(len(y) - 1, 3)] - y[0]) / max(1, min(len(y) - 1, 3))
+        return level, trend, np.zeros(1)
+    first, second = y[:m].mean(), y[m:2 * m].mean()
+    return first, (second - first) / m, y[:m] - first
+
+def _smooth(y, m, alpha, beta, gamma, phi):
+    """
+    Run the recursions for k parameter sets at once.
+    Returns (one-step fitted values [k, n], final level, trend, seasonals).
+    """
+    k, n = len(alpha), len(y)
+    l0, b0, s0 = _initial_state(y, m)
+    level = np.full(k, l0)
+    trend = np.full(k, b0)
+    season = np.tile(s0, (k, 1))
+    fitted = np.empty((k, n))
+    for t in range(n):
+        i = t % m
+        s = season[:, i]
+        fitted[:, t] = level + phi * trend + s
+        new_level = alpha * (y[t] - s) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        season[:, i] = gamma * (y[t] - new_level) + (1 - gamma) * s
+        level = new_level
+    return fitted, level, trend, season
+
+def fit_ets(df: pd.DataFrame, periods: int):
+    """
+    Fit on (ds, y) daily data and forecast `periods` days ahead.
+    Returns (history_df, forecast_df) shaped like processor.forecast._fit_prophet:
+    the forecast covers the history (one-step fitted values) plus the future.
+    """
+    if df.empty:
+        return df, pd.DataFrame(columns=["ds", "yhat", "yhat_lower", "yhat_upper"])
+
+    y = df["y"].to_numpy(dtype=float)
+    n = len(y)
+    m = SEASON if n >= 2 * SEASON else 1
+    alpha, beta, gamma, phi = _grid(seasonal=m > 1)
+
+    fitted, level, trend, season = _smooth(y, m, alpha, beta, gamma, phi)
+    sse = ((y - fitted) ** 2).sum(axis=1)
+    best = int(np.argmin(sse))
+    a, b, g, p = alpha[best], beta[best], gamma[best], phi[best]
+    sigma = np.sqrt(sse[best] / max(1, n - 1))
+
+    # h-step point forecast and variance (Hyndman et al., class 1 ETS)
+    h = np.arange(1, periods + 1)
+    damp = np.cumsum(p ** h)
+    yhat = level[best] + damp * trend[best] + season[best][(n + h - 1) % m]
+    c = a * (1 + b * damp)
+    if m > 1:
+        c = c + g * (h % m == 0)
+    var = sigma ** 2 * np.concatenate(([1.0], 1 + np.cumsum(c[:-1] ** 2)))
+    half = Z_95 * np.sqrt(var)
+
+    ds = pd.to_datetime(df["ds"])
+    future = pd.date_range(ds.iloc[-1] + pd.Timedelta(days=1), periods=periods, freq="D")
+    point = np.concatenate((fitted[best], yhat))
+    band = np.concatenate((np.full(n, Z_95 * sigma), half))
+    fcst = pd.DataFrame({
+        "ds": np.concatenate((ds.to_numpy(), future.to_numpy())),
+        "yhat": point,
+        "yhat_lower": point - band,
+        "yhat_upper": point + band,
+    })
+    # same non-negativity rule as the Prophet path
+    for col in ["yhat", "yhat_lower", "yhat_upper"]:
+        fcst[col] = fcst[col].clip(lower=0.0)
+    return df, fcst
@@ -0,0 +1,772 @@
+# processor/event_store.py
+"""
+Resident columnar copy of deployments, alerts and the commit index for the
+query API, so DF/LT/MTTR/CFR run as NumPy masks, searchsorted and
+bincount group-bys instead of Mongo reads plus Python loops over dicts.
+
+Layout (one struct-of-arrays table per source, one row per document):
+
+    deployments  ts, job, status, service, commit
+    alerts       start, end, severity, critical, commit, service
+    commits      sha, commit_time, deploy_time, merged, service, branch, repo
+
+Deployments are also counted per hour, job, status and service in
+Fenwick trees (processor/count_index.py) kept current with the table, so
+deployment counts over any window cost O(log hours) plus the rows of its
+two partial hours.
+
+Times are int64 epoch milliseconds (the resolution of a BSON date, so
+results match the Mongo path exactly); NO_TIME marks a missing value.
+Job names, statuses, severities, services, PR target branches and
+repositories are categorical codes and commit SHAs interned integer ids,
+shared across the tables.
+
+The store loads in a background thread at API startup; until then
+`ready` is False and the endpoints keep using Mongo. Afterwards it polls
+each collection for documents whose ingested_at (stamped on every write
+by the collectors) is newer than the last one seen, applies them in
+place, and drops the metric cache entries of the affected windows.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from collector.utils import to_datetime
+from config import (
+    EVENT_STORE_REFRESH_SECONDS,
+    EVENT_STORE_REFRESH_OVERLAP_SECONDS,
+)
+from db import get_collection, JENKINS_DEPLOYMENTS, PROMETHEUS_ALERTS, COMMIT_INDEX, INGESTED_AT
+from processor.cfr_processor import _cfr_result, _parse_window
+from processor.count_index import HourlyCounts, MS_PER_HOUR
+from processor.df_processor import deployment_order
+from processor.dora_engine import BATCH_METRICS, _batch_result, parse_windows
+from processor.metric_cache import metric_cache
+from processor.mttr_processor import SCOPES, _parse_request
+from processor.groups import grouped, label, merge_metrics, split_codes
+from processor.periods import GRANULARITIES, period_cfr, period_counts, period_means
+
+logger = logging.getLogger(__name__)
+
+NO_TIME = np.iinfo(np.int64).min
+MS_PER_DAY = 86_400_000
+PROD_JOB = "prod-deploy"
+MTTR_SEVERITIES = ("critical", "high")
+_EPOCH = datetime(1970, 1, 1)
+_KEY_SHIFT = 42  # composite (scope key, time) sort keys: 2**42 ms is ~139 years
+# a cached sort order absorbs a batch of changed rows while n >= this * rows
+# (an O(n) merge); larger batches are sorted again on the next query
+_MERGE_LIMIT = 64
+
+
+def _to_ms(value):
+    dt = to_datetime(value)
+    if dt is None:
+        return NO_TIME
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+def _from_ms(ms):
+    return _EPOCH + timedelta(milliseconds=int(ms))
+
+
+class _Vocabulary:
+    """Interns values as int32 codes; code 0 is None."""
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: 0}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value):
+        """Code of value, or -1 if it was never seen."""
+        return self._codes.get(value, -1)
+
+
+def _position(order, values, value, row):
+    """Place of (value, row) in a (value, row)-ordered sort: values sorted, ties in row order."""
+    at = np.searchsorted(values, value, "left")
+    end = np.searchsorted(values, value, "right")
+    return int(at + np.searchsorted(order[at:end], row)) if end > at else int(at)
+
+def _insert(array, at, items):
+    """array with items inserted before the positions at (non-decreasing)."""
+    pieces, previous = [], 0
+    for i, position in enumerate(at):
+        pieces += [array[previous:position], items[i:i + 1]]
+        previous = position
+    pieces.append(array[previous:])
+    return np.concatenate(pieces)
+
+
+class _Table:
+    """Growable struct-of-arrays keyed by document id; updates overwrite rows in place."""
+
+    def __init__(self, columns):
+        self.names = [name for name, _ in columns]
+        self._cols = {name: np.empty(0, dtype) for name, dtype in columns}
+        self._rows = {}  # document id -> row
+        self.keys = []  # row -> document id
+        self.n = 0
+        self.version = 0
+        self._sorted = {}  # column -> (version, order, sorted values)
+
+    def __getitem__(self, name):
+        return self._cols[name][:self.n]
+
+    def _grow(self, extra):
+        needed = self.n + extra
+        capacity = len(self._cols[self.names[0]])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, col in self._cols.items():
+            grown = np.empty(capacity, col.dtype)
+            grown[:self.n] = col[:self.n]
+            self._cols[name] = grown
+
+    def upsert_many(self, rows):
+        """
+        rows: [(document id, (value per column))]. Returns
+        [(old values or None, new values)] for the rows that changed.
+        """
+        changed = []
+        moved = {}  # row -> values before this batch (None for added rows)
+        fresh = []
+        for key, values in rows:
+            row = self._rows.get(key)
+            if row is None:
+                fresh.append((key, values))
+                continue
+            old = tuple(self._cols[name][row].item() for name in self.names)
+            if old == tuple(values):
+                continue
+            for name, value in zip(self.names, values):
+                self._cols[name][row] = value
+            changed.append((old, values))
+            moved.setdefault(row, old)
+        if fresh:
+            # a batch may repeat an id; the last version wins
+            latest = dict(fresh)
+            self._grow(len(latest))
+            start = self.n
+            for i, name in enumerate(self.names):
+                self._cols[name][start:start + len(latest)] = [values[i] for values in latest.values()]
+            for offset, key in enumerate(latest):
+                self._rows[key] = start + offset
+                self.keys.append(key)
+            moved.update(dict.fromkeys(range(start, start + len(latest))))
+            self.n += len(latest)
+            changed.extend((None, values) for values in latest.values())
+        if changed:
+            self.version += 1
+            self._merge_sorted(moved)
+        return changed
+
+    def _merge_sorted(self, moved):
+        """
+        Bring the cached sort orders up to date after rows changed or were
+        added (moved: row -> previous values or None): take them out and
+        insert them again at their searchsorted place, ties in row order
+        like the stable argsort of sorted_by. O(n) copies, no sort.
+        """
+        for name, (version, order, values) in list(self._sorted.items()):
+            if version != self.version - 1 or len(moved) * _MERGE_LIMIT > self.n:
+                del self._sorted[name]
+                continue
+            column = self.names.index(name)
+            old = [(values_before[column], row) for row, values_before in moved.items() if values_before is not None]
+            if old:
+                gone = sorted(_position(order, values, value, row) for value, row in old)
+                order, values = np.delete(order, gone), np.delete(values, gone)
+            rows = np.fromiter(moved, np.int64, len(moved))
+            new_values = self[name][rows]
+            by = np.lexsort((rows, new_values))
+            rows, new_values = rows[by], new_values[by]
+            at = [_position(order, values, value, row) for value, row in zip(new_values.tolist(), rows.tolist())]
+            self._sorted[name] = (self.version, _insert(order, at, rows), _insert(values, at, new_values))
+
+    def sorted_by(self, name):
+        """(row order, sorted column) for a column, cached and kept current by upsert_many."""
+        cached = self._sorted.get(name)
+        if cached is None or cached[0] != self.version:
+            order = np.argsort(self[name], kind="stable")
+            cached = self._sorted[name] = (self.version, order, self[name][order])
+        return cached[1], cached[2]
+
+    def nbytes(self):
+        return sum(col[:self.n].nbytes for col in self._cols.values())
+
+
+class EventStore:
+    def __init__(self, refresh_seconds: float, overlap_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.jobs = _Vocabulary()
+        self.statuses = _Vocabulary()
+        self.severities = _Vocabulary()
+        self.services = _Vocabulary()
+        self.shas = _Vocabulary()
+        self.branches = _Vocabulary()
+        self.repos = _Vocabulary()
+        self.deployments = _Table([
+            ("ts", np.int64), ("job", np.int32), ("status", np.int32), ("service", np.int32), ("commit", np.int32),
+        ])
+        self.alerts = _Table([
+            ("start", np.int64), ("end", np.int64), ("severity", np.int32), ("critical", np.bool_),
+            ("commit", np.int32), ("service", np.int32),
+        ])
+        self.commits = _Table([
+            ("sha", np.int32), ("commit_time", np.int64), ("deploy_time", np.int64), ("merged", np.bool_),
+            ("service", np.int32), ("branch", np.int32), ("repo", np.int32),
+        ])
+        self.deployment_counts = HourlyCounts()
+        # collection -> (table, id field, doc -> row values)
+        self._sources = {
+            JENKINS_DEPLOYMENTS: (self.deployments, "build_id", self._deployment_row),
+            PROMETHEUS_ALERTS: (self.alerts, "alert_id", self._alert_row),
+            COMMIT_INDEX: (self.commits, "sha", self._commit_row),
+        }
+        self._marks = {}  # collection -> newest ingested_at seen
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.ready = False
+        self.refreshes = 0
+        self.last_refresh_ms = None
+        self.load_seconds = None
+
+    # --- document -> row ---
+    def _deployment_row(self, doc):
+        return (
+            _to_ms(doc.get("timestamp")),
+            self.jobs.code(doc.get("job_name")),
+            self.statuses.code(doc.get("status")),
+            self.services.code(doc.get("service")),
+            self.shas.code(doc.get("commit_sha")),
+        )
+
+    def _alert_row(self, doc):
+        labels = doc.get("labels") or {}
+        critical = "commit" in labels and (
+            (doc.get("severity") or "").lower() == "critical"
+            or (labels.get("severity") or "").lower() == "critical"
+        )
+        return (
+            _to_ms(doc.get("startsAt")),
+            _to_ms(doc.get("endsAt")),
+            self.severities.code(doc.get("severity")),
+            critical,
+            self.shas.code(labels.get("commit")),
+            self.services.code(labels.get("service")),
+        )
+
+    def _commit_row(self, doc):
+        return (
+            self.shas.code(doc.get("sha")),
+            _to_ms(doc.get("commit_time")),
+            _to_ms(doc.get("first_deploy_time")),
+            doc.get("merged_at") is not None,
+            self.services.code(doc.get("first_deploy_service")),
+            self.branches.code(doc.get("target_branch")),
+            self.repos.code(doc.get("repo")),
+        )
+
+    # --- loading ---
+    def _pull(self, collection):
+        """Read new/changed documents of one collection; returns the changed row values."""
+        table, id_field, to_row = self._sources[collection]
+        mark = self._marks.get(collection)
+        query = {INGESTED_AT: {"$gte": mark - self.overlap}} if mark else {}
+        started = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = []
+        newest = mark
+        for doc in get_collection(collection).find(query, {"_id": 0}):
+            key = doc.get(id_field)
+            if key is None:
+                continue
+            rows.append((key, to_row(doc)))
+            stamp = doc.get(INGESTED_AT)
+            if stamp is not None and (newest is None or stamp > newest):
+                newest = stamp
+        # nothing stamped yet (data written before ingested_at existed): start from now
+        self._marks[collection] = newest or started
+        with self._lock:
+            changed = table.upsert_many(rows)
+            if table is self.deployments:
+                self._count_deployments(changed)
+            return changed
+
+    def _count_deployments(self, changed):
+        """Apply deployment row changes (old values, new values) to the hourly counts."""
+        counts = []
+        for old, new in changed:
+            for values, delta in ((old, -1), (new, 1)):
+                if values is not None and values[0] != NO_TIME:
+                    ts, job, status, service, _ = values
+                    counts.append((ts, job, status, service, delta))
+        self.deployment_counts.apply(counts)
+
+    def refresh(self):
+        """Apply every change since the last refresh; the first call loads everything."""
+        started = time.perf_counter()
+        changed = 0
+        times = []
+        for collection in self._sources:
+            for old, new in self._pull(collection):
+                changed += 1
+                if self.ready:
+                    times += self._event_times(collection, old) + self._event_times(collection, new)
+        self.refreshes += 1
+        self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 2)
+        times = [t for t in times if t != NO_TIME]
+        if times:
+            metric_cache.invalidate_range(_from_ms(min(times)), _from_ms(max(times)))
+        return changed
+
+    @staticmethod
+    def _event_times(collection, values):
+        if values is None:
+            return []
+        if collection == JENKINS_DEPLOYMENTS:
+            return [values[0]]
+        if collection == PROMETHEUS_ALERTS:
+            return [values[0], values[1]]
+        return [values[1], values[2]]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if not self.ready:
+                    loading = time.perf_counter()
+                    self.refresh()
+                    self.load_seconds = round(time.perf_counter() - loading, 3)
+                    self.ready = True
+                    logger.info(f"Event store loaded in {self.load_seconds}s: {self.stats()['rows']}")
+                else:
+                    self.refresh()
+            except Exception as e:
+                logger.warning(f"Event store refresh failed, will retry: {e}")
+            self._stopped.wait(self.refresh_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "rows": {
+                "deployments": self.deployments.n,
+                "alerts": self.alerts.n,
+                "commits": self.commits.n,
+            },
+            "bytes": self.deployments.nbytes() + self.alerts.nbytes() + self.commits.nbytes(),
+            "deployment_count_bytes": self.deployment_counts.nbytes(),
+            "interned_shas": len(self.shas.values) - 1,
+            "load_seconds": self.load_seconds,
+            "refreshes": self.refreshes,
+            "last_refresh_ms": self.last_refresh_ms,
+        }
+
+    # --- vectorized building blocks ---
+    def _window(self, table, column, start_ms, end_ms):
+        """Rows with start_ms <= column <= end_ms, in column order."""
+        order, values = table.sorted_by(column)
+        lo = np.searchsorted(values, start_ms, "left")
+        hi = np.searchsorted(values, end_ms, "right")
+        return order[lo:hi]
+
+    def _deployment_rows(self, start_ms, end_ms, job=None, status=None):
+        rows = self._window(self.deployments, "ts", start_ms, end_ms)
+        if job is not None:
+            rows = rows[self.deployments["job"][rows] == self.jobs.find(job)]
+        if status is not None:
+            rows = rows[self.deployments["status"][rows] == self.statuses.find(status)]
+        return rows
+
+    def _counted(self, start_ms, end_ms, job=None, status=None, by=None):
+        """
+        Number of deployments with start_ms <= ts <= end_ms, or with by
+        ("job" / "service") {code: number}: whole hours from the hourly
+        counts, the partial hours at either end from the rows. Call with
+        the lock held.
+        """
+        index = self.deployment_counts
+        first = -(-start_ms // MS_PER_HOUR)  # first hour starting at/after start
+        stop = (end_ms + 1) // MS_PER_HOUR  # hours before stop end at/before end
+        if first < stop:
+            keys = np.ones(len(index.job), np.bool_)
+            if job is not None:
+                keys &= index.job == self.jobs.find(job)
+            if status is not None:
+                keys &= index.status == self.statuses.find(status)
+            sums = index.sums(first, stop - 1)[keys]
+            edges = np.concatenate([
+                self._deployment_rows(start_ms, first * MS_PER_HOUR - 1, job, status),
+                self._deployment_rows(stop * MS_PER_HOUR, end_ms, job, status),
+            ])
+        else:
+            keys = sums = np.empty(0, np.int64)
+            edges = self._deployment_rows(start_ms, end_ms, job, status)
+        if by is None:
+            return int(sums.sum()) + len(edges)
+        codes = np.concatenate([getattr(index, by)[keys], self.deployments[by][edges]])
+        weights = np.concatenate([sums, np.ones(len(edges), np.int64)])
+        totals = np.bincount(codes, weights, minlength=1).astype(np.int64)
+        return {code: count for code, count in enumerate(totals.tolist()) if count}
+
+    @staticmethod
+    def _averages(times, values, formats):
+        """
+        {fmt: {period: average}} of values grouped by the period of each
+        time (epoch ms). Only the distinct days are formatted; records are
+        summed in row order, like the per-record loops of the processors.
+        """
+        days, day_of_record = np.unique(times // MS_PER_DAY, return_inverse=True)
+        dates = [_EPOCH + timedelta(days=int(d)) for d in days]
+        out = {}
+        for fmt in formats:
+            labels, period_of_day = np.unique([d.strftime(fmt) for d in dates], return_inverse=True)
+            period = period_of_day[day_of_record]
+            sums = np.bincount(period, weights=values, minlength=len(labels))
+            counts = np.bincount(period, minlength=len(labels))
+            out[fmt] = {str(k): round(float(s) / int(c), 2) for k, s, c in zip(labels, sums, counts)}
+        return out
+
+    # --- metrics (same results as the Mongo-backed processors) ---
+    def deployment_count(self, start_dt, end_dt, job=PROD_JOB, status="SUCCESS"):
+        with self._lock:
+            return self._counted(_to_ms(start_dt), _to_ms(end_dt), job, status)
+
+    def deployment_listing(self, start_dt, end_dt, job=PROD_JOB, status="SUCCESS"):
+        """[{timestamp, build_id}] in (timestamp, build_id) order, like get_deployment_frequency_async's list."""
+        with self._lock:
+            rows = self._deployment_rows(_to_ms(start_dt), _to_ms(end_dt), job, status)
+            ts = self.deployments["ts"][rows]
+            keys = self.deployments.keys
+            listing = [{"timestamp": _from_ms(t), "build_id": keys[r]} for r, t in zip(rows.tolist(), ts.tolist())]
+        # rows are in time order already; this only orders builds with the same timestamp
+        listing.sort(key=deployment_order)
+        return listing
+
+    def _deployment_groups(self, group_by, rows):
+        """(group code per row, values by code) of deployment rows; call with the lock held."""
+        if group_by == "job_name":
+            return self.deployments["job"][rows], self.jobs.values
+        if group_by == "service":
+            return self.deployments["service"][rows], self.services.values
+        # target_branch / repo of the commit's PR, through the commit index rows
+        column, vocabulary = self._commit_group_column(group_by)
+        by_sha = np.zeros(len(self.shas.values), np.int32)
+        by_sha[self.commits["sha"]] = self.commits[column]
+        return by_sha[self.deployments["commit"][rows]], vocabulary.values
+
+    def _commit_groups(self, group_by, rows):
+        """(group code per row, values by code) of commit index rows; call with the lock held."""
+        if group_by == "job_name":
+            # lead time is always measured to the first prod deployment
+            return np.ones(len(rows), np.int32), [None, PROD_JOB]
+        column, vocabulary = self._commit_group_column(group_by)
+        return self.commits[column][rows], vocabulary.values
+
+    def _commit_group_column(self, group_by):
+        return {
+            "service": ("service", self.services),
+            "target_branch": ("branch", self.branches),
+            "repo": ("repo", self.repos),
+        }[group_by]
+
+    def lead_time(self, start_dt, end_dt, granularity=None, zone=None, group_by=None):
+        """lt_processor.lead_time_from_rows (or lead_time_by_period) over the commit index rows of the window."""
+        start_ms, end_ms = _to_ms(start_dt), _to_ms(end_dt)
+        with self._lock:
+            rows = np.sort(self._window(self.commits, "deploy_time", start_ms, end_ms))
+            commit_time = self.commits["commit_time"][rows]
+            deploy_time = self.commits["deploy_time"][rows]
+            if group_by:
+                codes, values = self._commit_groups(group_by, rows)
+        keep = (commit_time >= start_ms) & (commit_time <= end_ms) & (deploy_time >= commit_time)
+        commit_time, deploy_time = commit_time[keep], deploy_time[keep]
+        hours = (deploy_time - commit_time) / 3_600_000
+        if group_by:
+            return grouped(group_by, {
+                name: self._lead_time_result(deploy_time[i], hours[i], granularity, zone)
+                for name, i in split_codes(codes[keep], values).items()
+            })
+        return self._lead_time_result(deploy_time, hours, granularity, zone)
+
+    def _lead_time_result(self, deploy_time, hours, granularity, zone):
+        if granularity:
+            return {GRANULARITIES[granularity]: period_means(deploy_time, hours, granularity, zone)}
+        return {"daily": self._averages(deploy_time, hours, ["%Y-%m-%d"])["%Y-%m-%d"]}
+
+    def mttr(self, start_dt, end_dt, scope=None, severities=MTTR_SEVERITIES, granularity=None, zone=None,
+             group_by=None):
+        """mttr_processor.compute_mttr (or compute_mttr_by_group) over the failed deploys and alerts of the window."""
+        if scope is not None and scope not in SCOPES:
+            raise ValueError(f"Unknown scope. Use one of: {', '.join(SCOPES)}")
+        start_ms, end_ms = _to_ms(start_dt), _to_ms(end_dt)
+        with self._lock:
+            deploys = np.sort(self._deployment_rows(start_ms, end_ms, status="FAILURE"))
+            deploy_ts = self.deployments["ts"][deploys]
+            alerts = self._window(self.alerts, "start", start_ms, end_ms)
+            codes = [self.severities.find(s) for s in severities]
+            alerts = alerts[np.isin(self.alerts["severity"][alerts], codes)]
+            starts = self.alerts["start"][alerts]
+            ends = self.alerts["end"][alerts]
+            if scope:
+                # both tables name their scope columns after the scope
+                deploy_key = self.deployments[scope][deploys]
+                alert_key = self.alerts[scope][alerts]
+            if group_by:
+                groups, values = self._deployment_groups(group_by, deploys)
+
+        if scope:
+            # first alert with the same key starting at/after the deploy:
+            # one searchsorted over composite (key, time - base) values
+            base = min(starts.min(initial=0), deploy_ts.min(initial=0))
+            alert_comp = (alert_key.astype(np.int64) << _KEY_SHIFT) | (starts - base)
+            deploy_comp = (deploy_key.astype(np.int64) << _KEY_SHIFT) | (deploy_ts - base)
+        else:
+            alert_comp, deploy_comp = starts, deploy_ts
+        order = np.argsort(alert_comp, kind="stable")
+        alert_comp, ends = alert_comp[order], ends[order]
+        i = np.searchsorted(alert_comp, deploy_comp, "left")
+        found = i < len(alert_comp)
+        if scope:
+            found[found] &= (alert_comp[i[found]] >> _KEY_SHIFT) == (deploy_comp[found] >> _KEY_SHIFT)
+        recovered = np.full(len(deploy_ts), NO_TIME)
+        recovered[found] = ends[i[found]]
+        matched = (recovered != NO_TIME) & (recovered >= deploy_ts)
+        minutes = (recovered[matched] - deploy_ts[matched]) / 60_000
+        deploy_ts = deploy_ts[matched]
+        if group_by:
+            return grouped(group_by, {
+                name: self._mttr_result(deploy_ts[i], minutes[i], granularity, zone)
+                for name, i in split_codes(groups[matched], values).items()
+            })
+        return self._mttr_result(deploy_ts, minutes, granularity, zone)
+
+    def _mttr_result(self, deploy_ts, minutes, granularity, zone):
+        if granularity:
+            return {GRANULARITIES[granularity]: period_means(deploy_ts, minutes, granularity, zone)}
+        averages = self._averages(deploy_ts, minutes, ["%Y-%m-%d", "%Y-W%U", "%Y-%m"])
+        return {
+            "daily": averages["%Y-%m-%d"],
+            "weekly": averages["%Y-W%U"],
+            "monthly": averages["%Y-%m"],
+        }
+
+    def _cfr_events(self, start_dt, end_dt, group_by=None):
+        """
+        (deploy times, commits, failed flags) of the window's deployments of
+        merged commits, (start times, commits) of its critical commit alerts
+        and, with group_by, (group code per deployment, values by code).
+        """
+        start_ms, end_ms = _to_ms(start_dt), _to_ms(end_dt)
+        groups = None
+        with self._lock:
+            deploys = self._window(self.deployments, "ts", start_ms, end_ms)
+            deploy_ts = self.deployments["ts"][deploys]
+            commit = self.deployments["commit"][deploys]
+            failed_status = self.deployments["status"][deploys] == self.statuses.find("FAILURE")
+            merged = np.zeros(len(self.shas.values), np.bool_)
+            merged[self.commits["sha"][self.commits["merged"]]] = True
+            alerts = self._window(self.alerts, "start", start_ms, end_ms)
+            alerts = alerts[self.alerts["critical"][alerts]]
+            alert_starts = self.alerts["start"][alerts]
+            alert_commits = self.alerts["commit"][alerts]
+            if group_by:
+                groups = self._deployment_groups(group_by, deploys)
+
+        keep = (commit != 0) & merged[commit]
+        if groups:
+            groups = (groups[0][keep], groups[1])
+        return (deploy_ts[keep], commit[keep], failed_status[keep]), (alert_starts, alert_commits), groups
+
+    def cfr_counts(self, start_dt, end_dt):
+        """(total changes, failed changes), as cfr_processor.cfr_pipeline counts them."""
+        deploys, alerts, _ = self._cfr_events(start_dt, end_dt)
+        return self._count_changes(deploys, alerts)
+
+    @staticmethod
+    def _count_changes(deploys, alerts):
+        (_, commit, failed_status), (_, alert_commits) = deploys, alerts
+        changes = np.unique(commit)
+        failed = np.union1d(commit[failed_status], np.intersect1d(changes, alert_commits))
+        return len(changes), len(failed)
+
+    def _cfr_from_events(self, start_time, end_time, deploys, alerts, granularity, zone):
+        total, failed = self._count_changes(deploys, alerts)
+        result = _cfr_result(start_time, end_time, [{"total_changes": total, "failed_changes": failed}])
+        if granularity:
+            result[GRANULARITIES[granularity]] = period_cfr(*deploys, *alerts, granularity, zone)
+        return result
+
+    def _frequency(self, start_dt, end_dt, granularity=None, zone=None, group_by=None):
+        """Successful prod deploys (every job's with group_by=job_name): count and periods."""
+        job = None if group_by == "job_name" else PROD_JOB
+        if not granularity and group_by in (None, "job_name", "service"):
+            return self._frequency_counts(start_dt, end_dt, job, group_by)
+        with self._lock:
+            rows = self._deployment_rows(_to_ms(start_dt), _to_ms(end_dt), job, "SUCCESS")
+            ts = self.deployments["ts"][rows]
+            if group_by:
+                codes, values = self._deployment_groups(group_by, rows)
+        if group_by:
+            return grouped(group_by, {
+                name: self._counts(ts[i], granularity, zone) for name, i in split_codes(codes, values).items()
+            })
+        return self._counts(ts, granularity, zone)
+
+    def _frequency_counts(self, start_dt, end_dt, job, group_by):
+        """_frequency without periods, from the hourly counts."""
+        start_ms, end_ms = _to_ms(start_dt), _to_ms(end_dt)
+        with self._lock:
+            if not group_by:
+                return {"count": self._counted(start_ms, end_ms, job, "SUCCESS")}
+            column, vocabulary = {"job_name": ("job", self.jobs), "service": ("service", self.services)}[group_by]
+            counts = self._counted(start_ms, end_ms, job, "SUCCESS", by=column)
+            values = vocabulary.values
+        groups = {}
+        for code, count in counts.items():
+            name = label(values[code])
+            groups[name] = groups.get(name, 0) + count
+        return grouped(group_by, {name: {"count": count} for name, count in sorted(groups.items())})
+
+    @staticmethod
+    def _counts(ts, granularity, zone):
+        result = {"count": len(ts)}
+        if granularity:
+            result[GRANULARITIES[granularity]] = period_counts(ts, granularity, zone)
+        return result
+
+    # --- drop-in replacements for the processors' entry points ---
+    def get_deployment_frequency(self, start_time: str, end_time: str, granularity=None, zone=None, group_by=None):
+        try:
+            start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return {"error": "Invalid datetime format. Use 'YYYY-MM-DD HH:MM:SS'"}
+        if granularity or group_by:
+            return self._frequency(start_dt, end_dt, granularity, zone, group_by)
+        deployments = self.deployment_listing(start_dt, end_dt)
+        return {"count": len(deployments), "deployments": deployments}
+
+    def get_deployment(self, start_time: str, end_time: str):
+        try:
+            start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return {"error": "Invalid datetime format. Use 'YYYY-MM-DD HH:MM:SS'"}
+        return {"count": self.deployment_count(start_dt, end_dt), "start_date": start_time, "end_date": end_time}
+
+    def get_lead_time(self, start_time: str, end_time: str, granularity=None, zone=None, group_by=None):
+        try:
+            start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return {"error": "Invalid date format. Use YYYY-MM-DD HH:MM:SS"}
+        return self.lead_time(start_dt, end_dt, granularity, zone, group_by)
+
+    def calculate_mttr(self, start_time: str, end_time: str, scope=None, granularity=None, zone=None,
+                       group_by=None):
+        start_dt, end_dt, error = _parse_request(start_time, end_time, scope)
+        if error:
+            return error
+        return self.mttr(start_dt, end_dt, scope, granularity=granularity, zone=zone, group_by=group_by)
+
+    def calculate_cfr(self, start_time: str, end_time: str, granularity=None, zone=None, group_by=None):
+        """start/end: ISO 8601, like calculate_cfr_from_db."""
+        start_dt, end_dt = _parse_window(start_time, end_time)
+        deploys, alerts, groups = self._cfr_events(start_dt, end_dt, group_by)
+        if group_by:
+            # a change counts in every group that deployed it
+            codes, values = groups
+            return grouped(group_by, {
+                name: self._cfr_from_events(start_time, end_time, tuple(col[i] for col in deploys), alerts,
+                                            granularity, zone)
+                for name, i in split_codes(codes, values).items()
+            })
+        return self._cfr_from_events(start_time, end_time, deploys, alerts, granularity, zone)
+
+    def compute_dora_metrics(self, start_time: str, end_time: str, group_by=None):
+        try:
+            start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+            end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
+        start_iso = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        end_iso = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        def frequency(count):
+            return {"count": count, "start_date": start_time, "end_date": end_time}
+
+        if group_by:
+            # like dora_engine.metrics_by_group
+            counts = self._frequency(start_dt, end_dt, group_by=group_by)["groups"]
+            per_metric = {
+                "deployment_frequency": {name: frequency(c["count"]) for name, c in counts.items()},
+                "lead_time": self.lead_time(start_dt, end_dt, group_by=group_by)["groups"],
+                "mttr": self.mttr(start_dt, end_dt, group_by=group_by)["groups"],
+                "cfr": self.calculate_cfr(start_iso, end_iso, group_by=group_by)["groups"],
+            }
+            empty = {
+                "deployment_frequency": frequency(0),
+                "lead_time": {"daily": {}},
+                "mttr": {"daily": {}, "weekly": {}, "monthly": {}},
+                "cfr": _cfr_result(start_iso, end_iso, []),
+            }
+            return grouped(group_by, merge_metrics(per_metric, empty))
+        return {
+            "deployment_frequency": self.get_deployment(start_time, end_time),
+            "lead_time": self.lead_time(start_dt, end_dt),
+            "mttr": self.mttr(start_dt, end_dt),
+            "cfr": self.calculate_cfr(start_iso, end_iso),
+        }
+
+    def compute_batch(self, windows, metrics=BATCH_METRICS):
+        """
+        dora_engine.compute_batch_async: every window is a searchsorted
+        slice of the same sorted columns, so a batch costs one sort (cached
+        until the next change) plus O(log n) per window and metric.
+        """
+        parsed = parse_windows(windows)
+        if isinstance(parsed, dict):
+            return parsed
+        results = {}
+        for index, (_, _, start_dt, end_dt) in enumerate(parsed):
+            result = {}
+            if "deployment_frequency" in metrics:
+                deployments = self.deployment_listing(start_dt, end_dt)
+                result["deployment_frequency"] = {"count": len(deployments), "deployments": deployments}
+            if "lead_time" in metrics:
+                result["lead_time"] = self.lead_time(start_dt, end_dt)
+            if "mttr" in metrics:
+                result["mttr"] = self.mttr(start_dt, end_dt)
+            if "cfr" in metrics:
+                result["cfr"] = self.calculate_cfr(
+                    start_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    end_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                )
+            results[index] = result
+        return _batch_result(parsed, results)
+
+
+event_store = EventStore(EVENT_STORE_REFRESH_SECONDS, EVENT_STORE_REFRESH_OVERLAP_SECONDS)
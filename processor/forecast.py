@@ -2,31 +2,18 @@
 
 from datetime import datetime
 from typing import Tuple, List, Dict
-from pymongo import MongoClient
 import pandas as pd
 from prophet import Prophet
-
-# --- Mongo connection ---
-client = MongoClient("mongodb://localhost:27017")
-db = client["metricsDB"]
-jenkins_col = db["jenkins_deployments"]
-alerts_col = db["prometheus_alerts"]  # optional for CFR enhancement
-github_col = db["github_events"]      # used by LT computation elsewhere if needed
+from db import get_collection, JENKINS_DEPLOYMENTS
+import events
+from processor.forecast_cache import forecast_cache, cache_key, model_key, series_fingerprint
+from processor.ets_forecast import fit_ets
+from processor.forecast_jobs import ENGINES
 
 # --- helpers ---
-def _parse_iso(ts: str):
-    if not ts:
-        return None
-    try:
-        if ts.endswith("Z"):
-            return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S")
-    except Exception:
-        return None
-
-def _to_iso_utc(dt_str: str) -> str:
-    # input: "YYYY-MM-DD HH:MM:SS" (UTC naive); output ISO "YYYY-MM-DDTHH:MM:SSZ"
-    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%dT%H:%M:%SZ")
+def _to_utc_datetime(dt_str: str) -> datetime:
+    # input: "YYYY-MM-DD HH:MM:SS" (UTC naive); output naive UTC datetime, as stored in Mongo
+    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
 
 def _empty_df():
     return pd.DataFrame(columns=["ds", "y"])
@@ -56,7 +43,7 @@ def _preprocess_data_for_forecasting(df: pd.DataFrame) -> pd.DataFrame:
     df['y'] = df['y'].clip(lower=0)
     
     # Fill any remaining NaN values with forward fill then backward fill
-    df['y'] = df['y'].fillna(method='ffill').fillna(method='bfill')
+    df['y'] = df['y'].ffill().bfill()
     
     return df
 
@@ -67,6 +54,10 @@ def _fit_prophet(df: pd.DataFrame, periods: int, freq: str = "D") -> Tuple[pd.Da
     """
     if df.empty:
         return df, pd.DataFrame(columns=["ds", "yhat", "yhat_lower", "yhat_upper"])
+    return df, _prophet_forecast(_prophet_model(df), periods, freq)
+
+def _prophet_model(df: pd.DataFrame):
+    """Prophet fitted on a non-empty (ds, y) frame."""
 
     # Adapt seasonalities to the span of available data to reduce overfitting
     try:
@@ -95,7 +86,10 @@ def _fit_prophet(df: pd.DataFrame, periods: int, freq: str = "D") -> Tuple[pd.Da
 
     # Fit the model
     m.fit(df)
+    return m
 
+def _prophet_forecast(m, periods: int, freq: str = "D") -> pd.DataFrame:
+    """History plus future periods predicted by a fitted model: ds, yhat, yhat_lower, yhat_upper."""
     # Create future dataframe
     future = m.make_future_dataframe(periods=periods, freq=freq, include_history=True)
 
@@ -107,10 +101,7 @@ def _fit_prophet(df: pd.DataFrame, periods: int, freq: str = "D") -> Tuple[pd.Da
         if col in fcst.columns:
             fcst[col] = fcst[col].clip(lower=0.0)
 
-    return (
-        df,
-        fcst[["ds", "yhat", "yhat_lower", "yhat_upper"]],
-    )
+    return fcst[["ds", "yhat", "yhat_lower", "yhat_upper"]]
 
 def _series_to_json(hist: pd.DataFrame, fcst: pd.DataFrame) -> Dict[str, List[Dict]]:
     history = [{"ds": r["ds"].strftime("%Y-%m-%d"), "y": float(r["y"])} for _, r in hist.iterrows()]
@@ -127,19 +118,22 @@ def _series_to_json(hist: pd.DataFrame, fcst: pd.DataFrame) -> Dict[str, List[Di
 
 # --- 1) Deployment Frequency time series (daily count of SUCCESS prod-deploy) ---
 def deployment_frequency_series(start_time: str, end_time: str) -> pd.DataFrame:
-    start_iso = _to_iso_utc(start_time)
-    end_iso = _to_iso_utc(end_time)
+    start_dt = _to_utc_datetime(start_time)
+    end_dt = _to_utc_datetime(end_time)
 
-    cur = jenkins_col.find(
+    cur = get_collection(JENKINS_DEPLOYMENTS).find(
         {
             "job_name": "prod-deploy",
             "status": "SUCCESS",
-            "timestamp": {"$gte": start_iso, "$lte": end_iso},
+            "timestamp": {"$gte": start_dt, "$lte": end_dt},
         },
         {"timestamp": 1, "_id": 0},
     )
 
-    dates = [_parse_iso(d["timestamp"]) for d in cur if _parse_iso(d.get("timestamp"))]
+    dates = [d.time for d in events.deployments(cur)]
+    return deployment_frequency_from_dates(dates)
+
+def deployment_frequency_from_dates(dates: List[datetime]) -> pd.DataFrame:
     if not dates:
         return _empty_df()
 
@@ -166,7 +160,7 @@ def lead_time_series(start_time: str, end_time: str) -> pd.DataFrame:
     # Fill any missing days between min and max with NaN, then forward/back fill or 0
     full_idx = pd.date_range(df["ds"].min(), df["ds"].max(), freq="D")
     df = df.set_index("ds").reindex(full_idx).rename_axis("ds").reset_index()
-    df["y"] = df["y"].astype(float).fillna(method="ffill").fillna(method="bfill").fillna(0.0)
+    df["y"] = df["y"].astype(float).ffill().bfill().fillna(0.0)
     return df
 
 # --- 3) MTTR time series (daily average minutes) ---
@@ -182,7 +176,7 @@ def mttr_series(start_time: str, end_time: str) -> pd.DataFrame:
     ).sort_values("ds")
     full_idx = pd.date_range(df["ds"].min(), df["ds"].max(), freq="D")
     df = df.set_index("ds").reindex(full_idx).rename_axis("ds").reset_index()
-    df["y"] = df["y"].astype(float).fillna(method="ffill").fillna(method="bfill").fillna(0.0)
+    df["y"] = df["y"].astype(float).ffill().bfill().fillna(0.0)
     return df
 
 # --- 4) CFR time series (daily % failed changes) ---
@@ -192,18 +186,22 @@ def cfr_series(start_time: str, end_time: str) -> pd.DataFrame:
     Uses Jenkins logs (prod-deploy). If you want to incorporate Prometheus 'critical' alerts,
     you can enhance this by marking commits with alerts as failures.
     """
-    start_iso = _to_iso_utc(start_time)
-    end_iso = _to_iso_utc(end_time)
+    start_dt = _to_utc_datetime(start_time)
+    end_dt = _to_utc_datetime(end_time)
 
-    cur = jenkins_col.find(
+    cur = get_collection(JENKINS_DEPLOYMENTS).find(
         {
             "job_name": "prod-deploy",
-            "timestamp": {"$gte": start_iso, "$lte": end_iso},
+            "timestamp": {"$gte": start_dt, "$lte": end_dt},
         },
         {"timestamp": 1, "status": 1, "_id": 0},
     )
 
-    rows = [(_parse_iso(d["timestamp"]), d.get("status", "")) for d in cur if _parse_iso(d.get("timestamp"))]
+    rows = [(d.time, d.status or "") for d in events.deployments(cur)]
+    return cfr_from_rows(rows)
+
+def cfr_from_rows(rows: List[Tuple[datetime, str]]) -> pd.DataFrame:
+    """rows: (timestamp, status) of prod-deploy builds."""
     if not rows:
         return _empty_df()
 
@@ -235,8 +233,34 @@ def build_series(metric: str, start_time: str, end_time: str) -> pd.DataFrame:
         return cfr_series(start_time, end_time)
     raise ValueError("Unknown metric. Use one of: deployment_frequency, lead_time, mttr, cfr")
 
-def forecast_metric(metric: str, start_time: str, end_time: str, periods: int = 30) -> Dict[str, List[Dict]]:
+def _fit_prophet_cached(key: str, fitted_key: str, df: pd.DataFrame, periods: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    _fit_prophet on a non-empty frame, reusing the cached forecast for the
+    same data and periods, or else the cached model fitted on the same
+    data (another horizon only needs a predict, not a fit).
+    """
+    fcst = forecast_cache.get(key)
+    if fcst is not None:
+        return df, fcst
+    model = forecast_cache.get_model(fitted_key)
+    if model is None:
+        model = _prophet_model(df)
+        forecast_cache.put_model(fitted_key, model)
+    fcst = _prophet_forecast(model, periods, freq="D")
+    forecast_cache.put(key, fcst)
+    return df, fcst
+
+def forecast_metric(metric: str, start_time: str, end_time: str, periods: int = 30, engine: str = "prophet") -> Dict[str, List[Dict]]:
+    """
+    engine: "prophet" (default) or "ets", a NumPy Holt-Winters model that
+    fits in milliseconds; both return the same history/forecast JSON.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine. Use one of: {', '.join(ENGINES)}")
     series = build_series(metric, start_time, end_time)
+    fingerprint = series_fingerprint(series)
+    key = cache_key(metric, start_time, end_time, periods, fingerprint, engine)
+    fitted_key = model_key(metric, start_time, end_time, fingerprint, engine)
     
     # Preprocess data for better forecasting
     series = _preprocess_data_for_forecasting(series)
@@ -244,9 +268,12 @@ def forecast_metric(metric: str, start_time: str, end_time: str, periods: int =
     # Forecast logic with graceful degradation for small datasets
     n = len(series)
 
-    # If we have at least 3 points, attempt Prophet; otherwise, fall back to naive
+    # If we have at least 3 points, attempt Prophet/ETS; otherwise, fall back to naive
     if n >= 3:
-        hist, fcst = _fit_prophet(series, periods=periods, freq="D")
+        if engine == "ets":
+            hist, fcst = fit_ets(series, periods)
+        else:
+            hist, fcst = _fit_prophet_cached(key, fitted_key, series, periods)
         return _series_to_json(hist, fcst)
     else:
         # Naive forecast: extend the last observed value
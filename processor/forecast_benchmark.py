@@ -0,0 +1,106 @@
+# processor/forecast_benchmark.py
+"""
+Latency and hold-out accuracy of the forecast engines (Prophet vs ETS).
+
+Each series is split into a training part and the last --holdout days;
+every engine is fitted on the training part and scored on the hold-out
+(MAE, RMSE, share of actuals inside the 95% band).
+
+    # straight from the sample JSON (deployment_frequency and cfr only)
+    python -m processor.forecast_benchmark --sample-dir tests/sample_raw_data
+
+    # from Mongo, all four metrics
+    python -m processor.forecast_benchmark --start "2024-10-01 00:00:00" --end "2025-08-01 00:00:00"
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from processor.forecast import (
+    build_series,
+    cfr_from_rows,
+    deployment_frequency_from_dates,
+    _fit_prophet,
+    _preprocess_data_for_forecasting,
+    _to_utc_datetime,
+)
+from processor.ets_forecast import fit_ets
+import events
+
+ENGINES = {
+    "prophet": lambda df, periods: _fit_prophet(df, periods=periods, freq="D"),
+    "ets": fit_ets,
+}
+
+
+def sample_series(sample_dir: str, start_dt=None, end_dt=None):
+    """Daily deployment_frequency and cfr series built from jenkins_deployments.json."""
+    with open(os.path.join(sample_dir, "jenkins_deployments.json")) as f:
+        builds = json.load(f)
+    rows = []
+    for b in events.deployments(builds):
+        if b.job_name != "prod-deploy":
+            continue
+        if (start_dt and b.time < start_dt) or (end_dt and b.time > end_dt):
+            continue
+        rows.append((b.time, b.status or ""))
+    return {
+        "deployment_frequency": deployment_frequency_from_dates([ts for ts, status in rows if status == "SUCCESS"]),
+        "cfr": cfr_from_rows(rows),
+    }
+
+def evaluate(df, holdout: int, repeat: int):
+    """{engine: {fit_ms, mae, rmse, coverage}} for one series."""
+    train, test = df.iloc[:-holdout].reset_index(drop=True), df.iloc[-holdout:]
+    actual = test["y"].to_numpy(dtype=float)
+    results = {}
+    for name, fit in ENGINES.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _, fcst = fit(train.copy(), holdout)
+            timings.append((time.perf_counter() - started) * 1000)
+        future = fcst.iloc[-holdout:]
+        err = future["yhat"].to_numpy() - actual
+        inside = (actual >= future["yhat_lower"].to_numpy()) & (actual <= future["yhat_upper"].to_numpy())
+        results[name] = {
+            "fit_ms": round(float(np.median(timings)), 1),
+            "mae": round(float(np.abs(err).mean()), 3),
+            "rmse": round(float(np.sqrt((err ** 2).mean())), 3),
+            "coverage": round(float(inside.mean()), 3),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare forecast engines on latency and hold-out accuracy")
+    parser.add_argument("--sample-dir", help="read tests/sample_raw_data-style JSON instead of Mongo")
+    parser.add_argument("--start", help="UTC: YYYY-MM-DD HH:MM:SS (required without --sample-dir)")
+    parser.add_argument("--end", help="UTC: YYYY-MM-DD HH:MM:SS (required without --sample-dir)")
+    parser.add_argument("--holdout", type=int, default=14, help="days held out for scoring (default 14)")
+    parser.add_argument("--repeat", type=int, default=3, help="fits per engine; median time is reported")
+    args = parser.parse_args()
+
+    start_dt = _to_utc_datetime(args.start) if args.start else None
+    end_dt = _to_utc_datetime(args.end) if args.end else None
+    if args.sample_dir:
+        series = sample_series(args.sample_dir, start_dt, end_dt)
+    else:
+        if not (args.start and args.end):
+            parser.error("--start and --end are required when reading from Mongo")
+        series = {
+            metric: build_series(metric, args.start, args.end)
+            for metric in ["deployment_frequency", "lead_time", "mttr", "cfr"]
+        }
+
+    print(f"{'metric':<22}{'engine':<9}{'fit_ms':>9}{'mae':>9}{'rmse':>9}{'coverage':>10}")
+    for metric, df in series.items():
+        df = _preprocess_data_for_forecasting(df)
+        if len(df) < args.holdout + 14:
+            print(f"{metric:<22}skipped: only {len(df)} days of data")
+            continue
+        for engine, r in evaluate(df, args.holdout, args.repeat).items():
+            print(f"{metric:<22}{engine:<9}{r['fit_ms']:>9}{r['mae']:>9}{r['rmse']:>9}{r['coverage']:>10}")
+
+if __name__ == "__main__":
+    main()
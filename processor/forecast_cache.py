@@ -0,0 +1,187 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from config import FORECAST_CACHE_DIR, FORECAST_CACHE_MAX_ENTRIES, FORECAST_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def series_fingerprint(df) -> str:
+    """Stable digest of a (ds, y) frame; changes whenever the input data does."""
+    import pandas as pd
+
+    if df.empty:
+        return "empty"
+    values = pd.util.hash_pandas_object(df[["ds", "y"]], index=False).values
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+def cache_key(metric: str, start_time: str, end_time: str, periods: int, fingerprint: str, engine: str = "prophet") -> str:
+    """Key of a forecast frame."""
+    raw = "|".join([engine, metric.lower(), start_time, end_time, str(periods), fingerprint])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def model_key(metric: str, start_time: str, end_time: str, fingerprint: str, engine: str = "prophet") -> str:
+    """Key of the model fitted on a series: the same for every forecast horizon."""
+    raw = "|".join([engine, metric.lower(), start_time, end_time, "model", fingerprint])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ForecastCache:
+    """
+    Fitted Prophet models (model_key) and forecast frames (cache_key),
+    kept in an in-memory LRU and on local disk (Prophet's JSON model
+    serialization, the forecast frame as JSON). A forecast for a new
+    horizon on the same data reuses the model instead of fitting again.
+    Disk usage is capped at max_bytes; the least recently used files go
+    first.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # key -> fitted model or forecast frame
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key, kind):
+        return os.path.join(self.directory, f"{key}.{kind}.json")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _load(self, key, kind, parse):
+        """parse(text) of the file for key, or None; counts a disk hit or miss."""
+        path = self._path(key, kind)
+        try:
+            with open(path) as f:
+                value = parse(f.read())
+            os.utime(path)  # mark as recently used for eviction
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable forecast cache entry {key}: {e}")
+            self._delete(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(key, value)
+        with self._lock:
+            self.disk_hits += 1
+        return value
+
+    def get(self, key):
+        """Forecast frame for key, or None."""
+        import pandas as pd
+
+        fcst = self._lookup(key)
+        if fcst is None:
+            fcst = self._load(key, "forecast", lambda text: pd.read_json(io.StringIO(text), orient="split", convert_dates=["ds"]))
+        return None if fcst is None else fcst.copy()
+
+    def get_model(self, key):
+        """Fitted Prophet model for key, or None."""
+        from prophet.serialize import model_from_json
+
+        model = self._lookup(key)
+        return model if model is not None else self._load(key, "model", model_from_json)
+
+    def _persist(self, key, kind, render):
+        """Write render() to the file for key; a failure only costs the disk copy."""
+        try:
+            text = render()
+            os.makedirs(self.directory, exist_ok=True)
+            # write-then-rename so concurrent readers never see half a file
+            path = self._path(key, kind)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, path)
+            self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Failed to persist forecast cache entry {key}: {e}")
+
+    def put(self, key, fcst):
+        fcst = fcst.copy()
+        self._remember(key, fcst)
+        self._persist(key, "forecast", lambda: fcst.to_json(orient="split", date_format="iso", index=False, double_precision=15))
+
+    def put_model(self, key, model):
+        from prophet.serialize import model_to_json
+
+        self._remember(key, model)
+        self._persist(key, "model", lambda: model_to_json(model))
+
+    def _delete(self, key):
+        for path in (self._path(key, "model"), self._path(key, "forecast")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name.split(".", 1)[0]))
+
+        # Group files per key; a key's age is its most recent use
+        keys = {}
+        for mtime, size, key in entries:
+            last_used, total = keys.get(key, (0.0, 0))
+            keys[key] = (max(last_used, mtime), total + size)
+
+        used = sum(total for _, total in keys.values())
+        for key, (_, total) in sorted(keys.items(), key=lambda kv: kv[1][0]):
+            if used <= self.max_bytes:
+                break
+            self._delete(key)
+            used -= total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "directory": self.directory,
+                "max_bytes": self.max_bytes,
+            }
+
+
+forecast_cache = ForecastCache(FORECAST_CACHE_DIR, FORECAST_CACHE_MAX_ENTRIES, FORECAST_CACHE_MAX_BYTES)
@@ -0,0 +1,251 @@
+"""
+Forecast jobs run in a pool of worker processes so Prophet fits use every
+core and never hold the API's request threads:
+
+    job = submit_forecast("mttr", start, end, periods)   # returns at once
+    get_job(job.job_id).to_dict()                          # poll status/result
+
+Identical jobs (same metric, window, horizon and engine) that are still
+queued or running share one job id. Each job gets
+FORECAST_JOB_TIMEOUT_SECONDS of wall time inside its worker.
+
+The forecasting stack (prophet, cmdstanpy, pandas) is only imported in
+the workers, by the pool's initializer as each one starts, so no job
+pays for it; prewarm() starts every worker up front. The API process
+never loads it.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import (
+    FORECAST_WORKERS,
+    FORECAST_JOB_TIMEOUT_SECONDS,
+    FORECAST_JOB_RETENTION_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED, TIMEOUT = "queued", "running", "done", "failed", "timeout"
+
+# what processor.forecast accepts, kept here so the API can check requests
+# without importing the forecasting stack
+METRICS = ("deployment_frequency", "lead_time", "mttr", "cfr")
+ENGINES = ("prophet", "ets")
+
+# normalise metric aliases so "df" and "deployment_frequency" de-duplicate
+_METRIC_ALIASES = {
+    "deployment-frequency": "deployment_frequency",
+    "df": "deployment_frequency",
+    "lead-time": "lead_time",
+    "lt": "lead_time",
+}
+
+
+class ForecastTimeout(Exception):
+    pass
+
+
+# --- worker side ---
+def _on_alarm(signum, frame):
+    raise ForecastTimeout()
+
+def _run_forecast(metric: str, start_time: str, end_time: str, periods: int, engine: str, timeout: int):
+    """Runs in a worker process; SIGALRM bounds the wall time of one job."""
+    from processor.forecast import forecast_metric
+
+    use_alarm = timeout and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(int(timeout))
+    try:
+        return forecast_metric(metric, start_time, end_time, periods, engine)
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+
+_load_seconds = None  # worker side: time the initializer spent importing
+
+
+def _load_forecast_stack():
+    """Pool initializer: runs once in every worker process before its first task."""
+    global _load_seconds
+    started = time.perf_counter()
+    import processor.forecast  # noqa: F401  (prophet, cmdstanpy, pandas)
+    _load_seconds = round(time.perf_counter() - started, 3)
+
+def _warm_worker():
+    return os.getpid(), _load_seconds
+
+
+# --- API side ---
+class ForecastJob:
+    def __init__(self, key, metric, start_time, end_time, periods, engine):
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        self.metric = metric
+        self.start_time = start_time
+        self.end_time = end_time
+        self.periods = periods
+        self.engine = engine
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def status(self):
+        f = self.future
+        if f is None or not f.done():
+            return RUNNING if f is not None and f.running() else QUEUED
+        exc = f.exception()
+        if exc is None:
+            return DONE
+        return TIMEOUT if isinstance(exc, ForecastTimeout) else FAILED
+
+    def to_dict(self):
+        status = self.status
+        out = {
+            "job_id": self.job_id,
+            "metric": self.metric,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "periods": self.periods,
+            "engine": self.engine,
+            "status": status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+        if status == DONE:
+            out["result"] = self.future.result()
+        elif status == TIMEOUT:
+            out["error"] = f"Forecast exceeded {FORECAST_JOB_TIMEOUT_SECONDS}s"
+        elif status == FAILED:
+            out["error"] = str(self.future.exception())
+        return out
+
+
+_pool = None
+_lock = threading.Lock()
+_jobs = {}       # job_id -> ForecastJob
+_in_flight = {}  # dedup key -> ForecastJob (queued or running)
+_warm_seconds = {}  # worker pid -> seconds its initializer spent loading the forecasting stack
+
+
+def _worker_count():
+    return FORECAST_WORKERS or os.cpu_count() or 1
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: workers must not inherit the parent's MongoClient sockets
+        _pool = ProcessPoolExecutor(
+            max_workers=_worker_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_forecast_stack,
+        )
+    return _pool
+
+def _job_key(metric, start_time, end_time, periods, engine):
+    m = metric.lower()
+    return (_METRIC_ALIASES.get(m, m), start_time, end_time, periods, engine)
+
+def _on_done(job, future):
+    job.finished_at = time.time()
+    with _lock:
+        if _in_flight.get(job.key) is job:
+            del _in_flight[job.key]
+    exc = future.exception()
+    if isinstance(exc, ForecastTimeout):
+        logger.warning(f"Forecast job {job.job_id} ({job.metric}) timed out")
+    elif exc is not None:
+        logger.warning(f"Forecast job {job.job_id} ({job.metric}) failed: {exc}")
+
+def _prune(now):
+    """Forget finished jobs older than the retention period (caller holds _lock)."""
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.finished_at is not None and now - job.finished_at > FORECAST_JOB_RETENTION_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+def submit_forecast(metric: str, start_time: str, end_time: str, periods: int = 30, engine: str = "prophet"):
+    """
+    Queue a forecast and return (job, deduplicated). An identical job that is
+    still queued or running is returned instead of starting a new one.
+    Raises ValueError for an unknown metric or engine, before queueing.
+    """
+    global _pool
+    key = _job_key(metric, start_time, end_time, periods, engine)
+    if key[0] not in METRICS:
+        raise ValueError(f"Unknown metric. Use one of: {', '.join(METRICS)}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine. Use one of: {', '.join(ENGINES)}")
+    with _lock:
+        _prune(time.time())
+        existing = _in_flight.get(key)
+        if existing is not None:
+            return existing, True
+
+        job = ForecastJob(key, metric, start_time, end_time, periods, engine)
+        args = (_run_forecast, metric, start_time, end_time, periods, engine, FORECAST_JOB_TIMEOUT_SECONDS)
+        try:
+            job.future = _get_pool().submit(*args)
+        except BrokenProcessPool:
+            # a worker died (e.g. OOM-killed); start a fresh pool once
+            logger.warning("Forecast worker pool was broken; restarting it")
+            _pool = None
+            job.future = _get_pool().submit(*args)
+        _jobs[job.job_id] = job
+        _in_flight[key] = job
+    job.future.add_done_callback(lambda f: _on_done(job, f))
+    return job, False
+
+def _record_warm(future):
+    try:
+        pid, seconds = future.result()
+    except Exception as e:
+        logger.warning(f"Forecast worker pre-warm failed: {e}")
+        return
+    with _lock:
+        _warm_seconds[pid] = seconds
+
+def prewarm():
+    """
+    Start the worker processes so the first forecasts do not wait for a
+    worker to spawn and import the forecasting stack. Returns immediately.
+    The pool starts a process for each task submitted while none is idle;
+    a worker that takes several of these tasks was still warmed by the
+    initializer, and any worker started later is warmed the same way.
+    """
+    with _lock:
+        pool = _get_pool()
+    for _ in range(_worker_count()):
+        pool.submit(_warm_worker).add_done_callback(_record_warm)
+
+def stats():
+    with _lock:
+        return {
+            "workers": _worker_count(),
+            "pool_started": _pool is not None,
+            "jobs": len(_jobs),
+            "in_flight": len(_in_flight),
+            "prewarmed_workers": dict(_warm_seconds),
+        }
+
+def get_job(job_id: str):
+    with _lock:
+        return _jobs.get(job_id)
+
+def shutdown(wait: bool = False):
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,100 @@
+# processor/groups.py
+"""
+The group_by= query parameter: one result per job, service, PR target
+branch or repository, all computed from the same read of the window
+instead of one request per group.
+
+A deployment belongs to the group of its job_name or service, or of the
+target_branch / repo of the PR its commit came from (commit index row).
+Lead-time rows are grouped by their first prod deployment: job_name is
+always prod-deploy, service is first_deploy_service. MTTR groups a
+recovery by its failed deployment and CFR a change by the deployments
+that shipped it; alerts are matched exactly as without group_by.
+Records without a value land in the "unknown" group.
+
+Grouped responses are {"group_by": <dimension>, "groups": {group: result}}
+with each result shaped like the ungrouped response.
+"""
+from collections import defaultdict
+import numpy as np
+from db import COMMIT_INDEX
+
+PROD_JOB = "prod-deploy"
+UNKNOWN = "unknown"
+
+# dimension -> field of a jenkins_deployments document (None: from the commit index row)
+GROUP_BY = {
+    "job_name": "job_name",
+    "service": "service",
+    "target_branch": None,
+    "repo": None,
+}
+
+# dimension -> value of a commit index row (lead time)
+_LEAD_TIME_GROUP = {
+    "job_name": {"$literal": PROD_JOB},
+    "service": "$first_deploy_service",
+    "target_branch": "$target_branch",
+    "repo": "$repo",
+}
+
+
+def label(value):
+    return UNKNOWN if value is None else str(value)
+
+def grouped(group_by, groups):
+    return {"group_by": group_by, "groups": groups}
+
+def deployment_pipeline(query, projection, group_by):
+    """Aggregation over jenkins_deployments: query, projection, plus a "group" field."""
+    stages = [
+        {"$match": query},
+        {"$project": {**projection, "job_name": 1, "service": 1, "commit_sha": 1}},
+    ]
+    return stages + deployment_group_stages(group_by)
+
+def deployment_group_stages(group_by):
+    """Stages that set "group" on deployment documents."""
+    field = GROUP_BY[group_by]
+    if field:
+        return [{"$addFields": {"group": f"${field}"}}]
+    return [
+        {"$lookup": {"from": COMMIT_INDEX, "localField": "commit_sha", "foreignField": "sha", "as": "commit"}},
+        {"$addFields": {"group": {"$arrayElemAt": [f"$commit.{group_by}", 0]}}},
+        {"$project": {"commit": 0}},
+    ]
+
+def lead_time_group(group_by):
+    """$project expression of a commit index row's group."""
+    return _LEAD_TIME_GROUP[group_by]
+
+def partition(items, key):
+    """{group label: [items]} in label order; key(item) is the raw group value."""
+    groups = defaultdict(list)
+    for item in items:
+        groups[label(key(item))].append(item)
+    return dict(sorted(groups.items()))
+
+def split_codes(codes, values):
+    """
+    {group label: positions} for an array of categorical codes, in label
+    order; values[code] is the raw value. One stable argsort for all groups.
+    """
+    codes = np.asarray(codes)
+    order = np.argsort(codes, kind="stable")
+    distinct, starts = np.unique(codes[order], return_index=True)
+    parts = defaultdict(list)
+    for code, positions in zip(distinct.tolist(), np.split(order, starts[1:])):
+        parts[label(values[code])].append(positions)
+    return {name: np.sort(np.concatenate(p)) for name, p in sorted(parts.items())}
+
+def merge_metrics(per_metric, empty):
+    """
+    {group: {metric: result}} from {metric: {group: result}}; a group
+    missing from one metric gets empty[metric].
+    """
+    names = sorted(set().union(*per_metric.values()))
+    return {
+        name: {metric: results.get(name, empty[metric]) for metric, results in per_metric.items()}
+        for name in names
+    }
@@ -1,38 +1,44 @@
 from datetime import datetime
-from pymongo import MongoClient
-from collections import defaultdict
+from zoneinfo import ZoneInfo
+from db import get_collection, get_async_collection, COMMIT_INDEX
+import events
+from processor.groups import grouped, lead_time_group, partition
+from processor.periods import GRANULARITIES, period_means, to_ms
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["metricsDB"]
-github_col = db["github_events"]
-jenkins_col = db["jenkins_deployments"]
-
-def parse_timestamp(ts):
-    # Handles both common GitHub/Jenkins ISO formats (with or without 'Z')
-    if not ts:
-        return None
-    try:
-        if ts.endswith("Z"):
-            return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-        else:
-            return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S")
-    except Exception:
-        return None
-
-def get_period_key(date_obj, granularity):
-    if granularity == "daily":
-        return date_obj.strftime("%Y-%m-%d")
-    elif granularity == "weekly":
-        return f"{date_obj.strftime('%Y')}-W{date_obj.strftime('%U')}"
-    elif granularity == "monthly":
-        return date_obj.strftime("%Y-%m")
-    else:
-        return "unknown"
+_UTC = ZoneInfo("UTC")
 
 def calculate_lead_time(start, end):
     return (end - start).total_seconds() / 3600  # in hours
 
-def get_lead_time(start_time: str, end_time: str):
+def lead_time_from_rows(rows):
+    """
+    rows: events.LeadTimeRow (commit index rows with a valid lead time).
+    Returns daily average lead time in hours, bucketed by UTC deploy day.
+    """
+    return lead_time_by_period(rows, "day", _UTC)
+
+def lead_time_by_period(rows, granularity, zone):
+    """
+    rows: events.LeadTimeRow. Average lead time in hours per day, ISO week
+    or month of the deploy time in zone (see processor/periods.py).
+    """
+    times = to_ms([row.deploy_time for row in rows])
+    hours = [row.hours for row in rows]
+    return {GRANULARITIES[granularity]: period_means(times, hours, granularity, zone)}
+
+def _lead_time_result(rows, granularity=None, zone=None):
+    if granularity:
+        return lead_time_by_period(rows, granularity, zone)
+    return lead_time_from_rows(rows)
+
+def lead_time_query(start_dt, end_dt):
+    # Commits made in the window whose first prod deployment is also in the window
+    return {
+        "commit_time": {"$gte": start_dt, "$lte": end_dt},
+        "first_deploy_time": {"$gte": start_dt, "$lte": end_dt},
+    }
+
+def get_lead_time(start_time: str, end_time: str, granularity=None, zone=None):
     # Parse user input
     try:
         start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
@@ -40,64 +46,37 @@ def get_lead_time(start_time: str, end_time: str):
     except Exception:
         return {"error": "Invalid date format. Use YYYY-MM-DD HH:MM:SS"}
 
-    # Load all potentially relevant deployments (successful only)
-    deployment_cursor = jenkins_col.find(
-        {
-            "status": "SUCCESS",
-            "timestamp": {
-                "$gte": start_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "$lte": end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            }
-        },
-        {"commit_sha": 1, "timestamp": 1, "_id": 0}
+    # One indexed range query over the pre-joined commit -> deployment rows
+    # maintained at ingest (collector/commit_index.py)
+    rows = get_collection(COMMIT_INDEX).find(
+        lead_time_query(start_dt, end_dt),
+        {"commit_time": 1, "first_deploy_time": 1, "_id": 0}
     )
-    valid_deployments = {
-        doc["commit_sha"]: doc
-        for doc in deployment_cursor if doc.get("commit_sha") and doc.get("timestamp")
-    }
-
-    # Load GitHub commit docs whose any commit's timestamp in window
-    # (filtering at application level)
-    github_docs = github_col.find({}, {"commits": 1, "_id": 0})
-
-    daily_data = defaultdict(list)
-    weekly_data = defaultdict(list)
-    monthly_data = defaultdict(list)
-
-    for pr_doc in github_docs:
-        for commit in pr_doc.get("commits", []):
-            sha = commit.get("sha")
-            commit_time = parse_timestamp(commit.get("timestamp"))
-
-            if not sha or not commit_time:
-                continue
-            if not (start_dt <= commit_time <= end_dt):
-                continue
+    return _lead_time_result(events.lead_time_rows(rows), granularity, zone)
 
-            deploy_info = valid_deployments.get(sha)
-            if not deploy_info:
-                continue
-
-            deploy_time = parse_timestamp(deploy_info["timestamp"])
-            if not deploy_time or deploy_time < commit_time:
-                continue
-
-            lt_hours = calculate_lead_time(commit_time, deploy_time)
-            for granularity, target in (
-                ("daily", daily_data),
-                ("weekly", weekly_data),
-                ("monthly", monthly_data),
-            ):
-                key = get_period_key(deploy_time, granularity)
-                target[key].append(lt_hours)
-
-    # Average calculation
-    def avg(data_dict):
-        return {k: round(sum(v) / len(v), 2) for k, v in data_dict.items() if v}
-
-    out = {
-        "daily": avg(daily_data),
-    }
-    return out
+async def get_lead_time_async(start_time: str, end_time: str, granularity=None, zone=None, group_by=None):
+    """
+    get_lead_time on the async client (for async def endpoints).
+    group_by: one result per group of the rows (see processor/groups.py).
+    """
+    try:
+        start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
+        end_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return {"error": "Invalid date format. Use YYYY-MM-DD HH:MM:SS"}
 
-    
\ No newline at end of file
+    if group_by:
+        cursor = await get_async_collection(COMMIT_INDEX).aggregate([
+            {"$match": lead_time_query(start_dt, end_dt)},
+            {"$project": {"_id": 0, "commit_time": 1, "first_deploy_time": 1, "group": lead_time_group(group_by)}},
+        ])
+        groups = partition(events.lead_time_rows(await cursor.to_list()), lambda row: row.group)
+        return grouped(group_by, {
+            name: _lead_time_result(rows, granularity, zone) for name, rows in groups.items()
+        })
+
+    rows = await get_async_collection(COMMIT_INDEX).find(
+        lead_time_query(start_dt, end_dt),
+        {"commit_time": 1, "first_deploy_time": 1, "_id": 0}
+    ).to_list()
+    return _lead_time_result(events.lead_time_rows(rows), granularity, zone)
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pymongo import CursorType
+from config import (
+    METRIC_CACHE_MAX_ENTRIES,
+    METRIC_CACHE_TTL_SECONDS,
+    METRIC_CACHE_INVALIDATION_POLL_SECONDS,
+)
+from db import get_collection, CACHE_INVALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+
+class MetricCache:
+    """
+    Bounded LRU + TTL cache for metric results, keyed on
+    (metric, window start, window end, extra params).
+    Entries remember their window so ingest can drop only the windows
+    that contain a new event.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, start, end, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        # bumped on every invalidation; lets a slow compute that raced an
+        # ingest skip storing a result that may already be stale
+        self.generation = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def set(self, key, start, end, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, start, end, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_range(self, start, end=None):
+        """Drop every entry whose window overlaps [start, end] (end=None: open-ended)."""
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key for key, (_, w_start, w_end, _) in self._entries.items()
+                if w_end >= start and (end is None or w_start <= end)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidated += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+            }
+
+
+metric_cache = MetricCache(METRIC_CACHE_MAX_ENTRIES, METRIC_CACHE_TTL_SECONDS)
+
+# --- cross-process invalidation ---
+# The collector (app.py) and query API (api.py) usually run as separate
+# processes, so ingest also appends the touched range to a small capped
+# collection that every API process tails. The tailable cursor reads the
+# markers in insertion ($natural) order; ObjectIds from several collector
+# processes are not monotonic, so they cannot be the position.
+_sync_lock = threading.Lock()
+_last_sync = 0.0
+_cursor = None
+_skip_existing = True  # the first cursor only moves past the markers already there
+
+
+def _apply_invalidation(doc):
+    metric_cache.invalidate_range(doc["start"], doc.get("end"))
+
+def _sync_due(now):
+    return now - _last_sync >= METRIC_CACHE_INVALIDATION_POLL_SECONDS
+
+def sync_invalidations(force: bool = False):
+    """Apply invalidations published by other processes (at most once per poll interval)."""
+    global _last_sync, _cursor, _skip_existing
+    now = time.monotonic()
+    if not force and not _sync_due(now):
+        return
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sync = now
+        if _cursor is None or not _cursor.alive:
+            # A cursor on an empty collection dies at once, and the server
+            # may reap an idle one: reading the whole (small) collection
+            # again only drops a few extra entries.
+            skip, _skip_existing = _skip_existing, False
+            _cursor = get_collection(CACHE_INVALIDATIONS).find({}, cursor_type=CursorType.TAILABLE)
+        else:
+            skip = False
+        for doc in _cursor:
+            if not skip:
+                _apply_invalidation(doc)
+    except Exception as e:
+        # e.g. the capped collection wrapped past the cursor: markers may
+        # have been missed, so nothing cached can be trusted
+        logger.warning(f"Metric cache invalidation sync failed, clearing the cache: {e}")
+        metric_cache.clear()
+        _cursor = None
+    finally:
+        _sync_lock.release()
+
+def notify_ingest(start, end=None):
+    """
+    Called by the webhook handlers after a write: invalidates windows that
+    overlap [start, end] here and publishes the range for other processes.
+    start/end: naive UTC datetimes; end=None means 'from start onwards'.
+    """
+    if start is None:
+        return
+    metric_cache.invalidate_range(start, end)
+    try:
+        get_collection(CACHE_INVALIDATIONS).insert_one({"start": start, "end": end})
+    except Exception as e:
+        logger.warning(f"Failed to publish metric cache invalidation: {e}")
+
+def notify_ingest_times(*timestamps):
+    """
+    notify_ingest for a batch of event timestamps (None values are skipped):
+    one published range from the earliest to the latest.
+    """
+    timestamps = [t for t in timestamps if t is not None]
+    if timestamps:
+        notify_ingest(min(timestamps), max(timestamps))
+
+# --- read-through helper ---
+def _parse_window(start_time: str, end_time: str):
+    try:
+        return (
+            datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S"),
+            datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S"),
+        )
+    except (TypeError, ValueError):
+        return None
+
+def cached(metric: str, start_time: str, end_time: str, compute, **params):
+    """
+    Return compute() for the window, served from the cache when possible.
+    Results carrying an "error" key and unparseable windows are never cached.
+    """
+    window = _parse_window(start_time, end_time)
+    if window is None:
+        return compute()
+
+    sync_invalidations()
+    key = (metric, window[0], window[1], tuple(sorted(params.items())))
+    result = metric_cache.get(key)
+    if result is not None:
+        return result
+
+    generation = metric_cache.generation
+    result = compute()
+    _store(key, window, result, generation)
+    return result
+
+async def cached_async(metric: str, start_time: str, end_time: str, compute, **params):
+    """cached() for async def endpoints; compute is a coroutine function."""
+    window = _parse_window(start_time, end_time)
+    if window is None:
+        return await compute()
+
+    # the invalidation poll uses the sync client; keep it off the event loop
+    if _sync_due(time.monotonic()):
+        await asyncio.to_thread(sync_invalidations)
+    key = (metric, window[0], window[1], tuple(sorted(params.items())))
+    result = metric_cache.get(key)
+    if result is not None:
+        return result
+
+    generation = metric_cache.generation
+    result = await compute()
+    _store(key, window, result, generation)
+    return result
+
+def _store(key, window, result, generation):
+    if not (isinstance(result, dict) and "error" in result):
+        metric_cache.set(key, window[0], window[1], result, generation)
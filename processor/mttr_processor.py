@@ -1,12 +1,11 @@
-from pymongo import MongoClient
+import asyncio
+from bisect import bisect_left
 from datetime import datetime
+from db import get_collection, get_async_collection, JENKINS_DEPLOYMENTS, PROMETHEUS_ALERTS
 from collections import defaultdict
-
-def parse_time(ts):
-    try:
-        return datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-    except Exception:
-        return None
+import events
+from processor.groups import deployment_pipeline, grouped, partition
+from processor.periods import GRANULARITIES, period_means, to_ms
 
 def get_period_key(dt, granularity):
     if granularity == "daily":
@@ -16,67 +15,157 @@ def get_period_key(dt, granularity):
     elif granularity == "monthly":
         return dt.strftime("%Y-%m")
 
-def calculate_mttr_from_db(start_time_str, end_time_str):
-    # Convert input strings to datetime
-    try:
-        start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M:%S")
-        end_time = datetime.strptime(end_time_str, "%Y-%m-%d %H:%M:%S")
-    except ValueError:
-        return {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
-
-    # Connect to MongoDB
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["metricsDB"]
-    deployments = db["jenkins_deployments"]
-    alerts = db["prometheus_alerts"]
-
-    # Filter data in date range
-    failed_deploys = list(deployments.find({
-        "status": "FAILURE",
-        "timestamp": {
-            "$gte": start_time.isoformat() + "Z",
-            "$lte": end_time.isoformat() + "Z"
-        }
-    }))
-
-    relevant_alerts = list(alerts.find({
-        "severity": {"$in": ["critical", "high"]},
-        "startsAt": {
-            "$gte": start_time.isoformat() + "Z",
-            "$lte": end_time.isoformat() + "Z"
-        }
-    }))
-
-    sorted_alerts = sorted(relevant_alerts, key=lambda x: parse_time(x["startsAt"]))
-    daily, weekly, monthly = defaultdict(list), defaultdict(list), defaultdict(list)
+SCOPES = {
+    # scope -> (field on the deployment doc, label on the alert)
+    "commit": ("commit_sha", "commit"),
+    "service": ("service", "service"),
+}
+
+def _avg(bucket):
+    return {k: round(sum(v) / len(v), 2) for k, v in bucket.items()}
+
+def match_recoveries(failed_deploys, alerts, scope=None):
+    """
+    Match every failed deployment to the first alert that starts at or
+    after it and yield (deploy, deploy_time, minutes until the alert's endsAt).
+
+    failed_deploys / alerts: events.Deployment / events.Alert, so no
+    timestamp is parsed here. Alerts are sorted by start and the match is
+    a binary search on epoch seconds: O((deploys + alerts) log alerts).
+    scope: None matches against all alerts; "commit" / "service" only
+    against alerts carrying the deployment's commit_sha / service label.
+    """
+    if scope is not None and scope not in SCOPES:
+        raise ValueError(f"Unknown scope. Use one of: {', '.join(SCOPES)}")
+
+    # scope key -> ([start_ts], [end_ts]) sorted by start
+    deploy_field, alert_label = SCOPES[scope] if scope else (None, None)
+    timelines = defaultdict(lambda: ([], []))
+    for a in sorted(alerts, key=lambda a: a.start_ts):
+        starts, ends = timelines[a.labels.get(alert_label) if scope else None]
+        starts.append(a.start_ts)
+        ends.append(a.end_ts)
 
     for deploy in failed_deploys:
-        deploy_time = parse_time(deploy.get("timestamp"))
-        if not deploy_time:
+        key = getattr(deploy, deploy_field) if scope else None
+        if key not in timelines:
             continue
+        starts, ends = timelines[key]
 
-        # Find alert that occurred after deployment
-        matching_alert = next((
-            a for a in sorted_alerts
-            if parse_time(a["startsAt"]) and parse_time(a["startsAt"]) >= deploy_time
-        ), None)
-
-        if not matching_alert:
+        # First alert that occurred at or after the deployment
+        i = bisect_left(starts, deploy.ts)
+        if i == len(starts):
             continue
 
-        recovery_time = parse_time(matching_alert.get("endsAt"))
-        if not recovery_time or recovery_time < deploy_time:
+        recovery_ts = ends[i]
+        if recovery_ts is None or recovery_ts < deploy.ts:
             continue
 
-        mttr_minutes = (recovery_time - deploy_time).total_seconds() / 60.0
+        yield deploy, deploy.time, (recovery_ts - deploy.ts) / 60.0
+
+def compute_mttr(failed_deploys, alerts, scope=None, granularity=None, zone=None):
+    """
+    Average MTTR in minutes per day/week/month of the failed deployment.
+    failed_deploys / alerts: events.Deployment / events.Alert.
+    granularity/zone: only the given period ("day", "week" for ISO weeks
+    or "month") of the deploy time in that time zone.
+    """
+    return mttr_from_recoveries(match_recoveries(failed_deploys, alerts, scope), granularity, zone)
+
+def compute_mttr_by_group(failed_deploys, alerts, scope=None, granularity=None, zone=None):
+    """
+    compute_mttr per deploy.group (set by a grouped query, see
+    processor/groups.py). Alerts are sorted and matched once for all groups.
+    """
+    groups = partition(match_recoveries(failed_deploys, alerts, scope), lambda r: r[0].group)
+    return {name: mttr_from_recoveries(recoveries, granularity, zone) for name, recoveries in groups.items()}
 
-        for granularity, bucket in [("daily", daily), ("weekly", weekly), ("monthly", monthly)]:
-            key = get_period_key(deploy_time, granularity)
+def mttr_from_recoveries(recoveries, granularity=None, zone=None):
+    """Period averages of match_recoveries output."""
+    if granularity:
+        recoveries = list(recoveries)
+        times = to_ms([deploy_time for _, deploy_time, _ in recoveries])
+        minutes = [mttr_minutes for _, _, mttr_minutes in recoveries]
+        return {GRANULARITIES[granularity]: period_means(times, minutes, granularity, zone)}
+
+    daily, weekly, monthly = defaultdict(list), defaultdict(list), defaultdict(list)
+
+    for _, deploy_time, mttr_minutes in recoveries:
+        for period, bucket in [("daily", daily), ("weekly", weekly), ("monthly", monthly)]:
+            key = get_period_key(deploy_time, period)
             bucket[key].append(mttr_minutes)
 
-    # Compute averages
-    result = {
-        "daily": {k: round(sum(v)/len(v), 2) for k, v in daily.items()},
+    return {
+        "daily": _avg(daily),
+        "weekly": _avg(weekly),
+        "monthly": _avg(monthly),
     }
 
-    return result
+def _parse_request(start_time_str, end_time_str, scope):
+    """(start, end, error) for the /mttr inputs."""
+    try:
+        start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M:%S")
+        end_time = datetime.strptime(end_time_str, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None, None, {"error": "Invalid datetime format. Use YYYY-MM-DD HH:MM:SS"}
+    if scope is not None and scope not in SCOPES:
+        return None, None, {"error": f"Unknown scope. Use one of: {', '.join(SCOPES)}"}
+    return start_time, end_time, None
+
+def mttr_queries(start_time, end_time):
+    """(filter, projection) for the failed deployments and the alerts in the window."""
+    failed_deploys = (
+        {
+            "status": "FAILURE",
+            "timestamp": {"$gte": start_time, "$lte": end_time}
+        },
+        {"_id": 0, "timestamp": 1, "commit_sha": 1, "service": 1},
+    )
+    relevant_alerts = (
+        {
+            "severity": {"$in": ["critical", "high"]},
+            "startsAt": {"$gte": start_time, "$lte": end_time}
+        },
+        {"_id": 0, "startsAt": 1, "endsAt": 1, "labels": 1},
+    )
+    return failed_deploys, relevant_alerts
+
+def calculate_mttr_from_db(start_time_str, end_time_str, scope=None, granularity=None, zone=None):
+    start_time, end_time, error = _parse_request(start_time_str, end_time_str, scope)
+    if error:
+        return error
+
+    deploy_query, alert_query = mttr_queries(start_time, end_time)
+    failed_deploys = get_collection(JENKINS_DEPLOYMENTS).find(*deploy_query)
+    relevant_alerts = get_collection(PROMETHEUS_ALERTS).find(*alert_query)
+
+    return compute_mttr(events.deployments(failed_deploys), events.alerts(relevant_alerts), scope,
+                        granularity, zone)
+
+async def calculate_mttr_from_db_async(start_time_str, end_time_str, scope=None, granularity=None, zone=None,
+                                       group_by=None):
+    """
+    calculate_mttr_from_db on the async client; both reads run concurrently.
+    group_by: one result per group of the failed deployments (see processor/groups.py).
+    """
+    start_time, end_time, error = _parse_request(start_time_str, end_time_str, scope)
+    if error:
+        return error
+
+    deploy_query, alert_query = mttr_queries(start_time, end_time)
+    if group_by:
+        deploy_cursor, relevant_alerts = await asyncio.gather(
+            get_async_collection(JENKINS_DEPLOYMENTS).aggregate(deployment_pipeline(*deploy_query, group_by)),
+            get_async_collection(PROMETHEUS_ALERTS).find(*alert_query).to_list(),
+        )
+        failed_deploys = await deploy_cursor.to_list()
+        return grouped(group_by, compute_mttr_by_group(
+            events.deployments(failed_deploys), events.alerts(relevant_alerts), scope, granularity, zone
+        ))
+    failed_deploys, relevant_alerts = await asyncio.gather(
+        get_async_collection(JENKINS_DEPLOYMENTS).find(*deploy_query).to_list(),
+        get_async_collection(PROMETHEUS_ALERTS).find(*alert_query).to_list(),
+    )
+
+    return compute_mttr(events.deployments(failed_deploys), events.alerts(relevant_alerts), scope,
+                        granularity, zone)
@@ -0,0 +1,108 @@
+# processor/periods.py
+"""
+Calendar bucketing for the granularity= / tz= query parameters.
+
+Records are grouped by day, ISO week ("2025-W03") or month of their
+local time in an IANA time zone (default UTC) in one vectorized pass:
+the UTC offset is looked up once per distinct UTC hour, the local day
+number is plain int64 arithmetic, and only the distinct days are turned
+into labels. The request window itself stays in UTC.
+"""
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+
+# granularity -> response field (same names as the legacy daily/weekly/monthly dicts)
+GRANULARITIES = {"day": "daily", "week": "weekly", "month": "monthly"}
+
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 86_400_000
+_EPOCH_DATE = date(1970, 1, 1)
+
+
+def parse_period_params(granularity, tz):
+    """(granularity, ZoneInfo) for the query parameters, or (None, None, error dict)."""
+    if granularity not in GRANULARITIES:
+        return None, None, {"error": f"Unknown granularity. Use one of: {', '.join(GRANULARITIES)}"}
+    try:
+        zone = ZoneInfo(tz or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return None, None, {"error": f"Unknown time zone: {tz}"}
+    return granularity, zone, None
+
+def to_ms(datetimes):
+    """int64 epoch ms of naive UTC datetimes."""
+    return np.array(datetimes, dtype="datetime64[ms]").astype(np.int64)
+
+def _label(day_number, granularity):
+    d = _EPOCH_DATE + timedelta(days=int(day_number))
+    if granularity == "day":
+        return d.isoformat()
+    if granularity == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{d.year}-{d.month:02d}"
+
+def local_days(times_ms, zone):
+    """Local calendar day numbers (days since 1970-01-01) of epoch-ms times."""
+    times_ms = np.asarray(times_ms, dtype=np.int64)
+    if zone.key == "UTC":
+        return times_ms // MS_PER_DAY
+    hours, hour_of_record = np.unique(times_ms // MS_PER_HOUR, return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(int(h) * 3600, timezone.utc).astimezone(zone).utcoffset().total_seconds() * 1000
+        for h in hours
+    ], dtype=np.int64)
+    return (times_ms + offsets[hour_of_record]) // MS_PER_DAY
+
+def buckets(times_ms, granularity, zone):
+    """(period labels, period index of each record) for epoch-ms times."""
+    days, day_of_record = np.unique(local_days(times_ms, zone), return_inverse=True)
+    labels, period_of_day = np.unique([_label(d, granularity) for d in days], return_inverse=True)
+    return [str(label) for label in labels], period_of_day[day_of_record]
+
+def period_counts(times_ms, granularity, zone):
+    """{period: number of records}"""
+    labels, period = buckets(times_ms, granularity, zone)
+    counts = np.bincount(period, minlength=len(labels))
+    return {label: int(c) for label, c in zip(labels, counts)}
+
+def period_means(times_ms, values, granularity, zone):
+    """{period: average of values, rounded to 2 places}"""
+    labels, period = buckets(times_ms, granularity, zone)
+    sums = np.bincount(period, weights=values, minlength=len(labels))
+    counts = np.bincount(period, minlength=len(labels))
+    return {label: round(float(s) / int(c), 2) for label, s, c in zip(labels, sums, counts)}
+
+def period_cfr(deploy_ms, deploy_commit, deploy_failed, alert_ms, alert_commit, granularity, zone):
+    """
+    Change failure rate per period. A change is a distinct commit deployed
+    in the period; it failed if one of its deployments in the period failed
+    or a critical alert for it started in the period (the rules of
+    cfr_processor, applied per period). Commits are integer ids; the
+    deployments must already be limited to merged commits.
+    """
+    times = np.concatenate([np.asarray(deploy_ms, np.int64), np.asarray(alert_ms, np.int64)])
+    labels, period = buckets(times, granularity, zone)
+    n = len(deploy_ms)
+    deploy_commit = np.asarray(deploy_commit, np.int64)
+    alert_commit = np.asarray(alert_commit, np.int64)
+    width = int(max(deploy_commit.max(initial=0), alert_commit.max(initial=0))) + 1
+
+    # (period, commit) pairs as single int64 keys
+    changes = np.unique(period[:n] * width + deploy_commit)
+    failed = np.union1d(
+        period[:n][deploy_failed] * width + deploy_commit[deploy_failed],
+        np.intersect1d(changes, period[n:] * width + alert_commit),
+    )
+    total = np.bincount(changes // width, minlength=len(labels))
+    failures = np.bincount(failed // width, minlength=len(labels))
+    return {
+        label: {
+            "Total Changes": t,
+            "Failed Changes": f,
+            "Change Failure Rate (%)": round(f / t * 100, 2),
+        }
+        for label, t, f in zip(labels, total.tolist(), failures.tolist())
+        if t
+    }
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from datetime import datetime
+from db import get_collection, METRIC_ROLLUPS
+
+_COUNTERS = ["deploy_count", "failure_count", "lt_sum", "lt_count", "mttr_sum", "mttr_count"]
+
+
+def _metrics(c):
+    finished = c["deploy_count"] + c["failure_count"]
+    return {
+        "deployments": c["deploy_count"],
+        "failures": c["failure_count"],
+        "lead_time_hours": round(c["lt_sum"] / c["lt_count"], 2) if c["lt_count"] else None,
+        "mttr_minutes": round(c["mttr_sum"] / c["mttr_count"], 2) if c["mttr_count"] else None,
+        "deployment_failure_rate": round(c["failure_count"] / finished * 100, 2) if finished else 0.0,
+    }
+
+def get_rollup_metrics(start_date: str, end_date: str, job_name: str = None, service: str = None):
+    """
+    Deployments, failures, lead time and MTTR for whole days in
+    [start_date, end_date] read from the metric_rollups buckets
+    (collector/rollups.py): O(days) small documents instead of the raw
+    events, filterable by job and service.
+
+    These are per-day approximations of the metric endpoints, not the same
+    numbers: lead time and MTTR are attributed to the day of the deployment
+    (the endpoints also filter commits and alerts by the window), and
+    deployment_failure_rate is failed / finished deployments. The change
+    failure rate of /api/cfr counts distinct merged commits, which cannot
+    be added up across days, so it is not part of the rollups.
+    """
+    try:
+        start_day = datetime.strptime(start_date, "%Y-%m-%d")
+        end_day = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return {"error": "Invalid date format. Use YYYY-MM-DD"}
+
+    query = {"day": {"$gte": start_day, "$lte": end_day}}
+    if job_name:
+        query["job_name"] = job_name
+    if service:
+        query["service"] = service
+
+    daily = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+    totals = dict.fromkeys(_COUNTERS, 0)
+    for bucket in get_collection(METRIC_ROLLUPS).find(query, {"_id": 0}):
+        day = bucket["day"].strftime("%Y-%m-%d")
+        for field in _COUNTERS:
+            value = bucket.get(field) or 0
+            daily[day][field] += value
+            totals[field] += value
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "daily": {day: _metrics(c) for day, c in sorted(daily.items())},
+        "totals": _metrics(totals),
+    }
@@ -0,0 +1,81 @@
+# tests/conftest.py
+"""
+Shared fixtures: mongomock behind the process-wide client of
+collector/base_collector.py, so every get_db() / get_collection() caller
+reads and writes it, either empty or loaded with tests/sample_raw_data.
+Tests using them are skipped without mongomock.
+"""
+import json
+from pathlib import Path
+import pytest
+from collector import base_collector
+from collector.utils import to_datetime
+
+SAMPLE_DIR = Path(__file__).parent / "sample_raw_data"
+# collection -> top-level timestamp fields, stored as BSON dates like collector/migrate_timestamps.py does
+DATE_FIELDS = {
+    "github_events": ["created_at", "merged_at"],
+    "jenkins_deployments": ["timestamp"],
+    "prometheus_alerts": ["startsAt", "endsAt"],
+}
+
+
+def _accept_bulk_sort(mongomock):
+    # pymongo >= 4.11 passes sort= to the bulk update/replace builders;
+    # mongomock 4.3 predates it (it is always None for these operations)
+    builder = mongomock.collection.BulkOperationBuilder
+    if getattr(builder, "_accepts_sort", False):
+        return
+    for name in ("add_update", "add_replace"):
+        def add(self, *args, sort=None, _add=getattr(builder, name), **kwargs):
+            return _add(self, *args, **kwargs)
+        setattr(builder, name, add)
+    builder._accepts_sort = True
+
+
+@pytest.fixture
+def mongo():
+    """An empty database behind the shared client."""
+    mongomock = pytest.importorskip("mongomock")
+    _accept_bulk_sort(mongomock)
+    previous = base_collector._client
+    base_collector._client = mongomock.MongoClient()
+    yield base_collector.get_db()
+    base_collector._client = previous
+
+
+def _raw(name):
+    with open(SAMPLE_DIR / f"{name}.json") as f:
+        return json.load(f)
+
+def _stored(name, docs):
+    stored = []
+    for doc in docs:
+        doc = dict(doc)
+        for field in DATE_FIELDS[name]:
+            if doc.get(field) is not None:
+                doc[field] = to_datetime(doc[field])
+        if isinstance(doc.get("commits"), list):
+            doc["commits"] = [dict(c, timestamp=to_datetime(c.get("timestamp"))) for c in doc["commits"]]
+        stored.append(doc)
+    return stored
+
+
+@pytest.fixture(scope="module")
+def raw_data():
+    """tests/sample_raw_data as loaded from JSON: collection -> documents."""
+    return {name: _raw(name) for name in DATE_FIELDS}
+
+
+@pytest.fixture(scope="module")
+def sample_db(raw_data):
+    """A database holding the sample data, timestamps stored as BSON dates."""
+    mongomock = pytest.importorskip("mongomock")
+    _accept_bulk_sort(mongomock)
+    previous = base_collector._client
+    base_collector._client = mongomock.MongoClient()
+    db = base_collector.get_db()
+    for name, docs in raw_data.items():
+        db[name].insert_many(_stored(name, docs))
+    yield db
+    base_collector._client = previous
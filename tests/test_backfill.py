@@ -0,0 +1,55 @@
+# tests/test_backfill.py
+"""
+Backfilling webhook-shaped PR records (commits is a count) must not blank
+the commits already stored for those PRs.
+
+    python -m pytest tests
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytest
+from collector import backfill
+
+ENRICHED = [{"sha": "a" * 40, "timestamp": datetime(2025, 5, 1, 9)}]
+WEBHOOK_RECORD = {
+    "action": "closed",
+    "pull_request": {
+        "number": 7, "merged": True, "merged_at": "2025-05-01T10:00:00Z", "title": "fix",
+        "commits_url": "https://api.github.invalid/repos/o/r/pulls/7/commits", "commits": 1,
+        "base": {"ref": "main", "repo": {"full_name": "o/r"}},
+    },
+}
+
+
+@pytest.fixture
+def export(mongo, tmp_path):
+    mongo.github_events.insert_one({"pr_id": 7, "commits": ENRICHED})
+    path = tmp_path / "github_events.json"
+    path.write_text(json.dumps([WEBHOOK_RECORD]))
+    return str(path)
+
+
+def _load(path, **kwargs):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return backfill.backfill_file(path, "github", pool, 2, 100, {}, "", **kwargs)
+
+
+def test_webhook_record_keeps_stored_commits(mongo, export, monkeypatch):
+    monkeypatch.setattr(backfill, "enrich_merged_pr", lambda *args: pytest.fail("fetched without --enrich-prs"))
+
+    assert _load(export) == 1
+
+    stored = mongo.github_events.find_one({"pr_id": 7})
+    assert stored["commits"] == ENRICHED
+    assert (stored["title"], stored["target_branch"]) == ("fix", "main")
+
+
+def test_enrich_prs_fetches_commits(mongo, export, monkeypatch):
+    calls = []
+    monkeypatch.setattr(backfill, "enrich_merged_pr", lambda *args: calls.append(args))
+
+    _load(export, enrich_prs=True)
+
+    assert calls == [(7, datetime(2025, 5, 1, 10), WEBHOOK_RECORD["pull_request"]["commits_url"], None)]
+    assert mongo.github_events.find_one({"pr_id": 7})["commits"] == ENRICHED
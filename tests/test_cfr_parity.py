@@ -0,0 +1,36 @@
+# tests/test_cfr_parity.py
+"""
+cfr_pipeline (calculate_cfr_from_db) must give the same numbers as the
+in-memory calculate_cfr on tests/sample_raw_data.
+
+Runs against mongomock; skipped when it is not installed.
+
+    python -m pytest tests
+"""
+import pytest
+from processor.cfr_processor import calculate_cfr, calculate_cfr_from_db
+
+WINDOWS = [
+    ("2025-05-01T00:00:00Z", "2025-05-31T23:59:59Z"),
+    ("2025-03-10T06:30:00Z", "2025-04-02T18:00:00Z"),
+    ("2024-12-20T00:00:00Z", "2025-01-10T00:00:00Z"),
+    ("2025-07-01T00:00:00Z", "2025-07-03T00:00:00Z"),
+    ("2020-01-01T00:00:00Z", "2020-02-01T00:00:00Z"),  # no data
+]
+
+
+def test_sample_windows_have_changes(sample_db):
+    # guards against windows that only exercise the empty case
+    assert sum(calculate_cfr_from_db(*window)["Total Changes"] for window in WINDOWS) > 0
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_pipeline_matches_calculate_cfr(sample_db, raw_data, window):
+    expected = calculate_cfr(
+        *window,
+        raw_data["github_events"],
+        raw_data["jenkins_deployments"],
+        raw_data["prometheus_alerts"],
+    )
+
+    assert calculate_cfr_from_db(*window) == expected
@@ -0,0 +1,48 @@
+# tests/test_event_store.py
+"""
+The event store's tables keep their cached sort orders current as rows
+change, matching a fresh stable argsort.
+
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+from processor import event_store
+from processor.event_store import _Table, NO_TIME
+
+
+def _row(rng, tag):
+    # few distinct values and missing times, so ties are common
+    return int(rng.integers(0, 40)) if rng.random() > 0.1 else NO_TIME, tag
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sorted_order_follows_upserts(monkeypatch, seed):
+    monkeypatch.setattr(event_store, "_MERGE_LIMIT", 1)  # merge every batch
+    rng = np.random.default_rng(seed)
+    table = _Table([("ts", np.int64), ("tag", np.int32)])
+    size = int(rng.integers(20, 300))
+    table.upsert_many([(key, _row(rng, 0)) for key in range(size)])
+    table.sorted_by("ts")
+
+    for tag in range(1, 8):
+        keys = rng.integers(0, size + 5, int(rng.integers(1, 8))).tolist()
+        table.upsert_many([(key, _row(rng, tag)) for key in keys])
+        size = max(size, max(keys) + 1)
+        cached = table._sorted["ts"]
+        assert cached[0] == table.version  # merged, not dropped
+
+        order, values = table.sorted_by("ts")
+        expected = np.argsort(table["ts"], kind="stable")
+        assert np.array_equal(order, expected)
+        assert np.array_equal(values, table["ts"][expected])
+
+
+def test_large_batch_sorts_again():
+    table = _Table([("ts", np.int64)])
+    table.upsert_many([(key, (key,)) for key in range(100)])
+    table.sorted_by("ts")
+    table.upsert_many([(key, (-key,)) for key in range(50)])
+
+    assert "ts" not in table._sorted
+    assert np.array_equal(table.sorted_by("ts")[0], np.argsort(table["ts"], kind="stable"))
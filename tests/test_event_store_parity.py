@@ -0,0 +1,181 @@
+# tests/test_event_store_parity.py
+"""
+The API's resident event store (processor/event_store.py) must answer
+exactly like the Mongo-backed processors it stands in for, on
+tests/sample_raw_data: DF, LT, MTTR (every scope) and CFR, with
+granularity= and group_by=, the combined /dora-metrics and the batch.
+
+The async processors read mongomock through a thin awaitable wrapper
+installed as the shared async client. Runs against mongomock; skipped
+when it is not installed.
+
+    python -m pytest tests
+"""
+import asyncio
+from zoneinfo import ZoneInfo
+import pytest
+from collector import base_collector, commit_index
+from processor.cfr_processor import calculate_cfr_from_db_async
+from processor.df_processor import get_deployment_frequency_async
+from processor.dora_engine import compute_batch_async, compute_dora_metrics_async
+from processor.event_store import EventStore
+from processor.groups import GROUP_BY
+from processor.lt_processor import get_lead_time_async
+from processor.mttr_processor import SCOPES, calculate_mttr_from_db_async
+
+WINDOWS = [
+    ("2025-05-01 00:00:00", "2025-05-31 23:59:59"),
+    ("2025-03-10 06:30:00", "2025-04-02 18:00:00"),
+    ("2024-12-20 00:00:00", "2025-01-10 00:00:00"),
+    ("2025-07-01 00:00:00", "2025-07-03 00:00:00"),
+    ("2020-01-01 00:00:00", "2020-02-01 00:00:00"),  # no data
+]
+# the whole sample; slow for CFR under mongomock, so only used where it adds matches
+EVERYTHING = ("2024-08-01 00:00:00", "2025-08-01 00:00:00")
+PERIODS = [("day", "UTC"), ("week", "America/New_York"), ("month", "Asia/Kolkata")]
+
+
+def _iso(window):
+    return tuple(t.replace(" ", "T") + "Z" for t in window)
+
+
+# --- awaitable mongomock (the subset of AsyncMongoClient the processors use) ---
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args):
+        self._cursor = self._cursor.sort(*args)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline):
+        return _AsyncCursor(self._collection.aggregate(pipeline))
+
+
+class _AsyncClient:
+    def __init__(self, client):
+        self._client = client
+
+    def __getitem__(self, name):
+        db = self._client[name]
+        return type("_AsyncDatabase", (), {"__getitem__": lambda _, n: _AsyncCollection(db[n])})()
+
+
+@pytest.fixture(scope="module")
+def store(sample_db):
+    """
+    The sample data plus what the collectors derive from it (a service per
+    deployment, taken from the alerts' service labels so scope=service and
+    group_by=service match something, and the commit index), loaded into
+    an EventStore; the async client reads the same database.
+    """
+    services = sorted({a["labels"]["service"] for a in sample_db.prometheus_alerts.find()})
+    for deploy in sample_db.jenkins_deployments.find({}, {"build_id": 1}):
+        sample_db.jenkins_deployments.update_one(
+            {"_id": deploy["_id"]}, {"$set": {"service": services[deploy["build_id"] % len(services)]}}
+        )
+    commit_index.rebuild()
+    previous = base_collector._async_client
+    base_collector._async_client = _AsyncClient(base_collector.get_client())
+    store = EventStore(refresh_seconds=1, overlap_seconds=30)
+    store.refresh()
+    yield store
+    base_collector._async_client = previous
+
+
+def test_sample_windows_have_data(store):
+    # guards against windows that only exercise the empty case
+    result = store.compute_dora_metrics(*WINDOWS[0])
+    assert result["deployment_frequency"]["count"] > 0
+    assert result["lead_time"]["daily"]
+    assert result["mttr"]["daily"]
+    assert result["cfr"]["Total Changes"] > 0
+    assert store.calculate_mttr(*EVERYTHING, "commit")["daily"]
+
+
+@pytest.mark.parametrize("window", [*WINDOWS, EVERYTHING])
+def test_deployment_frequency(store, window):
+    expected = asyncio.run(get_deployment_frequency_async(*window))
+    assert store.get_deployment_frequency(*window) == expected
+
+
+@pytest.mark.parametrize("window", [*WINDOWS, EVERYTHING])
+def test_lead_time(store, window):
+    assert store.get_lead_time(*window) == asyncio.run(get_lead_time_async(*window))
+
+
+@pytest.mark.parametrize("scope", [None, *SCOPES])
+@pytest.mark.parametrize("window", [*WINDOWS, EVERYTHING])
+def test_mttr(store, window, scope):
+    expected = asyncio.run(calculate_mttr_from_db_async(*window, scope))
+    assert store.calculate_mttr(*window, scope) == expected
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_cfr(store, window):
+    window = _iso(window)
+    assert store.calculate_cfr(*window) == asyncio.run(calculate_cfr_from_db_async(*window))
+
+
+@pytest.mark.parametrize("granularity, tz", PERIODS)
+@pytest.mark.parametrize("window", [*WINDOWS[:3], EVERYTHING])
+def test_granularity(store, window, granularity, tz):
+    zone = ZoneInfo(tz)
+    assert store.get_deployment_frequency(*window, granularity, zone) == asyncio.run(
+        get_deployment_frequency_async(*window, granularity, zone))
+    assert store.get_lead_time(*window, granularity, zone) == asyncio.run(
+        get_lead_time_async(*window, granularity, zone))
+    for scope in (None, *SCOPES):
+        assert store.calculate_mttr(*window, scope, granularity, zone) == asyncio.run(
+            calculate_mttr_from_db_async(*window, scope, granularity, zone))
+
+
+@pytest.mark.parametrize("granularity, tz", PERIODS)
+@pytest.mark.parametrize("window", WINDOWS[:3])
+def test_cfr_granularity(store, window, granularity, tz):
+    window, zone = _iso(window), ZoneInfo(tz)
+    assert store.calculate_cfr(*window, granularity, zone) == asyncio.run(
+        calculate_cfr_from_db_async(*window, granularity, zone))
+
+
+@pytest.mark.parametrize("group_by", GROUP_BY)
+@pytest.mark.parametrize("window", WINDOWS[:3] + WINDOWS[4:])
+def test_group_by(store, window, group_by):
+    assert store.get_deployment_frequency(*window, group_by=group_by) == asyncio.run(
+        get_deployment_frequency_async(*window, group_by=group_by))
+    assert store.get_lead_time(*window, group_by=group_by) == asyncio.run(
+        get_lead_time_async(*window, group_by=group_by))
+    assert store.calculate_mttr(*window, group_by=group_by) == asyncio.run(
+        calculate_mttr_from_db_async(*window, group_by=group_by))
+    assert store.calculate_cfr(*_iso(window), group_by=group_by) == asyncio.run(
+        calculate_cfr_from_db_async(*_iso(window), group_by=group_by))
+
+
+@pytest.mark.parametrize("group_by", [None, *GROUP_BY])
+@pytest.mark.parametrize("window", WINDOWS[:2] + WINDOWS[4:])
+def test_dora_metrics(store, window, group_by):
+    assert store.compute_dora_metrics(*window, group_by) == asyncio.run(
+        compute_dora_metrics_async(*window, group_by))
+
+
+def test_batch(store):
+    # overlapping, nested, disjoint and repeated windows in one request
+    windows = [*WINDOWS, EVERYTHING, *WINDOWS[:2]]
+    assert store.compute_batch(windows) == asyncio.run(compute_batch_async(windows))
+    metrics = ("lead_time", "cfr")
+    assert store.compute_batch(windows, metrics) == asyncio.run(compute_batch_async(windows, metrics))
@@ -0,0 +1,149 @@
+# tests/test_github_api.py
+"""
+PR commit enrichment against a local stub of the GitHub commits endpoint:
+pagination, ETag / 304 revalidation and the failure path.
+
+    python -m pytest tests
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import requests
+from collector import github_api, github_webhook
+
+COMMITS = [
+    {"sha": f"{i:040x}", "commit": {"committer": {"date": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}Z"}}}
+    for i in range(250)
+]
+
+
+class _GitHubStub(BaseHTTPRequestHandler):
+    """Serves COMMITS 'per_page' at a time with Link headers and a per-page ETag."""
+    status = 200  # set to an error status to make every request fail
+    requests = []  # (path with query, If-None-Match) of every request
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.status != 200:
+            self.send_response(self.status)
+            self.end_headers()
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        etag = f'"page-{page}-{per_page}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        items = COMMITS[(page - 1) * per_page:page * per_page]
+        body = json.dumps(items).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        if page * per_page < len(COMMITS):
+            next_url = f"http://{self.headers['Host']}{url.path}?per_page={per_page}&page={page + 1}"
+            self.send_header("Link", f'<{next_url}>; rel="next"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github():
+    """Base URL of a fresh stub server; the client's session and ETag cache are reset."""
+    _GitHubStub.status = 200
+    _GitHubStub.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GitHubStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    github_api.close_session()
+    github_api._etags.clear()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    github_api.close_session()
+    github_api._etags.clear()
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Records enrich_merged_pr's writes instead of sending them to Mongo."""
+    calls = []
+    monkeypatch.setattr(github_webhook, "upsert_one", lambda *args: calls.append(("upsert_one", args)))
+    monkeypatch.setattr(github_webhook, "record_pr", lambda doc: calls.append(("record_pr", doc)) or [])
+    monkeypatch.setattr(github_webhook, "apply_lead_time", lambda changes: None)
+    monkeypatch.setattr(github_webhook, "notify_ingest", lambda *args: None)
+    return calls
+
+
+def test_get_paginated_follows_every_page(github):
+    items = github_api.get_paginated(f"{github}/repos/o/r/pulls/1/commits")
+
+    assert [c["sha"] for c in items] == [c["sha"] for c in COMMITS]
+    paths = [path for path, _ in _GitHubStub.requests]
+    assert paths == [
+        "/repos/o/r/pulls/1/commits?per_page=100",
+        "/repos/o/r/pulls/1/commits?per_page=100&page=2",
+        "/repos/o/r/pulls/1/commits?per_page=100&page=3",
+    ]
+
+
+def test_refetch_revalidates_with_etag(github):
+    url = f"{github}/repos/o/r/pulls/1/commits"
+    first = github_api.get_paginated(url)
+    _GitHubStub.requests = []
+
+    again = github_api.get_paginated(url)
+
+    assert again == first
+    # every page is revalidated, answered 304 and served from the cache
+    assert [etag for _, etag in _GitHubStub.requests] == ['"page-1-100"', '"page-2-100"', '"page-3-100"']
+
+
+def test_enrich_writes_all_commits(github, writes):
+    github_webhook.enrich_merged_pr(1, None, f"{github}/repos/o/r/pulls/1/commits", 250)
+
+    (_, (collection, query, update)), (_, doc) = writes
+    assert (collection, query) == ("github_events", {"pr_id": 1})
+    assert len(update["commits"]) == 250
+    assert doc["commits"] == update["commits"]
+
+
+@pytest.mark.parametrize("status", [500, 502, 403, 429])
+def test_enrich_transient_failure_raises_without_writing(github, writes, status):
+    _GitHubStub.status = status
+
+    with pytest.raises(requests.HTTPError):
+        github_webhook.enrich_merged_pr(1, None, f"{github}/repos/o/r/pulls/1/commits", 250)
+
+    assert writes == []
+
+
+def test_enrich_refused_pr_keeps_stored_commits(github, writes):
+    _GitHubStub.status = 404
+
+    github_webhook.enrich_merged_pr(1, None, f"{github}/repos/o/r/pulls/1/commits", 250)
+
+    assert writes == []
+
+
+def test_enrich_unreachable_github_raises_without_writing(writes):
+    with pytest.raises(requests.ConnectionError):
+        # nothing listens on port 9 (discard) locally
+        github_webhook.enrich_merged_pr(1, None, "http://127.0.0.1:9/repos/o/r/pulls/1/commits", 250)
+
+    assert writes == []
+
+
+def test_enrich_without_commits_url_ignores_payload_count(writes):
+    # GitHub's pull_request.commits is the number of commits, not a list
+    github_webhook.enrich_merged_pr(1, None, None, 250)
+
+    assert writes == []
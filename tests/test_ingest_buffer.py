@@ -0,0 +1,112 @@
+# tests/test_ingest_buffer.py
+"""
+Post-flush hooks of the write-behind buffer: a hook that fails part way
+is retried on the next flush without counting a build twice or losing
+its lead time.
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+import pytest
+from collector import jenkins_webhook, prometheus_webhook, rollups
+from collector.ingest_buffer import IngestBuffer
+from db import METRIC_ROLLUPS, COMMIT_INDEX
+
+DEPLOYED = datetime(2025, 5, 1, 12)
+BUILDS = [
+    {"build_id": i, "job_name": "prod-deploy", "service": "api", "status": "SUCCESS",
+     "timestamp": DEPLOYED + timedelta(minutes=i), "commit_sha": f"{i:040x}"}
+    for i in range(1, 4)
+]
+
+
+def _fail_once(function, after=False):
+    """function that raises on its first call (after running it, with after=True)."""
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            if after:
+                function(*args)
+            raise ConnectionError("injected")
+        return function(*args)
+    return flaky
+
+
+@pytest.fixture
+def buffer(mongo):
+    # commits made two hours before their deployment
+    mongo[COMMIT_INDEX].insert_many([
+        {"sha": b["commit_sha"], "commit_time": b["timestamp"] - timedelta(hours=2)} for b in BUILDS
+    ])
+    buffer = IngestBuffer(max_docs=100, flush_seconds=3600)
+    buffer.register("jenkins_deployments", "build_id", jenkins_webhook._after_flush)
+    yield buffer
+    buffer._stopped.set()
+    buffer._wake.set()
+
+
+def _rollup(mongo):
+    (bucket,) = mongo[METRIC_ROLLUPS].find({"day": datetime(2025, 5, 1)})
+    return bucket["deploy_count"], bucket["lt_count"], bucket["lt_sum"]
+
+
+@pytest.mark.parametrize("step, after", [
+    ("deployment_changes", False),  # the read before anything is written
+    ("write_deployments", True),  # commit index written, then an error
+    ("apply_deployments", False),  # commit index written, rollups not
+    ("apply_deployments", True),  # rollups written, then an error
+    ("notify_ingest_times", False),
+])
+def test_failed_hook_is_retried_exactly_once(mongo, buffer, monkeypatch, step, after):
+    monkeypatch.setattr(jenkins_webhook, step, _fail_once(getattr(jenkins_webhook, step), after))
+    for build in BUILDS:
+        buffer.add("jenkins_deployments", build)
+
+    buffer.flush()
+    assert buffer.stats()["pending_hooks"] == 1
+
+    buffer.flush()
+    stats = buffer.stats()
+    assert (stats["pending_hooks"], stats["failed_hooks"]) == (0, 1)
+    assert _rollup(mongo) == (3, 3, 6.0)
+    assert mongo[COMMIT_INDEX].count_documents({"first_deploy_time": {"$ne": None}}) == 3
+
+
+def test_redelivered_builds_are_not_counted_again(mongo, buffer):
+    for build in BUILDS:
+        buffer.add("jenkins_deployments", build)
+    buffer.flush()
+    for build in BUILDS:
+        buffer.add("jenkins_deployments", build)
+    buffer.flush()
+
+    assert _rollup(mongo) == (3, 3, 6.0)
+
+
+def test_alert_storm_recomputes_mttr_like_a_rebuild(mongo):
+    failures = [DEPLOYED + timedelta(days=d, hours=h) for d in range(3) for h in (1, 9)]
+    mongo.jenkins_deployments.insert_many([
+        {"build_id": 100 + i, "job_name": "prod-deploy", "service": "api", "status": "FAILURE", "timestamp": ts}
+        for i, ts in enumerate(failures)
+    ])
+    buffer = IngestBuffer(max_docs=100, flush_seconds=3600)
+    buffer.register("prometheus_alerts", "alert_id", prometheus_webhook._after_flush)
+    for i, ts in enumerate(failures):
+        buffer.add("prometheus_alerts", {
+            "alert_id": f"a{i}", "severity": "critical" if i % 3 else "low",
+            "startsAt": ts + timedelta(minutes=30), "endsAt": ts + timedelta(minutes=90),
+        })
+    buffer.flush()
+
+    stored = {
+        (b["day"], b["job_name"], b["service"]): (b["mttr_sum"], b["mttr_count"])
+        for b in mongo[METRIC_ROLLUPS].find() if b["mttr_count"]
+    }
+    expected = {
+        key: (counters["mttr_sum"], counters["mttr_count"])
+        for key, counters in rollups._buckets(None, None).items() if counters["mttr_count"]
+    }
+    assert stored == expected
+    assert sum(count for _, count in stored.values()) == len(failures)
@@ -0,0 +1,74 @@
+# tests/test_spool.py
+"""
+The spool drain stores merged PRs and queues their commit fetch, so a
+GitHub failure never holds back the checkpoint.
+
+    python -m pytest tests
+"""
+import pytest
+import requests
+from collector import spool as spool_module
+from collector.spool import Spool, SpoolDrainer
+
+MERGED_PR = {
+    "action": "closed",
+    "pull_request": {
+        "number": 7, "merged": True, "merged_at": "2025-05-01T10:00:00Z",
+        "commits_url": "https://api.github.invalid/repos/o/r/pulls/7/commits", "commits": 2,
+        "base": {"ref": "main", "repo": {"full_name": "o/r"}},
+    },
+}
+BUILD = {"number": 1, "job_name": "prod-deploy", "status": "SUCCESS", "timestamp": 1746093600000}
+
+
+@pytest.fixture
+def drainer(mongo, tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path / "spool.db"))
+    monkeypatch.setattr(spool_module, "spool", spool)
+    return SpoolDrainer(spool, batch_size=10, interval=60)
+
+
+def _rate_limited(*args):
+    response = requests.Response()
+    response.status_code = 403
+    raise requests.HTTPError("rate limited", response=response)
+
+
+def test_github_failure_does_not_hold_the_checkpoint(mongo, drainer, monkeypatch):
+    calls = []
+    monkeypatch.setattr(spool_module, "enrich_merged_pr", lambda *args: calls.append(args) or _rate_limited())
+    drainer.spool.append("github", MERGED_PR)
+    last = drainer.spool.append("jenkins", BUILD)
+
+    assert drainer.drain_once() == 2
+    assert drainer.spool.checkpoint() == last
+    assert calls == []  # nothing fetched inline
+    assert mongo.github_events.count_documents({"pr_id": 7}) == 1
+    assert mongo.jenkins_deployments.count_documents({"build_id": 1}) == 1
+
+    assert drainer.enrich_due() == 0
+    ((pr_id, attempts, due_at, error),) = drainer.spool.enrichments()
+    assert (pr_id, attempts, error) == (7, 1, "rate limited")
+    assert drainer.spool.due_enrichments(due_at - 1, 10) == []  # backing off
+
+    monkeypatch.setattr(spool_module, "enrich_merged_pr", lambda *args: calls.append(args))
+    drainer.spool.enrichment_failed(7, attempts, 0, error)  # make it due now
+    assert drainer.enrich_due() == 1
+    assert drainer.spool.enrichments() == []
+    (_, (pr_id, merged_at, commits_url, fallback)) = calls
+    assert (pr_id, merged_at.isoformat(), fallback) == (7, "2025-05-01T10:00:00", 2)
+
+
+def test_enrichment_is_abandoned_after_max_attempts(drainer, monkeypatch):
+    monkeypatch.setattr(spool_module, "enrich_merged_pr", _rate_limited)
+    monkeypatch.setattr(spool_module, "SPOOL_ENRICH_MAX_ATTEMPTS", 2)
+    drainer.spool.queue_enrichment(7, None, "https://api.github.invalid/x")
+
+    for _ in range(2):
+        drainer.enrich_due()
+        ((_, attempts, due_at, _),) = drainer.spool.enrichments()
+        if due_at:
+            drainer.spool.enrichment_failed(7, attempts, 0, "")
+
+    assert drainer.spool.enrichments()[0][1:3] == (2, None)
+    assert drainer.spool.stats()["abandoned_enrichments"] == 1